@@ -23,6 +23,8 @@ class CleftObj(object):
         
         # Allows to not calculate volume twice
         self.Volume = 0.000
+        # Lower/upper bounds of the voxel volume
+        self.VolumeBounds = None
 
         self.Index = 0
 
@@ -36,6 +38,19 @@ class CleftObj(object):
         
         self.CleftMD5 = md5.digest()
     
+    ''' ==================================================================================
+    FUNCTION Get_ContentMD5: Returns the MD5 of the content of the cleft file
+    ================================================================================== '''
+    def Get_ContentMD5(self):
+
+        md5 = hashlib.md5()
+
+        file = open(self.CleftFile, 'rb')
+        md5.update(file.read())
+        file.close()
+        
+        return md5.hexdigest()
+    
     ''' ==================================================================================
     FUNCTION Copy: Copies an instance of a class
     =================================================================================  '''    
@@ -132,12 +132,13 @@ class displayFlexAID(Base.Base):
         self.FlexAIDResultsProject_Dir = os.path.join(self.FlexAIDProject_Dir,'Results')
         self.FlexAIDBindingSiteProject_Dir = os.path.join(self.FlexAIDProject_Dir,'Binding_Site')
         self.FlexAIDTargetFlexProject_Dir = os.path.join(self.FlexAIDProject_Dir,'Target_Flexibility')
+        self.FlexAIDCacheProject_Dir = os.path.join(self.FlexAIDProject_Dir,'.Cache')
 
         self.Folders.extend( [  self.FlexAIDProject_Dir, self.GetCleftProject_Dir, self.GetCleftSaveProject_Dir,
                                 self.CleftProject_Dir, self.TargetProject_Dir, self.FlexAIDLigandProject_Dir,
                                 self.FlexAIDSimulationProject_Dir, self.FlexAIDSessionProject_Dir, self.FlexAIDResultsProject_Dir,
                                 self.FlexAIDBindingSiteProject_Dir, self.FlexAIDTargetFlexProject_Dir,
-                                self.FlexAIDSaveProject_Dir, self.FlexAIDTempProject_Dir ] )
+                                self.FlexAIDSaveProject_Dir, self.FlexAIDTempProject_Dir, self.FlexAIDCacheProject_Dir ] )
         
     ''' ==================================================================================
     FUNCTION MakeMenuBar: Builds the menu on the upper left corner    
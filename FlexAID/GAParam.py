@@ -48,6 +48,9 @@ class GAParamVars(Vars.Vars):
     AGAk2 = StringVar()
     AGAk3 = StringVar()
     AGAk4 = StringVar()
+    EarlyStop = IntVar()
+    StopWindow = StringVar()
+    StopTolerance = StringVar()
 
 class GAParam(Tabs.Tab):
 
@@ -72,6 +75,9 @@ class GAParam(Tabs.Tab):
         self.AGAk2 = self.Vars.AGAk2
         self.AGAk3 = self.Vars.AGAk3
         self.AGAk4 = self.Vars.AGAk4
+        self.EarlyStop = self.Vars.EarlyStop
+        self.StopWindow = self.Vars.StopWindow
+        self.StopTolerance = self.Vars.StopTolerance
 
     def Init_Vars(self):
                 
@@ -94,6 +100,9 @@ class GAParam(Tabs.Tab):
         self.AGAk2.set('0.10')
         self.AGAk3.set('0.95')
         self.AGAk4.set('0.10')
+        self.EarlyStop.set(0)
+        self.StopWindow.set('50')
+        self.StopTolerance.set('0.100')
 
     ''' ==================================================================================
     FUNCTION Before_Kill_Frame: Actions related before killing a frame
@@ -121,6 +130,7 @@ class GAParam(Tabs.Tab):
             self.AGATrace = self.UseAGA.trace('w',self.AGA_Toggle)
             self.RepModelTrace = self.RepModel.trace('w',self.RepModel_Toggle)
             self.FitModelTrace = self.FitModel.trace('w',self.FitModel_Toggle)
+            self.EarlyStopTrace = self.EarlyStop.trace('w',self.EarlyStop_Toggle)
 
             self.NbChromTrace = self.NbChrom.trace('w', lambda *args, **kwargs:
                                                    self.Validate_Field(input=self.inputNbChr, var=self.NbChrom, min=1, max=100000,
@@ -178,6 +188,14 @@ class GAParam(Tabs.Tab):
                                                self.Validate_Field(input=self.entSS, var=self.RepSS, min=0.00,
                                                                    max=1.00, ndec=2, tag='Reproduction steady-state', _type=float))
 
+            self.StopWindowTrace = self.StopWindow.trace('w', lambda *args, **kwargs:
+                                                         self.Validate_Field(input=self.entStopWindow, var=self.StopWindow, min=1,
+                                                                             max=self.inputNbGen, ndec=-1, tag='Early stopping window', _type=int))
+
+            self.StopToleranceTrace = self.StopTolerance.trace('w', lambda *args, **kwargs:
+                                                               self.Validate_Field(input=self.entStopTolerance, var=self.StopTolerance, min=0.000,
+                                                                                   max=1000.000, ndec=3, tag='Early stopping tolerance', _type=float))
+
             #self.RepBTrace = self.RepB.trace('w', lambda *args, **kwargs:
             #                                      self.Validate_Field(input=self.entB, var=self.RepB, min=0.10,
             #                                      max=5.00, ndec=2, tag='Reproduction population boom', _type=float))
@@ -209,6 +227,9 @@ class GAParam(Tabs.Tab):
             self.FitPeak.trace_vdelete('w',self.FitPeakTrace)
             self.FitAlpha.trace_vdelete('w',self.FitAlphaTrace)
             self.RepSS.trace_vdelete('w',self.RepSSTrace)
+            self.EarlyStop.trace_vdelete('w',self.EarlyStopTrace)
+            self.StopWindow.trace_vdelete('w',self.StopWindowTrace)
+            self.StopTolerance.trace_vdelete('w',self.StopToleranceTrace)
             #self.RepB.trace_vdelete('w',self.RepBTrace)
         except:
             pass
@@ -340,6 +361,32 @@ class GAParam(Tabs.Tab):
         self.inputGenFq.pack(side=RIGHT)
         self.ValidNbGenFreq = [1, False, self.inputGenFq]
 
+        ''' ========================================================================== '''
+
+        fEarlyStop = Frame(fPLeft)
+        fEarlyStop.pack(side=TOP, anchor=W, fill=X, padx=5, pady=5)
+        fEarlyStopLine1 = Frame(fEarlyStop)
+        fEarlyStopLine1.pack(side=TOP, anchor=W, fill=X)
+        fEarlyStopLine2 = Frame(fEarlyStop)
+        fEarlyStopLine2.pack(side=TOP, anchor=W, fill=X)
+        fEarlyStopLine3 = Frame(fEarlyStop)
+        fEarlyStopLine3.pack(side=TOP, anchor=W, fill=X)
+
+        Label(fEarlyStopLine1, text='Early stopping', font=self.top.font_Title).pack(side=LEFT)
+        Checkbutton(fEarlyStopLine1, text=' Use', variable=self.EarlyStop, font=self.top.font_Text).pack(side=RIGHT)
+
+        Label(fEarlyStopLine2, text='Generations without improvement:', font=self.top.font_Text).pack(side=LEFT)
+        self.entStopWindow = Entry(fEarlyStopLine2, width=5, background='white', justify=CENTER,
+                                   textvariable=self.StopWindow, font=self.top.font_Text, state='disabled')
+        self.entStopWindow.pack(side=RIGHT)
+        self.ValidStopWindow = [1, False, self.entStopWindow]
+
+        Label(fEarlyStopLine3, text='CF tolerance:', font=self.top.font_Text).pack(side=LEFT)
+        self.entStopTolerance = Entry(fEarlyStopLine3, width=5, background='white', justify=CENTER,
+                                      textvariable=self.StopTolerance, font=self.top.font_Text, state='disabled')
+        self.entStopTolerance.pack(side=RIGHT)
+        self.ValidStopTolerance = [1, False, self.entStopTolerance]
+
         ''' ========================================================================== '''        
 
         fFitness = Frame(fPRight)#, borderwidth=2, relief=SUNKEN)
@@ -403,7 +450,8 @@ class GAParam(Tabs.Tab):
         self.Validator = [self.ValidNbGen, self.ValidNbGenFreq, self.ValidNbChrom, self.ValidNbTopChrom,
                           self.ValidCrossRate, self.ValidMutaRate, self.ValidFitAlpha, self.ValidFitPeak,
                           self.ValidFitScale, self.ValidRepSS, #self.ValidRepB, 
-                          self.ValidAGAk1, self.ValidAGAk2, self.ValidAGAk3, self.ValidAGAk4]
+                          self.ValidAGAk1, self.ValidAGAk2, self.ValidAGAk3, self.ValidAGAk4,
+                          self.ValidStopWindow, self.ValidStopTolerance]
         
         return self.fGAParam
 
@@ -435,6 +483,18 @@ class GAParam(Tabs.Tab):
             self.entPeak.config(state='disabled')
             self.entScale.config(state='disabled')
 
+    ''' ==================================================================================
+    FUNCTION EarlyStop_Toggle: Disables/enables the edit box according to checkstate
+    =================================================================================  '''    
+    def EarlyStop_Toggle(self, *args):
+        
+        if self.EarlyStop.get() == 1:
+            self.entStopWindow.config(state='normal')
+            self.entStopTolerance.config(state='normal')
+        else:
+            self.entStopWindow.config(state='disabled')
+            self.entStopTolerance.config(state='disabled')
+
     ''' ==================================================================================
     FUNCTION AGA_Toggle: Disables/enables the edit box according to checkstate
     =================================================================================  '''    
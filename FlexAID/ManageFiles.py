@@ -59,6 +59,10 @@ class Manage(object):
         
         self.TmpFile = os.path.join(self.FlexAID.FlexAIDTempProject_Dir,'file.tmp')
 
+        # FlexAID waits for NRGsuite to read its .update files
+        self.NRGsuite = True
+        self.Temp_Dir = self.FlexAID.FlexAIDTempProject_Dir
+
         self.VarAtoms = list()
         self.listTmpPDB = list()
         self.RecAtom = dict()
@@ -75,7 +79,14 @@ class Manage(object):
         self.Now = self.Now.replace(':','-')
         self.Now = self.Now.replace(' ','-')
         
-        self.FlexAIDRunSimulationProject_Dir = os.path.join(self.FlexAID.FlexAIDSimulationProject_Dir,self.COMPLEX,self.Now)
+        self.Reference_RunFolder(os.path.join(self.FlexAID.FlexAIDSimulationProject_Dir,self.COMPLEX,self.Now))
+
+    ''' ==============================================================================
+    @summary: Reference_RunFolder: Create file references of a simulation folder
+    ============================================================================== '''          
+    def Reference_RunFolder(self, Run_Dir):
+
+        self.FlexAIDRunSimulationProject_Dir = Run_Dir
         
         self.BINDINGSITE = os.path.join(self.FlexAIDRunSimulationProject_Dir,'binding_site.pdb')
         
@@ -88,6 +99,7 @@ class Manage(object):
         self.CONFIG = os.path.join(self.FlexAIDRunSimulationProject_Dir,'CONFIG.inp')
         self.ga_inp = os.path.join(self.FlexAIDRunSimulationProject_Dir,'ga_inp.dat')
         self.Report = os.path.join(self.FlexAIDRunSimulationProject_Dir,'report.txt')
+        self.TELEMETRY = os.path.join(self.FlexAIDRunSimulationProject_Dir,'telemetry.csv')
         
     ''' ==============================================================================
     @summary: Create_Folders: Creation AND/OR copy of the required files  
@@ -328,15 +340,16 @@ class Manage(object):
         
         # output/input paths
         lines += 'STATEP ' + self.FlexAIDRunSimulationProject_Dir  + '\n'
-        lines += 'TEMPOP ' + self.FlexAID.FlexAIDTempProject_Dir  + '\n'
+        lines += 'TEMPOP ' + self.Temp_Dir  + '\n'
         lines += 'DEPSPA ' + os.path.join(self.FlexAID.FlexAIDInstall_Dir,'deps') + '\n'
         
         # maximum number of results
         lines += 'MAXRES ' + str(self.NUMBER_RESULTS) + '\n'
         
         # nrgsuite related variables
-        lines += 'NRGSUI' + '\n'
-        lines += 'NRGOUT 60' + '\n'
+        if self.NRGsuite:
+            lines += 'NRGSUI' + '\n'
+            lines += 'NRGOUT 60' + '\n'
         lines += 'GRDBUF 1000' + '\n'
         
         lines += 'ENDINP\n'
@@ -902,4 +915,141 @@ class Manage(object):
             report_file.write('%-40s%s\n' % ('Allow duplicates', 'No'))
             
         return
+
+    ''' ==================================================================================
+    @summary: Write_RestoredReport: Marks the report of a run whose results were restored
+                                    from the result store
+    ================================================================================== '''
+    def Write_RestoredReport(self, Key):
+
+        try:
+            report_file = open(self.Report, 'a')
+            report_file.write('\n')
+            report_file.write('%-40s%s\n' % ('Results restored from the store', Key))
+            report_file.write('%-40s%s\n' % ('Report of the stored simulation', ResultStore.Get_RestoredName('report.txt')))
+            report_file.close()
+        except IOError:
+            return False
+
+        return True
         
+
+class ResultStore(object):
+
+    # Maximum size of the store (bytes)
+    MAX_SIZE = 500 * 1024 * 1024
+
+    # Files of a simulation served by the store
+    PATTERNS = [ 'RESULT_*', 'report.txt' ]
+
+    def __init__(self, Store_Dir, MaxSize=MAX_SIZE):
+
+        self.Store_Dir = Store_Dir
+        self.MaxSize = MaxSize
+
+    ''' ==================================================================================
+    @summary: Key: Returns the key of a simulation from its CONFIG digest and GA parameters
+    ================================================================================== '''
+    def Key(self, ConfigMD5, GAInpFile):
+
+        hasher = hashlib.md5()
+        hasher.update(ConfigMD5)
+
+        return General.hashfile_update(GAInpFile, hasher).hexdigest()
+
+    ''' ==================================================================================
+    @summary: Get: Copies the stored results of a simulation to the run folder
+    ================================================================================== '''
+    def Get(self, Key, Run_Dir):
+
+        Entry_Dir = os.path.join(self.Store_Dir,Key)
+        if not os.path.isdir(Entry_Dir):
+            return False
+
+        try:
+            for file in os.listdir(Entry_Dir):
+                # files of the new run (its report) are never overwritten
+                Target = os.path.join(Run_Dir,file)
+                if os.path.exists(Target):
+                    Target = os.path.join(Run_Dir,self.Get_RestoredName(file))
+
+                shutil.copy(os.path.join(Entry_Dir,file), Target)
+
+            # most recently used
+            os.utime(Entry_Dir, None)
+
+        except (IOError, OSError, shutil.Error):
+            return False
+
+        return True
+
+    ''' ==================================================================================
+    @summary: Get_RestoredName: Returns the name of a stored file already in the run folder
+    ================================================================================== '''
+    @staticmethod
+    def Get_RestoredName(file):
+
+        root, ext = os.path.splitext(file)
+
+        return root + '_restored' + ext
+
+    ''' ==================================================================================
+    @summary: Set: Stores the results of a completed simulation then trims the store
+    ================================================================================== '''
+    def Set(self, Key, Run_Dir):
+
+        Entry_Dir = os.path.join(self.Store_Dir,Key)
+        if os.path.isdir(Entry_Dir):
+            return True
+
+        TmpEntry_Dir = Entry_Dir + '.%d.tmp' % os.getpid()
+
+        try:
+            if not os.path.isdir(TmpEntry_Dir):
+                os.makedirs(TmpEntry_Dir)
+
+            for pattern in self.PATTERNS:
+                for file in glob.glob(os.path.join(Run_Dir,pattern)):
+                    shutil.copy(file, TmpEntry_Dir)
+
+            # an entry is only visible once complete
+            os.rename(TmpEntry_Dir, Entry_Dir)
+
+        except (IOError, OSError, shutil.Error):
+            shutil.rmtree(TmpEntry_Dir, True)
+            return False
+
+        self.Trim()
+
+        return True
+
+    ''' ==================================================================================
+    @summary: Trim: Removes the least recently used entries above the maximum size
+    ================================================================================== '''
+    def Trim(self):
+
+        listEntries = list()
+        Size = 0
+
+        for Key in os.listdir(self.Store_Dir):
+            Entry_Dir = os.path.join(self.Store_Dir,Key)
+            if not os.path.isdir(Entry_Dir) or Key.endswith('.tmp'):
+                continue
+
+            try:
+                EntrySize = 0
+                for file in os.listdir(Entry_Dir):
+                    EntrySize += os.path.getsize(os.path.join(Entry_Dir,file))
+
+                listEntries.append(( os.path.getmtime(Entry_Dir), EntrySize, Entry_Dir ))
+                Size += EntrySize
+
+            except OSError:
+                continue
+
+        for Used, EntrySize, Entry_Dir in sorted(listEntries):
+            if Size <= self.MaxSize:
+                break
+
+            shutil.rmtree(Entry_Dir, True)
+            Size -= EntrySize
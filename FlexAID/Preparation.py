@@ -0,0 +1,291 @@
+'''
+    NRGsuite: PyMOL molecular tools interface
+    Copyright (C) 2011 Gaudreault, F., Morency, LP. & Najmanovich, R.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+
+from __future__ import print_function
+
+'''
+@title: Preparation.py
+
+@summary: Headless preparation of a ligand library for FlexAID. Each molecule is processed
+          into its .inp, .ic and _ref.pdb files by Process_Ligand, with a bounded number
+          of concurrent processes. Processed ligands are cached by the content of the
+          molecule file and the processing options, so a library is only processed once.
+          The atom typing is not a processing option: it is chosen when docking
+          (Screening.py -p AtomTypes=...).
+
+          Run with python -O (PyMOL-only modules are imported under __debug__):
+          python -O Preparation.py -l MoleculeDir -o LigandDir [-j 8] [--gen3D] [-c CacheDir]
+'''
+
+import sys, os
+import glob
+import shutil
+import tempfile
+import threading
+import multiprocessing
+
+from subprocess import Popen, PIPE
+
+if sys.version_info[0] < 3:
+    import Queue
+else:
+    import queue as Queue
+
+# NRGsuite modules are found relative to this file (as in the PyMOL plugin)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ProcessLigand
+
+# First atom number of the ligand (see IOFile.ATOM_INDEX)
+ATOM_INDEX = 90000
+
+# Molecule formats read by Process_Ligand
+MOLECULE_EXTENSIONS = [ '.mol2', '.pdb', '.sdf', '.mol', '.smi' ]
+
+""" *********************************************************************************
+    CLASS Preparation: Processes a library of molecules with a bounded number of processes
+    ********************************************************************************* """
+class Preparation(object):
+
+    def __init__(self, Install_Dir, listMolecules, Output_Dir, Cache_Dir='', Jobs=1,
+                 AnchorAtom=-1, Gen3D=False):
+
+        self.FlexAIDWRKInstall_Dir = os.path.join(Install_Dir,'FlexAID','WRK')
+
+        if sys.platform.startswith('win'):
+            self.OSid = 'WIN'
+            self.Process_LigandExecutable = os.path.join(self.FlexAIDWRKInstall_Dir,'Process_Ligand.exe')
+        elif sys.platform == 'darwin':
+            self.OSid = 'MAC'
+            self.Process_LigandExecutable = os.path.join(self.FlexAIDWRKInstall_Dir,'Process_Ligand')
+        else:
+            self.OSid = 'LINUX'
+            self.Process_LigandExecutable = os.path.join(self.FlexAIDWRKInstall_Dir,'Process_Ligand')
+
+        self.listMolecules = listMolecules
+        self.Output_Dir = os.path.abspath(Output_Dir)
+        self.Cache_Dir = os.path.abspath(Cache_Dir or os.path.join(self.Output_Dir,'.Cache'))
+        self.Jobs = max(1, Jobs)
+
+        self.AnchorAtom = AnchorAtom
+        self.Gen3D = Gen3D
+
+        # environment of the executable, set once for all processes
+        self.Environment = dict(os.environ)
+        self.Environment.update(ProcessLigand.Get_Environment(self.OSid, self.FlexAIDWRKInstall_Dir))
+
+        self.Pending = Queue.Queue()
+        self.listPrepared = list()
+        self.listRun = list()
+        self.Lock = threading.Lock()
+        self.Cancelled = False
+        self.Cached = 0
+
+    ''' ==================================================================================
+    @summary: Run: Prepares all the molecules; returns the .inp files of the prepared ligands
+    ================================================================================== '''
+    def Run(self):
+
+        if not os.path.isfile(self.Process_LigandExecutable):
+            print('  FATAL ERROR: Could not find the executable ' + self.Process_LigandExecutable)
+            return None
+
+        for Dir in [ self.Output_Dir, self.Cache_Dir ]:
+            if not os.path.isdir(Dir):
+                os.makedirs(Dir)
+
+        for MoleculeFile, Filebase in self.Get_Filebases():
+            self.Pending.put(( MoleculeFile, Filebase ))
+
+        print('  Preparing ' + str(self.Pending.qsize()) + ' molecule(s) with ' + str(self.Jobs) + ' process(es)')
+
+        listWorkers = list()
+        for i in range(self.Jobs):
+            Worker = threading.Thread(target=self.Worker)
+            Worker.daemon = True
+            Worker.start()
+            listWorkers.append(Worker)
+
+        try:
+            for Worker in listWorkers:
+                while Worker.is_alive():
+                    Worker.join(1.0)
+        except KeyboardInterrupt:
+            self.Cancel()
+            for Worker in listWorkers:
+                Worker.join()
+
+        print('  ' + str(len(self.listPrepared)) + ' ligand(s) prepared in ' + self.Output_Dir +
+              ' (' + str(self.Cached) + ' from the cache)')
+
+        return sorted(self.listPrepared)
+
+    ''' ==================================================================================
+    @summary: Get_Filebases: Returns the molecules with the base path of their processed files.
+                             Molecules of the same name (a.mol2, a.sdf) keep their format in
+                             the name (a_mol2, a_sdf) instead of overwriting each other
+    ================================================================================== '''
+    def Get_Filebases(self):
+
+        dictNames = dict()
+        for MoleculeFile in self.listMolecules:
+            Name = os.path.splitext(os.path.basename(MoleculeFile))[0]
+            dictNames.setdefault(Name, list()).append(os.path.abspath(MoleculeFile))
+
+        listFilebases = list()
+        for Name in sorted(dictNames):
+            for MoleculeFile in dictNames[Name]:
+                LigandName = Name
+                if len(dictNames[Name]) > 1:
+                    LigandName = Name + '_' + os.path.splitext(MoleculeFile)[1][1:]
+                    print('  WARNING: Several molecules are named ' + Name + ', ' + os.path.basename(MoleculeFile) +
+                          ' is prepared as ' + LigandName)
+
+                listFilebases.append(( MoleculeFile, os.path.join(self.Output_Dir, LigandName) ))
+
+        return listFilebases
+
+    ''' ==================================================================================
+    @summary: Worker: Prepares pending molecules until none is left
+    ================================================================================== '''
+    def Worker(self):
+
+        while not self.Cancelled:
+
+            try:
+                MoleculeFile, Filebase = self.Pending.get_nowait()
+            except Queue.Empty:
+                break
+
+            if self.Prepare(MoleculeFile, Filebase):
+                with self.Lock:
+                    self.listPrepared.append(Filebase + '.inp')
+
+    ''' ==================================================================================
+    @summary: Prepare: Writes the processed files of a molecule to Filebase(.inp, .ic, _ref.pdb)
+    ================================================================================== '''
+    def Prepare(self, MoleculeFile, Filebase):
+
+        try:
+            Key = ProcessLigand.Get_LigandKey( MoleculeFile, self.Process_LigandExecutable, ATOM_INDEX,
+                                               self.AnchorAtom, False, self.Gen3D )
+        except (IOError, OSError):
+            print('  ERROR: Could not read the molecule ' + MoleculeFile)
+            return False
+
+        if ProcessLigand.Get_CachedLigand(self.Cache_Dir, Key, Filebase):
+            with self.Lock:
+                self.Cached += 1
+            return True
+
+        # processed in a folder of its own: the files are written next to the molecule
+        Work_Dir = tempfile.mkdtemp(dir=self.Cache_Dir)
+
+        try:
+            TmpMoleculeFile = os.path.join(Work_Dir, os.path.basename(MoleculeFile))
+            shutil.copy(MoleculeFile, TmpMoleculeFile)
+
+            commandline = ProcessLigand.Get_CommandLine( self.Process_LigandExecutable, TmpMoleculeFile,
+                                                         ATOM_INDEX, self.AnchorAtom, False, False,
+                                                         self.Gen3D, False )
+
+            # exec so that killing the shell kills Process_Ligand
+            if self.OSid != 'WIN':
+                commandline = 'exec ' + commandline
+
+            with self.Lock:
+                if self.Cancelled:
+                    return False
+
+                Run = Popen(commandline, shell=(self.OSid != 'WIN'), stderr=PIPE, stdout=PIPE,
+                            env=self.Environment)
+                self.listRun.append(Run)
+
+            out, err = Run.communicate()
+
+            with self.Lock:
+                self.listRun.remove(Run)
+
+            if Run.returncode != 0:
+                print('  ERROR: Could not process the molecule ' + MoleculeFile)
+                return False
+
+            TmpFilebase = os.path.splitext(TmpMoleculeFile)[0]
+            if not ProcessLigand.Set_CachedLigand(self.Cache_Dir, Key, TmpFilebase) or \
+               not ProcessLigand.Get_CachedLigand(self.Cache_Dir, Key, Filebase):
+                print('  ERROR: Could not store the processed files of ' + MoleculeFile)
+                return False
+
+        except (IOError, OSError):
+            print('  ERROR: Could not process the molecule ' + MoleculeFile)
+            return False
+
+        finally:
+            shutil.rmtree(Work_Dir, True)
+
+        return True
+
+    ''' ==================================================================================
+    @summary: Cancel: Stops the pending preparations and kills the running ones
+    ================================================================================== '''
+    def Cancel(self):
+
+        with self.Lock:
+            self.Cancelled = True
+
+            for Run in self.listRun:
+                try:
+                    Run.kill()
+                except:
+                    pass
+
+
+''' ==================================================================================
+FUNCTION Get_Molecules: Returns the molecule files of a library folder
+==================================================================================  '''
+def Get_Molecules(Library_Dir):
+
+    listMolecules = list()
+    for MoleculeFile in sorted(glob.glob(os.path.join(Library_Dir,'*'))):
+        if os.path.splitext(MoleculeFile)[1].lower() in MOLECULE_EXTENSIONS:
+            listMolecules.append(MoleculeFile)
+
+    return listMolecules
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless preparation of a ligand library for FlexAID')
+    parser.add_argument('-l', '--library', required=True, help='folder of molecules (.mol2, .pdb, .sdf, .mol, .smi)')
+    parser.add_argument('-o', '--output', required=True, help='output folder of the processed ligands')
+    parser.add_argument('-c', '--cache', default='', help='cache folder (default: OUTPUT/.Cache)')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='concurrent Process_Ligand processes')
+    parser.add_argument('-a', '--anchor', type=int, default=-1, help='anchor atom of the ligands')
+    parser.add_argument('--gen3D', action='store_true', help='generate 3D coordinates')
+    parser.add_argument('-i', '--install', default=os.environ.get('NRGSUITE_INSTALLATION', ''), help='NRGsuite installation folder')
+
+    args = parser.parse_args()
+
+    Prep = Preparation(args.install, Get_Molecules(args.library), args.output, args.cache, args.jobs,
+                       args.anchor, args.gen3D)
+
+    if Prep.Run() is None:
+        sys.exit(1)
@@ -32,16 +32,122 @@ from __future__ import print_function
 '''
 
 from shutil import copy, Error
-from pymol import cmd
 
 import os
 import time
 import shutil
+import hashlib
 import threading
 import General
 
 from subprocess import Popen, PIPE
 
+if __debug__:
+    from pymol import cmd
+
+# Files generated by the processing of a ligand
+LIGAND_EXTENSIONS = [ '.inp', '.ic', '_ref.pdb' ]
+
+'''
+@summary: Get_CommandLine: Returns the command-line processing a molecule
+'''  
+def Get_CommandLine(Executable, MoleculeFile, StartAtomIndex, AnchorAtom,
+                    ConvertOnly, ProcessOnly, Gen3D, Target):
+
+    # Set the command-line arguments to process ligand
+    commandline = '"' + Executable + '"'
+
+    commandline += ' -f ' + '"' + MoleculeFile + '"'
+    
+    if Target:
+        # use default outputting for the target
+        commandline += ' -target'
+    else:
+        if Gen3D:
+            commandline += ' --gen3D'
+
+        if ConvertOnly:
+            commandline += ' -c'
+        else:
+            if ProcessOnly:
+                commandline += ' -p'
+            
+            commandline += ' --atom_index ' + str(StartAtomIndex)
+            commandline += ' -ref'
+            
+            if AnchorAtom != -1:
+                commandline += ' --force_gpa ' + str(AnchorAtom)
+
+    return commandline
+
+'''
+@summary: Get_Environment: Returns the environment variables required by the executable
+'''  
+def Get_Environment(OSid, WRK_Dir):
+
+    dictEnv = { 'BABEL_DATADIR': os.path.join(WRK_Dir,'data') }
+
+    if OSid == 'LINUX':
+        dictEnv['LD_LIBRARY_PATH'] = os.path.join(WRK_Dir,'libs')
+        dictEnv['BABEL_LIBDIR'] = os.path.join(WRK_Dir,'formats')
+
+    elif OSid == 'MAC':
+        dictEnv['DYLD_LIBRARY_PATH'] = os.path.join(WRK_Dir,'libs')
+        dictEnv['BABEL_LIBDIR'] = os.path.join(WRK_Dir,'formats')
+
+    return dictEnv
+
+'''
+@summary: Get_LigandKey: Returns the cache key of a ligand processed with the given options
+          (the atom typing is applied by FlexAID, not by Process_Ligand)
+'''  
+def Get_LigandKey(MoleculeFile, Executable, StartAtomIndex, AnchorAtom, ProcessOnly, Gen3D):
+
+    hasher = General.hashfile_update(MoleculeFile, hashlib.md5())
+
+    hasher.update(('%d %d %d %d %d' % ( int(StartAtomIndex), int(AnchorAtom),
+                                        int(ProcessOnly), int(Gen3D),
+                                        int(os.path.getmtime(Executable)) )).encode('utf-8'))
+
+    return hasher.hexdigest()
+
+'''
+@summary: Get_CachedLigand: Copies the cached files of a ligand to Filebase(.inp, .ic, _ref.pdb)
+'''  
+def Get_CachedLigand(Cache_Dir, Key, Filebase):
+
+    for Extension in LIGAND_EXTENSIONS:
+        if not os.path.isfile(os.path.join(Cache_Dir,Key + Extension)):
+            return False
+
+    try:
+        for Extension in LIGAND_EXTENSIONS:
+            copy(os.path.join(Cache_Dir,Key + Extension), Filebase + Extension)
+    except (IOError, Error):
+        return False
+
+    return True
+
+'''
+@summary: Set_CachedLigand: Stores the files Filebase(.inp, .ic, _ref.pdb) of a ligand in the cache
+'''  
+def Set_CachedLigand(Cache_Dir, Key, Filebase):
+
+    try:
+        if not os.path.isdir(Cache_Dir):
+            os.makedirs(Cache_Dir)
+
+        # the .inp is stored last: an entry is complete once all its files exist
+        for Extension in reversed(LIGAND_EXTENSIONS):
+            TmpFile = os.path.join(Cache_Dir,Key + Extension + '.%d.tmp' % os.getpid())
+            copy(Filebase + Extension, TmpFile)
+            os.rename(TmpFile, os.path.join(Cache_Dir,Key + Extension))
+
+    except (IOError, OSError, Error):
+        return False
+
+    return True
+
 
 #class ProcLig(threading.Thread):
 class ProcLig(object):
@@ -79,7 +185,17 @@ class ProcLig(object):
         self.FlexAID.ProcessRunning = True
         
         if not self.Copy_MoleculeFile():
-            rv = self.process()
+            if self.Target and self.Get_CachedTarget():
+                rv = False
+            elif not self.Target and self.Get_CachedLigand():
+                rv = False
+            else:
+                rv = self.process()
+                if not rv:
+                    if self.Target:
+                        self.Set_CachedTarget()
+                    else:
+                        self.Set_CachedLigand()
         
         self.Callback(False, '', 0, '', 0, False, False, 0, False, '')
         self.FlexAID.ProcessRunning = False
@@ -91,58 +207,22 @@ class ProcLig(object):
     '''  
     def process(self):
 
-        # Set the command-line arguments to process ligand
-        commandline = '"' + self.FlexAID.Process_LigandExecutable + '"'
-
-        commandline += ' -f ' + '"' + self.TmpMoleculeFile + '"'
-        
-        if self.Target:
-            # use default outputting for the target
-            commandline += ' -target'
-        else:
-            #commandline += ' -o ' + '"' + os.path.join(self.FlexAID.FlexAIDTempProject_Dir,'LIGAND') + '"'
-        
-            if self.Gen3D:
-                commandline += ' --gen3D'
-
-            if self.ConvertOnly:
-                commandline += ' -c'
-            else:
-                if self.ProcessOnly:
-                    commandline += ' -p'
-                
-                commandline += ' --atom_index ' + str(self.StartAtomIndex)
-                commandline += ' -ref'
-                
-                #if self.AtomTypes == 'Sobolev':
-                #    commandline += ' --old_types'
-                #elif self.AtomTypes == 'Gaudreault':
-                #    commandline += ' --new_types'
-                #elif self.AtomTypes == 'Sybyl':
-                #    commandline += ' --babel_types'
-                
-                if self.AnchorAtom != -1:
-                    commandline += ' --force_gpa ' + str(self.AnchorAtom)
+        commandline = Get_CommandLine( self.FlexAID.Process_LigandExecutable, self.TmpMoleculeFile,
+                                       self.StartAtomIndex, self.AnchorAtom, self.ConvertOnly,
+                                       self.ProcessOnly, self.Gen3D, self.Target )
         
         print(commandline)
         
         # Execute command-line
         try:
         
+            dictEnv = Get_Environment(self.FlexAID.OSid, self.FlexAIDWRKInstall_Dir)
+            for variable in dictEnv:
+                self.set_environment(variable, dictEnv[variable])
+
             if self.FlexAID.OSid == 'WIN':
-                self.set_environment('BABEL_DATADIR', os.path.join(self.FlexAIDWRKInstall_Dir,'data'))
                 self.FlexAID.Run = Popen(commandline, shell=False, stderr=PIPE, stdout=PIPE)
-                                                
-            elif self.FlexAID.OSid == 'LINUX':
-                self.set_environment('LD_LIBRARY_PATH', os.path.join(self.FlexAIDWRKInstall_Dir,'libs'))
-                self.set_environment('BABEL_LIBDIR', os.path.join(self.FlexAIDWRKInstall_Dir,'formats'))
-                self.set_environment('BABEL_DATADIR', os.path.join(self.FlexAIDWRKInstall_Dir,'data'))
-                self.FlexAID.Run = Popen(commandline, shell=True, stderr=PIPE, stdout=PIPE)
-                
-            elif self.FlexAID.OSid == 'MAC':
-                self.set_environment('DYLD_LIBRARY_PATH', os.path.join(self.FlexAIDWRKInstall_Dir,'libs'))
-                self.set_environment('BABEL_LIBDIR', os.path.join(self.FlexAIDWRKInstall_Dir,'formats'))
-                self.set_environment('BABEL_DATADIR', os.path.join(self.FlexAIDWRKInstall_Dir,'data'))
+            else:
                 self.FlexAID.Run = Popen(commandline, shell=True, stderr=PIPE, stdout=PIPE)
 
             #self.FlexAID.Run.wait()
@@ -182,6 +262,94 @@ class ProcLig(object):
         
         return 0
     
+    '''
+    @summary: Get_CachedTargetPath: Returns the cached processed target matching the saved
+                                    coordinates of the target and the processing executable
+    '''  
+    def Get_CachedTargetPath(self):
+
+        try:
+            Key = General.hashcoordinates(self.TmpMoleculeFile)
+            Key += '-%d' % os.path.getmtime(self.FlexAID.Process_LigandExecutable)
+        except (IOError, OSError):
+            return ''
+
+        return os.path.join(self.FlexAID.FlexAIDCacheProject_Dir,'Target',Key + '.inp.pdb')
+
+    '''
+    @summary: Get_CachedTarget: Copies the cached processed target in the temp folder
+    '''  
+    def Get_CachedTarget(self):
+
+        self.CachedTargetPath = self.Get_CachedTargetPath()
+
+        if not self.CachedTargetPath or not os.path.isfile(self.CachedTargetPath):
+            return False
+
+        try:
+            copy(self.CachedTargetPath, os.path.splitext(self.TmpMoleculeFile)[0] + '.inp.pdb')
+        except (IOError, Error):
+            return False
+
+        print("Using cached processed target " + self.CachedTargetPath)
+
+        return True
+
+    '''
+    @summary: Set_CachedTarget: Stores the processed target in the cache
+    '''  
+    def Set_CachedTarget(self):
+
+        if not self.CachedTargetPath:
+            return
+
+        try:
+            Cache_Dir = os.path.dirname(self.CachedTargetPath)
+            if not os.path.isdir(Cache_Dir):
+                os.makedirs(Cache_Dir)
+
+            # written aside then renamed so concurrent runs never read a partial file
+            TmpFile = self.CachedTargetPath + '.%d.tmp' % os.getpid()
+            copy(os.path.splitext(self.TmpMoleculeFile)[0] + '.inp.pdb', TmpFile)
+            os.rename(TmpFile, self.CachedTargetPath)
+
+        except (IOError, OSError, Error):
+            pass
+
+    '''
+    @summary: Get_CachedLigand: Copies the cached processed ligand in the temp folder
+    '''  
+    def Get_CachedLigand(self):
+
+        self.LigandKey = ''
+
+        if self.ConvertOnly:
+            return False
+
+        try:
+            self.LigandKey = Get_LigandKey( self.TmpMoleculeFile, self.FlexAID.Process_LigandExecutable,
+                                            self.StartAtomIndex, self.AnchorAtom,
+                                            self.ProcessOnly, self.Gen3D )
+        except (IOError, OSError):
+            return False
+
+        if not Get_CachedLigand( os.path.join(self.FlexAID.FlexAIDCacheProject_Dir,'Ligand'), self.LigandKey,
+                                 os.path.splitext(self.TmpMoleculeFile)[0] ):
+            return False
+
+        print("Using cached processed ligand " + self.LigandKey)
+
+        return True
+
+    '''
+    @summary: Set_CachedLigand: Stores the processed ligand in the cache
+    '''  
+    def Set_CachedLigand(self):
+
+        if self.LigandKey:
+            Set_CachedLigand( os.path.join(self.FlexAID.FlexAIDCacheProject_Dir,'Ligand'), self.LigandKey,
+                              os.path.splitext(self.TmpMoleculeFile)[0] )
+
     '''
     @summary: set_environment sets a environment variable
     '''  
@@ -0,0 +1,656 @@
+'''
+    NRGsuite: PyMOL molecular tools interface
+    Copyright (C) 2011 Gaudreault, F., Morency, LP. & Najmanovich, R.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+
+from __future__ import print_function
+
+'''
+@title: Replay.py
+
+@summary: Offline replay of a FlexAID logfile through the parser of the simulations
+          (Simulation.Parse) and the reconstruction of the TOP poses (UpdateScreen), with
+          PyMOL replaced by a stub. Reports the lines and generations parsed per second and
+          the time spent in each stage. A synthetic run (processed ligand and logfile) can be
+          generated for scaling tests.
+
+          Run with python -O (PyMOL-only modules are imported under __debug__):
+          python -O Replay.py generate -o RunDir [-g 1000] [-t 10] [-a 30] [-f 5]
+          python -O Replay.py build [-a 30 60] [-t 10 50]
+          python -O Replay.py replay -l RunDir/log.txt --ligand RunDir/LIG [-u UpdateDir] [-t 10] [--render-all]
+'''
+
+import sys, os
+import glob
+import time
+import types
+import random
+import shutil
+import fnmatch
+import tempfile
+
+from collections import defaultdict
+
+if sys.version_info[0] < 3:
+    import Queue
+else:
+    import queue as Queue
+
+# NRGsuite modules are found relative to this file (as in the PyMOL plugin)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+""" *********************************************************************************
+    CLASS StubCmd: Stand-in for pymol.cmd. Keeps only the object names and the ligand
+                   atom IDs needed by UpdateScreen; every other call does nothing
+    ********************************************************************************* """
+class StubCmd(object):
+
+    def __init__(self):
+
+        self.setNames = set()
+        self.LigandIDs = list()
+
+    def __getattr__(self, name):
+
+        return self.Nothing
+
+    def Nothing(self, *args, **kwargs):
+
+        return None
+
+    def get(self, name, *args, **kwargs):
+
+        return '0'
+
+    def get_names(self, *args, **kwargs):
+
+        return list(self.setNames)
+
+    def create(self, name, *args, **kwargs):
+
+        self.setNames.add(name)
+
+    def delete(self, name, *args, **kwargs):
+
+        for Object in fnmatch.filter(list(self.setNames), name):
+            self.setNames.discard(Object)
+
+    def count_states(self, selection='(all)', *args, **kwargs):
+
+        # the solution objects have a single state
+        return 1 if selection in self.setNames else 0
+
+    def load_coords(self, coords, selection, state=1, *args, **kwargs):
+
+        return None
+
+    def iterate(self, selection, expression, space=None, *args, **kwargs):
+
+        if space is not None and 'resn LIG' in selection:
+            space['IDs'].extend(self.LigandIDs)
+
+    def get_dihedral(self, *args, **kwargs):
+
+        return 0.0
+
+# PyMOL is replaced before the modules of the simulation are imported
+cmd = StubCmd()
+
+pymol = types.ModuleType('pymol')
+pymol.cmd = cmd
+pymol.util = StubCmd()
+
+sys.modules['pymol'] = pymol
+
+import Color
+import Geometry
+import ManageFiles
+import Simulation
+import UpdateScreen
+import Timers
+
+from Screening import Value, Section, Read_FlexBonds
+
+# First atom number of the ligand (see IOFile.ATOM_INDEX)
+ATOM_INDEX = 90000
+
+# Lines read at once from the logfile (a read of the parser)
+CHUNK = 4096
+
+""" *********************************************************************************
+    CLASS Stages: Exclusive time spent in named stages (nested stages are not counted
+                  in the stage that called them)
+    ********************************************************************************* """
+class Stages(object):
+
+    def __init__(self):
+
+        self.dictTime = defaultdict(float)
+        self.dictCalls = defaultdict(int)
+        self.Stack = list()
+
+    ''' ==================================================================================
+    @summary: Enter: Starts timing a stage
+    ================================================================================== '''
+    def Enter(self, Stage):
+
+        self.Stack.append( [ Stage, time.time(), 0.0 ] )
+
+    ''' ==================================================================================
+    @summary: Leave: Stops timing the current stage
+    ================================================================================== '''
+    def Leave(self):
+
+        Stage, Start, Nested = self.Stack.pop()
+        Elapsed = time.time() - Start
+
+        self.dictTime[Stage] += Elapsed - Nested
+        self.dictCalls[Stage] += 1
+
+        if self.Stack:
+            self.Stack[-1][2] += Elapsed
+
+    ''' ==================================================================================
+    @summary: Wrap: Times every call of the function Name of Owner (class or module)
+    ================================================================================== '''
+    def Wrap(self, Owner, Name, Stage):
+
+        Function = getattr(Owner, Name)
+
+        def Timed(*args, **kwargs):
+            self.Enter(Stage)
+            try:
+                return Function(*args, **kwargs)
+            finally:
+                self.Leave()
+
+        setattr(Owner, Name, Timed)
+
+""" *********************************************************************************
+    CLASS Source: Serves the recorded lines to the parser, chunk by chunk for the logfile
+                  and one snapshot at a time for the .update file
+    ********************************************************************************* """
+class Source(object):
+
+    def __init__(self, LogFile, listSnapshots, Chunk):
+
+        self.LogHandle = open(LogFile, 'r')
+        self.listSnapshots = list(listSnapshots)
+        self.Chunk = Chunk
+
+        self.Done = False
+        self.Lines = 0
+        self.Generations = 0
+
+    ''' ==================================================================================
+    @summary: Read: Returns the next lines of the logfile (or of the next snapshot)
+    ================================================================================== '''
+    def Read(self, Update):
+
+        if Update and self.listSnapshots:
+            handle = open(self.listSnapshots.pop(0), 'r')
+            Lines = handle.readlines()
+            handle.close()
+        else:
+            Lines = list()
+            for Line in self.LogHandle:
+                Lines.append(Line)
+                if len(Lines) == self.Chunk:
+                    break
+
+        if not Lines:
+            self.Done = True
+
+        self.Lines += len(Lines)
+        self.Generations += sum(1 for Line in Lines if Line.startswith('Generation:'))
+
+        return Lines
+
+    ''' ==================================================================================
+    @summary: Close: Closes the logfile
+    ================================================================================== '''
+    def Close(self):
+
+        self.LogHandle.close()
+
+""" *********************************************************************************
+    CLASS ReplayParse: Parser of the simulations fed by a Source instead of the live files
+    ********************************************************************************* """
+class ReplayParse(Simulation.Parse):
+
+    def __init__(self, top, queue, Source, RenderAll):
+
+        self.Source = Source
+        self.RenderAll = RenderAll
+
+        Simulation.Parse.__init__(self, top, queue)
+
+    # the replay drives ParseLines itself
+    def start(self):
+
+        pass
+
+    def TailRead(self, ParseFile):
+
+        self.Lines = self.Source.Read(ParseFile == self.UPDATE)
+
+        return 0
+
+    # snapshots are read in order: nothing to remove
+    def Remove_UPDATE(self):
+
+        return 0
+
+    def Schedule_Render(self, Stale):
+
+        if self.RenderAll:
+            return 1
+
+        return Simulation.Parse.Schedule_Render(self, Stale)
+
+""" *********************************************************************************
+    CLASS ReplayTop: Stand-in for the Simulate tab (the methods queued for Tk do nothing)
+    ********************************************************************************* """
+class ReplayTop(object):
+
+    INTERVAL = 0.10
+    TIMEOUT = INTERVAL * 300
+    RENDER_RATE = 4.0
+    PIPE_OUTPUT = False
+    PIPE_BUFFER = 10000
+
+    def __init__(self, FlexAID, NbTopChrom):
+
+        self.top = FlexAID
+
+        self.Paused = False
+        self.Results = False
+        self.SimLigDisplay = Value('sticks')
+        self.PymolColorList = Color.GetHeatColorList(NbTopChrom, False)
+
+        self.dictSimData = dict()
+        for key in range(1, NbTopChrom + 1):
+            self.dictSimData[key] = [ 0.0, 0.0, 0.0, 'N/A' ]
+
+        self.Manage = ManageFiles.Manage(self)
+
+    def __getattr__(self, name):
+
+        return self.Nothing
+
+    def Nothing(self, *args, **kwargs):
+
+        return None
+
+""" *********************************************************************************
+    CLASS Replay: Replays a logfile through the parser and reports the throughput
+    ********************************************************************************* """
+class Replay(object):
+
+    def __init__(self, LogFile, Ligand, listSnapshots, Output_Dir, NbGen, NbTopChrom,
+                 Translation=1, Rotation=1, UseReference=0, RenderAll=False, Chunk=CHUNK):
+
+        self.LogFile = os.path.abspath(LogFile)
+        self.Ligand = os.path.abspath(Ligand)
+        self.listSnapshots = listSnapshots
+        self.Output_Dir = os.path.abspath(Output_Dir)
+
+        self.NbGen = NbGen
+        self.NbTopChrom = NbTopChrom
+        self.Translation = Translation
+        self.Rotation = Rotation
+        self.UseReference = UseReference
+        self.RenderAll = RenderAll
+        self.Chunk = Chunk
+
+        self.Stages = Stages()
+
+    ''' ==================================================================================
+    @summary: Get_FlexAID: Plain object holding the values of the FlexAID interface read
+                           by the parser
+    ================================================================================== '''
+    def Get_FlexAID(self):
+
+        FlexAID = Section({})
+        FlexAID.SimulateState = 0
+        FlexAID.ParseState = 0
+        FlexAID.Run = None
+        FlexAID.OSid = 'LINUX'
+        FlexAID.FlexAIDTempProject_Dir = self.Output_Dir
+
+        Name = os.path.basename(self.Ligand)
+
+        FlexAID.IOFile = Section({  'TargetName': 'TARGET', 'LigandName': Name, 'Complex': Name,
+                                    'ProcessedLigandPath': self.Ligand + '_ref.pdb',
+                                    'ProcessedLigandINPPath': self.Ligand + '.inp',
+                                    'ProcessedLigandICPath': self.Ligand + '.ic' })
+        FlexAID.IOFile.Vars = Section({})
+        FlexAID.IOFile.Vars.dictFlexBonds = Read_FlexBonds(self.Ligand + '.inp')
+
+        FlexAID.Config1 = Section({ 'RngOpt': 'LOCCEN' })
+        FlexAID.Config1.BindingSiteDisplay = None
+        FlexAID.Config1.Vars = Section({})
+        FlexAID.Config1.Vars.TargetFlex = Section({})
+        FlexAID.Config1.Vars.TargetFlex.listSideChain = list()
+
+        FlexAID.Config2 = Section({ 'FlexStatus': 'Yes' if FlexAID.IOFile.Vars.dictFlexBonds else '',
+                                    'IntTranslation': self.Translation, 'IntRotation': self.Rotation,
+                                    'UseReference': self.UseReference })
+        FlexAID.Config3 = Section({})
+
+        FlexAID.GAParam = Section({ 'NbGen': str(self.NbGen), 'NbGenFreq': '1',
+                                    'NbTopChrom': str(self.NbTopChrom),
+                                    'EarlyStop': 0, 'StopWindow': '50', 'StopTolerance': '0.100' })
+
+        return FlexAID
+
+    ''' ==================================================================================
+    @summary: Run: Replays the logfile; returns the stages timings or None on error
+    ================================================================================== '''
+    def Run(self):
+
+        if not os.path.isdir(self.Output_Dir):
+            os.makedirs(self.Output_Dir)
+
+        top = ReplayTop(self.Get_FlexAID(), self.NbTopChrom)
+
+        Manage = top.Manage
+        Manage.Reference_RunFolder(self.Output_Dir)
+        Manage.LOGFILE = self.LogFile
+        Manage.LOGFILETMP = self.LogFile + '.tmp'
+
+        if Manage.Get_CoordRef() or Manage.Get_RecAtom() or Manage.Get_DisAngDih():
+            print('  ERROR: Could not read the processed ligand ' + self.Ligand)
+            return None
+        Manage.Get_VarAtoms()
+
+        # atom order of the ligand in the solution objects
+        cmd.LigandIDs = sorted(Manage.dictCoordRef.keys())
+
+        self.Instrument()
+        Timers.Reset()
+
+        queue = Queue.Queue()
+        Feed = Source(self.LogFile, self.listSnapshots, self.Chunk)
+        Parser = ReplayParse(top, queue, Feed, self.RenderAll)
+
+        print('  Replaying ' + self.LogFile)
+
+        Start = time.time()
+
+        while not Feed.Done:
+            if Parser.ParseLines():
+                print('  ERROR: ' + Parser.ErrorMsg)
+                break
+
+            # the updates queued for Tk
+            self.Stages.Enter('queue')
+            while not queue.empty():
+                queue.get()()
+            self.Stages.Leave()
+
+        self.Stages.Enter('telemetry')
+        Parser.Telemetry.Flush()
+        self.Stages.Leave()
+
+        Elapsed = time.time() - Start
+
+        Feed.Close()
+        Parser.Watch.Close()
+
+        self.Report(Elapsed, Feed.Lines, Feed.Generations)
+
+        # Stages timings of the pipeline (NRGSUITE_PROFILE=1)
+        Timers.Write_Summary(os.path.join(self.Output_Dir,'timers.txt'))
+
+        return self.Stages
+
+    ''' ==================================================================================
+    @summary: Instrument: Times the stages of the parsing and reconstruction
+    ================================================================================== '''
+    def Instrument(self):
+
+        self.Stages.Wrap(ReplayParse, 'TailRead', 'read')
+        self.Stages.Wrap(Simulation.Parse, 'ParseLines', 'parse')
+        self.Stages.Wrap(Simulation.Parse, 'UpdateDataList', 'datalist')
+        self.Stages.Wrap(Simulation.Parse, 'Build_TopPoses', 'display')
+        self.Stages.Wrap(Simulation.Telemetry, 'Add', 'telemetry')
+        self.Stages.Wrap(Simulation.Telemetry, 'Flush', 'telemetry')
+        self.Stages.Wrap(UpdateScreen.UpdateScreen, 'Decode', 'decode')
+        self.Stages.Wrap(UpdateScreen.UpdateScreen, 'Display', 'display')
+        self.Stages.Wrap(Geometry, 'buildcc', 'build')
+        self.Stages.Wrap(Geometry, 'buildcc_array', 'build')
+        self.Stages.Wrap(Geometry, 'rmsd', 'rmsd')
+
+    ''' ==================================================================================
+    @summary: Report: Prints the throughput and the time spent in each stage
+    ================================================================================== '''
+    def Report(self, Elapsed, Lines, Generations):
+
+        Elapsed = max(Elapsed, 1e-9)
+
+        print('  %d lines in %.3f s: %.0f lines/s' % (Lines, Elapsed, Lines / Elapsed))
+        print('  %d generations: %.1f generations/s' % (Generations, Generations / Elapsed))
+        print('  poses reconstructed: %d' % self.Stages.dictCalls['decode'])
+        print('')
+        print('  %-12s %10s %8s %10s' % ('stage', 'time (s)', '%', 'calls'))
+
+        for Stage in sorted(self.Stages.dictTime, key=lambda Stage: -self.Stages.dictTime[Stage]):
+            print('  %-12s %10.3f %8.1f %10d' % ( Stage, self.Stages.dictTime[Stage],
+                                                 100.0 * self.Stages.dictTime[Stage] / Elapsed,
+                                                 self.Stages.dictCalls[Stage] ))
+
+
+''' ==================================================================================
+FUNCTION Get_ChainLigand: Returns the atoms, reference atoms (RecAtom) and internal
+                          coordinates (DisAngDih) of a ligand built as a chain of atoms
+==================================================================================  '''
+def Get_ChainLigand(NbAtoms, Rand):
+
+    listAtoms = [ ATOM_INDEX + i for i in range(1, NbAtoms + 1) ]
+
+    # each atom is built from the three atoms preceding it in the chain
+    RecAtom = dict()
+    DisAngDih = dict()
+    for i, NoAtom in enumerate(listAtoms):
+        RecAtom[NoAtom] = [ listAtoms[i-k] if i-k >= 0 else 0 for k in (1, 2, 3) ]
+        DisAngDih[NoAtom] = [ 1.5, 110.0, Rand.uniform(-180.0, 180.0) ]
+
+    return listAtoms, RecAtom, DisAngDih
+
+''' ==================================================================================
+FUNCTION Benchmark_Build: Times the reconstruction of NbTopChrom poses of a chain ligand
+                          atom by atom (buildcc) and level by level (buildcc_array)
+==================================================================================  '''
+def Benchmark_Build(NbAtoms, NbTopChrom, Repeat=20, Seed=0):
+
+    Rand = random.Random(Seed)
+
+    listAtoms, RecAtom, DisAngDih = Get_ChainLigand(max(NbAtoms, 3), Rand)
+    Plan = Geometry.BuildPlan(listAtoms, RecAtom)
+
+    listPoses = list()
+    for TOP in range(NbTopChrom):
+        listPoses.append(dict( (NoAtom, [ Dis, Ang, Rand.uniform(-180.0, 180.0) ])
+                               for NoAtom, (Dis, Ang, Dih) in DisAngDih.items() ))
+
+    Start = time.time()
+    for i in range(Repeat):
+        for Pose in listPoses:
+            Geometry.buildcc(listAtoms, RecAtom, Pose, [ 0.0, 0.0, 0.0 ])
+    Scalar = (time.time() - Start) / Repeat
+
+    Start = time.time()
+    for i in range(Repeat):
+        Geometry.buildcc_array(Plan, [ Plan.Gather(Pose) for Pose in listPoses ], [ 0.0, 0.0, 0.0 ])
+    Vector = (time.time() - Start) / Repeat
+
+    print('  %d atoms (%d levels) x %d poses: buildcc %.2f ms, buildcc_array %.2f ms, vectorized: %s' %
+          ( len(listAtoms), len(Plan.Levels), NbTopChrom, 1000.0 * Scalar, 1000.0 * Vector,
+            'yes' if Plan.Vectorized(NbTopChrom) else 'no' ))
+
+    return Scalar, Vector
+
+''' ==================================================================================
+FUNCTION Generate: Writes a synthetic run: a processed ligand (LIG.inp, LIG.ic, LIG_ref.pdb)
+                   built as a chain of atoms and the logfile of NbGen generations of
+                   NbTopChrom chromosomes. Returns the base path of the ligand files
+==================================================================================  '''
+def Generate(Run_Dir, NbGen, NbTopChrom, NbAtoms=30, NbFlex=5, NbGrid=1000, Seed=0):
+
+    Rand = random.Random(Seed)
+
+    if not os.path.isdir(Run_Dir):
+        os.makedirs(Run_Dir)
+
+    Ligand = os.path.join(Run_Dir, 'LIG')
+
+    NbAtoms = max(NbAtoms, 3)
+    NbFlex = min(NbFlex, NbAtoms - 3)
+
+    listAtoms, RecAtom, DisAngDih = Get_ChainLigand(NbAtoms, Rand)
+
+    listFlex = listAtoms[3:3+NbFlex]
+
+    handle = open(Ligand + '.inp', 'w')
+    for NoAtom in listAtoms:
+        handle.write('HETTYP%5d%-10s%5d%5d%5d\n' % ((NoAtom, '  3  C.3') + tuple(RecAtom[NoAtom])))
+    for i, NoAtom in enumerate(listFlex):
+        handle.write('FLEDIH %2d %5d\n' % (i, NoAtom))
+    handle.close()
+
+    handle = open(Ligand + '.ic', 'w')
+    for NoAtom in listAtoms:
+        handle.write('%5d  %8.3f %8.3f %8.3f\n' % ((NoAtom,) + tuple(DisAngDih[NoAtom])))
+    handle.close()
+
+    dictCoord = Geometry.buildcc(listAtoms, RecAtom, DisAngDih, [ 0.0, 0.0, 0.0 ])
+
+    handle = open(Ligand + '_ref.pdb', 'w')
+    for NoAtom in listAtoms:
+        handle.write('HETATM%5d  C%-2d LIG A9999    %8.3f%8.3f%8.3f  1.00  0.00           C\n' %
+                     ((NoAtom, (NoAtom - ATOM_INDEX) % 100) + tuple(dictCoord[NoAtom])))
+    handle.close()
+
+    handle = open(os.path.join(Run_Dir, 'log.txt'), 'w')
+
+    handle.write('the protein center of coordinates is: %8.3f %8.3f %8.3f \n' % (0.0, 0.0, 0.0))
+    for index in range(NbGrid):
+        handle.write('Grid[%d]=%8.3f%8.3f%8.3f\n' % ( index, Rand.uniform(-8.0, 8.0),
+                                                     Rand.uniform(-8.0, 8.0), Rand.uniform(-8.0, 8.0) ))
+    for i, NoAtom in enumerate(listAtoms):
+        handle.write('lout[%d]=%6d \n' % (i, NoAtom))
+
+    CF = 0.0
+    for Generation in range(1, NbGen + 1):
+
+        listLines = [ 'Generation: %5d \n' % Generation, 'best by energy \n' ]
+
+        # the CF improves quickly then reaches a plateau
+        CF = min(CF, -100.0 * (1.0 - 1.0 / (1.0 + Generation / 50.0)))
+
+        for TOP in range(NbTopChrom):
+            Genes = [ float(Rand.randrange(NbGrid)) ] + \
+                    [ Rand.uniform(-180.0, 180.0) for i in range(3 + len(listFlex)) ]
+            cf = CF + TOP * 0.5 + Rand.random()
+
+            listLines.append( '%3d (%s)  cf=%9.3f cf.app=%9.3f fitnes=%9.3f\n' %
+                              ( TOP, ''.join([ '%10.2f ' % Gene for Gene in Genes ]),
+                                cf, cf, float(NbTopChrom - TOP) ) )
+
+        handle.write(''.join(listLines))
+
+    handle.write('Done.\n')
+    handle.close()
+
+    return Ligand
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Offline replay and benchmark of the FlexAID simulation parser')
+    subparsers = parser.add_subparsers(dest='action')
+
+    generate = subparsers.add_parser('generate', help='write a synthetic run (ligand files and log.txt)')
+    generate.add_argument('-o', '--output', required=True, help='folder of the synthetic run')
+    generate.add_argument('-g', '--generations', type=int, default=1000, help='number of generations')
+    generate.add_argument('-t', '--top', type=int, default=10, help='TOP chromosomes per generation')
+    generate.add_argument('-a', '--atoms', type=int, default=30, help='atoms of the ligand')
+    generate.add_argument('-f', '--flexible', type=int, default=5, help='flexible bonds of the ligand')
+    generate.add_argument('--grid', type=int, default=1000, help='grid points of the binding-site')
+    generate.add_argument('--seed', type=int, default=0, help='seed of the random values')
+
+    build = subparsers.add_parser('build', help='time the reconstruction of the poses (buildcc vs buildcc_array)')
+    build.add_argument('-t', '--top', type=int, nargs='+', default=[10, 50], help='poses built at once')
+    build.add_argument('-a', '--atoms', type=int, nargs='+', default=[30, 60], help='atoms of the ligand')
+    build.add_argument('-r', '--repeat', type=int, default=20, help='repetitions of each measure')
+
+    replay = subparsers.add_parser('replay', help='replay a logfile through the parser')
+    replay.add_argument('-l', '--log', required=True, help='FlexAID logfile (log.txt)')
+    replay.add_argument('--ligand', required=True, help='processed ligand without extension (BASE.inp, BASE.ic, BASE_ref.pdb)')
+    replay.add_argument('-u', '--updates', default='', help='folder of the .update snapshots (read in name order)')
+    replay.add_argument('-g', '--generations', type=int, default=0, help='number of generations (default: counted in the logfile)')
+    replay.add_argument('-t', '--top', type=int, default=10, help='TOP chromosomes per generation')
+    replay.add_argument('-o', '--output', default='', help='folder of the files written by the parser (default: temporary)')
+    replay.add_argument('--chunk', type=int, default=CHUNK, help='lines of the logfile read at once')
+    replay.add_argument('--no-translation', action='store_true', help='the chromosomes have no translation gene')
+    replay.add_argument('--no-rotation', action='store_true', help='the chromosomes have no rotation genes')
+    replay.add_argument('--rmsd', action='store_true', help='compute the RMSD to the reference of each pose')
+    replay.add_argument('--render-all', action='store_true', help='reconstruct the poses of every generation')
+
+    args = parser.parse_args()
+
+    if args.action == 'generate':
+        Generate(args.output, args.generations, args.top, args.atoms, args.flexible, args.grid, args.seed)
+
+    elif args.action == 'build':
+        for NbAtoms in args.atoms:
+            for NbTopChrom in args.top:
+                Benchmark_Build(NbAtoms, NbTopChrom, args.repeat)
+
+    elif args.action == 'replay':
+
+        listSnapshots = list()
+        if args.updates:
+            listSnapshots = sorted(glob.glob(os.path.join(args.updates, '*')))
+
+        NbGen = args.generations
+        if not NbGen:
+            handle = open(args.log, 'r')
+            NbGen = sum(1 for Line in handle if Line.startswith('Generation:'))
+            handle.close()
+            NbGen += sum(1 for Snapshot in listSnapshots
+                         for Line in open(Snapshot, 'r') if Line.startswith('Generation:'))
+
+        Output_Dir = args.output or tempfile.mkdtemp()
+
+        try:
+            Bench = Replay(args.log, args.ligand, listSnapshots, Output_Dir, NbGen, args.top,
+                           int(not args.no_translation), int(not args.no_rotation), int(args.rmsd),
+                           args.render_all, args.chunk)
+
+            if Bench.Run() is None:
+                sys.exit(1)
+
+        finally:
+            if not args.output:
+                shutil.rmtree(Output_Dir, True)
+
+    else:
+        parser.print_help()
@@ -0,0 +1,497 @@
+'''
+    NRGsuite: PyMOL molecular tools interface
+    Copyright (C) 2011 Gaudreault, F., Morency, LP. & Najmanovich, R.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+
+from __future__ import print_function
+
+'''
+@title: Screening.py
+
+@summary: Headless virtual screening with FlexAID. Docks a library of processed ligands
+          (.inp files with their _ref.pdb) against one processed target without PyMOL.
+          The CONFIG.inp and ga_inp.dat files are written by ManageFiles.Manage from a
+          plain parameter object holding the same values as the FlexAID interface.
+
+          Run with python -O (PyMOL-only modules are imported under __debug__):
+          python -O Screening.py -t target.inp.pdb -l LigandDir -o OutputDir
+                                 --sphere x y z radius | --cleft cleft.pdb [-j 8] [-p NbGen=1000]
+'''
+
+import sys, os
+import re
+import glob
+import threading
+import multiprocessing
+
+from subprocess import Popen, STDOUT
+
+if sys.version_info[0] < 3:
+    import Queue
+else:
+    import queue as Queue
+
+# NRGsuite modules are found relative to this file (as in the PyMOL plugin)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ManageFiles
+import Result
+import BindingSite
+import SphereObj
+import TargetFlex
+
+# Residue number of the ligand (see IOFile.RESIDUE_NUMBER)
+RESIDUE_NUMBER = 9999
+
+# Default values of the interface variables read by ManageFiles.Manage (see Init_Vars)
+DEFAULTS = {    'IOFile':   {   'AtomTypes': 'Sybyl' },
+                'Config2':  {   'UseReference': 0, 'IntTranslation': 1, 'IntRotation': 1 },
+                'Config3':  {   'CompFct': 'VCT', 'RotInstances': 0, 'ExcludeIntra': 1, 'LigandOnly': 0,
+                                'ExcludeHET': 0, 'IncludeHOH': 0, 'Permeability': '0.1', 'RotPermeability': '0.2',
+                                'SolventTerm': '0.0', 'DeltaAngle': '5.0', 'DeltaDihedral': '5.0',
+                                'DeltaDihedralFlex': '10.0', 'GridSpacing': '0.375' },
+                'GAParam':  {   'NbTopChrom': '5', 'NbGen': '500', 'NbChrom': '500', 'CrossRate': '0.900',
+                                'MutaRate': '0.025', 'FitModel': 'PSHARE', 'FitAlpha': '4.0', 'FitPeak': '5.0',
+                                'FitScale': '10.0', 'RepModel': 'BOOM', 'RepDup': 0, 'RepSS': '0.10',
+                                'UseAGA': 1, 'AGAk1': '0.95', 'AGAk2': '0.10', 'AGAk3': '0.95', 'AGAk4': '0.10' } }
+
+# Solvent type index of each atom typing (see Config3.Init_Vars)
+SOLVENT_TYPE_INDEX = { 'Sobolev': 0, 'Gaudreault': 13, 'Sybyl': 40 }
+
+# Values accepted for the check-boxes (IntVar defaults)
+FLAG_VALUES = { '1': 1, 'true': 1, 'yes': 1, 'on': 1, '0': 0, 'false': 0, 'no': 0, 'off': 0 }
+
+""" *********************************************************************************
+    CLASS Value: Stand-in for the Tk variables read by ManageFiles.Manage
+    ********************************************************************************* """
+class Value(object):
+
+    def __init__(self, value):
+
+        self.value = value
+
+    def get(self):
+
+        return self.value
+
+    def set(self, value):
+
+        self.value = value
+
+""" *********************************************************************************
+    CLASS Section: Plain object holding the variables of one interface tab
+    ********************************************************************************* """
+class Section(object):
+
+    def __init__(self, dictValues):
+
+        for key in dictValues:
+            setattr(self, key, Value(dictValues[key]))
+
+""" *********************************************************************************
+    CLASS Params: Plain parameter object of one docking (replaces the FlexAID interface)
+    ********************************************************************************* """
+class Params(object):
+
+    def __init__(self, Screen, Ligand, LigandINP):
+
+        self.FlexAIDInstall_Dir = Screen.FlexAIDInstall_Dir
+        self.FlexAIDExecutable = Screen.FlexAIDExecutable
+        self.FlexAIDSimulationProject_Dir = Screen.Output_Dir
+        self.FlexAIDTempProject_Dir = Screen.Output_Dir
+
+        dictValues = dict()
+        for Name in DEFAULTS:
+            dictValues[Name] = dict(DEFAULTS[Name])
+
+        for key in Screen.dictParams:
+            for Name in dictValues:
+                if key in dictValues[Name]:
+                    dictValues[Name][key] = Screen.dictParams[key]
+
+        AtomTypes = dictValues['IOFile']['AtomTypes']
+        dictValues['Config3'].setdefault('SolventTypeIndex', SOLVENT_TYPE_INDEX.get(AtomTypes, 0))
+
+        # Processed ligand
+        dictValues['IOFile'].update( {  'TargetName': os.path.splitext(os.path.basename(Screen.TargetPath))[0],
+                                        'LigandName': Ligand,
+                                        'Complex': Ligand,
+                                        'ProcessedTargetPath': Screen.TargetPath,
+                                        'ProcessedLigandINPPath': LigandINP,
+                                        'ProcessedLigandPath': os.path.splitext(LigandINP)[0] + '_ref.pdb',
+                                        'ResSeq': RESIDUE_NUMBER } )
+
+        self.IOFile = Section(dictValues['IOFile'])
+        self.IOFile.Vars = Section({})
+        self.IOFile.Vars.dictFlexBonds = Read_FlexBonds(LigandINP)
+        self.IOFile.Vars.dictAtomTypes = dict()
+
+        # Binding-site
+        self.Config1 = Section({ 'RngOpt': Screen.RngOpt })
+        self.Config1.Vars = Section({})
+        self.Config1.Vars.BindingSite = BindingSite.BindingSite()
+        self.Config1.Vars.BindingSite.Sphere = Screen.Sphere
+        self.Config1.Vars.TargetFlex = TargetFlex.TargetFlex()
+        self.Config1.CleftTmpPath = Screen.CleftPath
+        self.Config1.Generate_CleftBindingSite = lambda: None
+
+        self.Config2 = Section(dictValues['Config2'])
+        self.Config2.Vars = Section({})
+        self.Config2.Vars.dictConstraints = dict()
+
+        self.Config3 = Section(dictValues['Config3'])
+        self.GAParam = Section(dictValues['GAParam'])
+
+''' ==================================================================================
+FUNCTION Convert_Param: Returns the value of an interface variable typed as its default
+                        (flags as 0/1, numbers validated but kept as the entry text)
+@raise ValueError: unknown variable or value of the wrong type
+==================================================================================  '''
+def Convert_Param(key, value):
+
+    for Name in DEFAULTS:
+        if key in DEFAULTS[Name]:
+            Default = DEFAULTS[Name][key]
+            break
+    else:
+        raise ValueError("unknown parameter '" + key + "'")
+
+    value = str(value).strip()
+
+    if isinstance(Default, int):
+        if value.lower() not in FLAG_VALUES:
+            raise ValueError("parameter '" + key + "' is a flag (0/1/true/false), got '" + value + "'")
+        return FLAG_VALUES[value.lower()]
+
+    for _type in ( int, float ):
+        try:
+            _type(Default)
+        except ValueError:
+            continue
+
+        try:
+            _type(value)
+        except ValueError:
+            raise ValueError("parameter '" + key + "' is a" + (' float' if _type is float else 'n integer') +
+                             ", got '" + value + "'")
+        break
+
+    return value
+
+''' ==================================================================================
+FUNCTION Read_FlexBonds: Reads the flexible bonds of a processed ligand (all selected),
+                         as IOFile.store_InpFile with ToggleAllFlexibleBonds
+==================================================================================  '''
+def Read_FlexBonds(LigandINP):
+
+    dictFlexBonds = dict()
+
+    file = open(LigandINP, 'r')
+    inpLines = file.readlines()
+    file.close()
+
+    for Line in inpLines:
+        #FLEDIH  4   916  917
+        if Line.startswith('FLEDIH'):
+
+            INDEX = Line[7:9].strip()
+
+            list = []
+            for i in range(0,int(len(Line[10:])/5)):
+                list.append(Line[(10+i*5):(10+5+i*5)].strip())
+
+            dictFlexBonds[INDEX] = [ 1, 0, len(list) ] + list
+
+    return dictFlexBonds
+
+""" *********************************************************************************
+    CLASS BatchManage: File management of one headless docking
+    ********************************************************************************* """
+class BatchManage(ManageFiles.Manage):
+
+    def __init__(self, top):
+
+        ManageFiles.Manage.__init__(self, top)
+
+        # no interface reads the .update files
+        self.NRGsuite = False
+
+    ''' ==================================================================================
+    @summary: Reference_Folders: Run folder of the ligand, also holding the logfile and
+                                 temporary files of the concurrent runs
+    ================================================================================== '''
+    def Reference_Folders(self):
+
+        ManageFiles.Manage.Reference_Folders(self)
+
+        self.Temp_Dir = self.FlexAIDRunSimulationProject_Dir
+        self.LOGFILE = os.path.join(self.FlexAIDRunSimulationProject_Dir,'log.txt')
+        self.LOGFILETMP = self.LOGFILE + '.tmp'
+
+""" *********************************************************************************
+    CLASS Job: Simulate stand-in for ManageFiles.Manage (Manage.top)
+    ********************************************************************************* """
+class Job(object):
+
+    def __init__(self, Screen, Ligand, LigandINP):
+
+        self.Ligand = Ligand
+        self.top = Params(Screen, Ligand, LigandINP)
+
+""" *********************************************************************************
+    CLASS Screening: Docks a library of ligands with a bounded number of FlexAID processes
+    ********************************************************************************* """
+class Screening(object):
+
+    def __init__(self, Install_Dir, TargetPath, Library_Dir, Output_Dir, Jobs=1, dictParams=None,
+                 Sphere=None, CleftPath=''):
+
+        self.FlexAIDInstall_Dir = os.path.join(Install_Dir,'FlexAID')
+        if sys.platform.startswith('win'):
+            self.FlexAIDExecutable = os.path.join(self.FlexAIDInstall_Dir,'WRK','FlexAID.exe')
+        else:
+            self.FlexAIDExecutable = os.path.join(self.FlexAIDInstall_Dir,'WRK','FlexAID')
+
+        self.TargetPath = os.path.abspath(TargetPath)
+        self.Library_Dir = Library_Dir
+        self.Output_Dir = os.path.abspath(Output_Dir)
+        self.Jobs = max(1, Jobs)
+        self.dictParams = dict( (key, Convert_Param(key, value)) for key, value in (dictParams or dict()).items() )
+
+        # Binding-site: sphere (LOCCEN) or cleft (LOCCLF)
+        self.Sphere = Sphere
+        self.CleftPath = os.path.abspath(CleftPath) if CleftPath else ''
+        if self.CleftPath:
+            self.RngOpt = 'LOCCLF'
+        else:
+            self.RngOpt = 'LOCCEN'
+
+        self.Ranking = os.path.join(self.Output_Dir,'ranking.txt')
+
+        self.Pending = Queue.Queue()
+        self.listResults = list()
+        self.listRun = list()
+        self.Lock = threading.Lock()
+        self.Cancelled = False
+
+    ''' ==================================================================================
+    @summary: Get_Library: Returns the processed ligands of the library as (Name, INP path)
+    ================================================================================== '''
+    def Get_Library(self):
+
+        listLigands = list()
+        for LigandINP in sorted(glob.glob(os.path.join(self.Library_Dir,'*.inp'))):
+            listLigands.append(( os.path.splitext(os.path.basename(LigandINP))[0], os.path.abspath(LigandINP) ))
+
+        return listLigands
+
+    ''' ==================================================================================
+    @summary: Run: Docks all the ligands and writes the ranking; returns the ranked results
+    ================================================================================== '''
+    def Run(self):
+
+        if not os.path.isfile(self.FlexAIDExecutable):
+            print('  FATAL ERROR: Could not find the executable ' + self.FlexAIDExecutable)
+            return None
+
+        if not os.path.isdir(self.Output_Dir):
+            os.makedirs(self.Output_Dir)
+
+        for Ligand in self.Get_Library():
+            self.Pending.put(Ligand)
+
+        print('  Docking ' + str(self.Pending.qsize()) + ' ligand(s) with ' + str(self.Jobs) + ' process(es)')
+
+        listWorkers = list()
+        for i in range(self.Jobs):
+            Worker = threading.Thread(target=self.Worker)
+            Worker.daemon = True
+            Worker.start()
+            listWorkers.append(Worker)
+
+        try:
+            for Worker in listWorkers:
+                while Worker.is_alive():
+                    Worker.join(1.0)
+        except KeyboardInterrupt:
+            self.Cancel()
+            for Worker in listWorkers:
+                Worker.join()
+
+        return self.Write_Ranking()
+
+    ''' ==================================================================================
+    @summary: Worker: Docks pending ligands until none is left
+    ================================================================================== '''
+    def Worker(self):
+
+        while not self.Cancelled:
+
+            try:
+                Ligand, LigandINP = self.Pending.get_nowait()
+            except Queue.Empty:
+                break
+
+            Result = self.Dock(Ligand, LigandINP)
+            if Result is not None:
+                with self.Lock:
+                    self.listResults.append(Result)
+
+    ''' ==================================================================================
+    @summary: Dock: Runs FlexAID for one ligand; returns (CF, CF.app, Ligand, ResultFile)
+    ================================================================================== '''
+    def Dock(self, Ligand, LigandINP):
+
+        try:
+            Manage = BatchManage(Job(self, Ligand, LigandINP))
+
+            Manage.Reference_Folders()
+            if not Manage.Create_Folders():
+                print('  ERROR: Could not create the folder of ' + Ligand)
+                return None
+
+            Manage.Create_CONFIG()
+            Manage.Create_ga_inp()
+
+        except:
+            print('  ERROR: Could not create the input files of ' + Ligand)
+            return None
+
+        commandline = [ self.FlexAIDExecutable, Manage.CONFIG, Manage.ga_inp,
+                        os.path.join(Manage.FlexAIDRunSimulationProject_Dir,'RESULT') ]
+
+        try:
+            with self.Lock:
+                if self.Cancelled:
+                    return None
+
+                LogFile = open(Manage.LOGFILE, 'w')
+                Run = Popen(commandline, stdout=LogFile, stderr=STDOUT)
+                self.listRun.append(Run)
+
+            Run.wait()
+            LogFile.close()
+
+            with self.Lock:
+                self.listRun.remove(Run)
+
+        except OSError:
+            print('  FATAL ERROR: Could not run the executable FlexAID.')
+            return None
+
+        if Run.returncode != 0:
+            print('  ERROR: FlexAID returned ' + str(Run.returncode) + ' for ' + Ligand)
+            return None
+
+        return self.Get_BestResult(Ligand, Manage.FlexAIDRunSimulationProject_Dir)
+
+    ''' ==================================================================================
+    @summary: Get_BestResult: Returns the result with the lowest CF of a run
+    ================================================================================== '''
+    def Get_BestResult(self, Ligand, Run_Dir):
+
+        Best = None
+        for file in glob.glob(os.path.join(Run_Dir,'RESULT_*.pdb')):
+
+            m = re.search("RESULT_(\d+)\.pdb$", file)
+            if m:
+                Res = Result.Result(file, int(m.group(1)) + 1)
+                if Res.CF == 'N/A':
+                    continue
+
+                if Best is None or Res.CF < Best[0]:
+                    Best = ( Res.CF, Res.CFapp, Ligand, file )
+
+        if Best is None:
+            print('  ERROR: No result found for ' + Ligand)
+        else:
+            print('  ' + Ligand + ': CF=%.3f' % Best[0])
+
+        return Best
+
+    ''' ==================================================================================
+    @summary: Cancel: Stops the pending dockings and kills the running ones
+    ================================================================================== '''
+    def Cancel(self):
+
+        with self.Lock:
+            self.Cancelled = True
+
+            for Run in self.listRun:
+                try:
+                    Run.kill()
+                except:
+                    pass
+
+    ''' ==================================================================================
+    @summary: Write_Ranking: Writes the table of ligands ranked by CF
+    ================================================================================== '''
+    def Write_Ranking(self):
+
+        listRanked = sorted(self.listResults)
+
+        try:
+            out = open(self.Ranking, 'w')
+            out.write('#Rank\tLigand\tCF\tCF.app\tResultFile\n')
+            for Rank, (CF, CFapp, Ligand, ResultFile) in enumerate(listRanked):
+                out.write('%d\t%s\t%.3f\t%s\t%s\n' % (Rank + 1, Ligand, CF, str(CFapp), ResultFile))
+            out.close()
+
+        except IOError:
+            print('  ERROR: Could not write the ranking ' + self.Ranking)
+            return None
+
+        print('  Ranking of ' + str(len(listRanked)) + ' ligand(s) written to ' + self.Ranking)
+
+        return listRanked
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless virtual screening with FlexAID')
+    parser.add_argument('-t', '--target', required=True, help='processed target (.inp.pdb)')
+    parser.add_argument('-l', '--library', required=True, help='folder of processed ligands (.inp and _ref.pdb)')
+    parser.add_argument('-o', '--output', required=True, help='output folder')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(), help='concurrent FlexAID processes')
+    parser.add_argument('-p', '--param', action='append', default=[], help='interface variable as NAME=VALUE (e.g. NbGen=1000)')
+    parser.add_argument('-i', '--install', default=os.environ.get('NRGSUITE_INSTALLATION', ''), help='NRGsuite installation folder')
+
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--sphere', nargs=4, type=float, metavar=('X', 'Y', 'Z', 'RADIUS'), help='binding-site sphere')
+    group.add_argument('--cleft', help='binding-site cleft file')
+
+    args = parser.parse_args()
+
+    dictParams = dict()
+    for param in args.param:
+        key, sep, value = param.partition('=')
+        try:
+            dictParams[key.strip()] = Convert_Param(key.strip(), value)
+        except ValueError as e:
+            parser.error(str(e))
+
+    Sphere = None
+    if args.sphere:
+        Sphere = SphereObj.SphereObj(args.sphere[3], args.sphere[3], args.sphere[0:3])
+
+    Screen = Screening(args.install, args.target, args.library, args.output, args.jobs, dictParams,
+                       Sphere, args.cleft)
+
+    if Screen.Run() is None:
+        sys.exit(1)
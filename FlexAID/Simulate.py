@@ -42,12 +42,14 @@ import ManageFiles
 import Result
 import Vars
 import Tabs 
+import Timers
 
 if __debug__:
     from pymol import *
     from pymol import cmd
 
     import pymol
+    import General_cmd
     import Simulation
 
 
@@ -56,6 +58,8 @@ class SimulateVars(Vars.Vars):
     SimLigDisplay = StringVar()
     SimCartoonDisplay = IntVar()
     SimLinesDisplay = IntVar()
+    Replicas = StringVar()
+    ReuseResults = IntVar()
 
     def __init__(self):
         
@@ -68,7 +72,21 @@ class Simulate(Tabs.Tab):
     
     # 1 minute timeout
     TIMEOUT = INTERVAL * 300
+
+    # Maximum number of live renders per second
+    RENDER_RATE = 4.0
     
+    # Maximum number of FlexAID replicas run in parallel
+    MAX_REPLICAS = 16
+
+    # Parse the output of FlexAID read from a pipe (the logfile is still written)
+    # Enabled by setting the environment variable NRGSUITE_PIPE_OUTPUT=1 before starting PyMOL
+    PIPE_OUTPUT = os.environ.get('NRGSUITE_PIPE_OUTPUT', '') not in ('', '0')
+
+    # Maximum number of lines queued between FlexAID and the parser (also the maximum
+    # number of lines held by the parser while it reads the .update files)
+    PIPE_BUFFER = 10000
+
     SimStatus = StringVar()
     ProgBarText = StringVar()
     
@@ -80,9 +98,18 @@ class Simulate(Tabs.Tab):
         self.SimLigDisplay = self.Vars.SimLigDisplay
         self.SimCartoonDisplay = self.Vars.SimCartoonDisplay
         self.SimLinesDisplay = self.Vars.SimLinesDisplay
+        self.Replicas = self.Vars.Replicas
+        self.ReuseResults = self.Vars.ReuseResults
         
         self.ResultsContainer = Result.ResultsContainer()
         self.Manage = ManageFiles.Manage(self)
+        self.ResultStore = ManageFiles.ResultStore(os.path.join(self.top.FlexAIDCacheProject_Dir,'Results'))
+        
+        # Key of the running simulation in the result store (empty if not to be stored)
+        self.StoreKey = ''
+        
+        # Manage of each replica of a multi-replica simulation
+        self.listReplicas = list()
         
     def Init_Vars(self):
 
@@ -95,6 +122,8 @@ class Simulate(Tabs.Tab):
         self.hasConstraints = bool(self.top.Config2.Vars.dictConstraints)
         self.SimCartoonDisplay.set(1)
         self.SimLinesDisplay.set(0)
+        self.Replicas.set('1')
+        self.ReuseResults.set(0)
         
         self.BarWidth = 0
         self.BarHeight = 0
@@ -226,8 +255,13 @@ class Simulate(Tabs.Tab):
         fSim_PlayerLine1.pack(side=TOP, fill=X)
         fSim_PlayerLine2 = Frame(fSim_Player)
         fSim_PlayerLine2.pack(side=TOP, fill=X)
+        fSim_PlayerLine3 = Frame(fSim_Player)
+        fSim_PlayerLine3.pack(side=TOP, fill=X)
         
         Label(fSim_PlayerLine1, text='Simulation controls', font=self.top.font_Title).pack(side=LEFT, anchor=W)        
+        Spinbox(fSim_PlayerLine1, from_=1, to=self.MAX_REPLICAS, textvariable=self.Replicas, width=3, state='readonly',
+                font=self.top.font_Text).pack(side=RIGHT)
+        Label(fSim_PlayerLine1, text='Replicas:', font=self.top.font_Text).pack(side=RIGHT)
         self.Btn_Start = Button(fSim_PlayerLine2, text='Start', command=self.Btn_StartSim, font=self.top.font_Text, state='normal')
         self.Btn_Start.pack(side=LEFT)
         self.Btn_Continue = Button(fSim_PlayerLine2, text='Continue', command=lambda bContinue=True: self.Btn_StartSim(bContinue),
@@ -239,6 +273,10 @@ class Simulate(Tabs.Tab):
         self.Btn_Stop.pack(side=LEFT)
         self.Btn_Abort = Button(fSim_PlayerLine2, text='Abort', command=self.Btn_AbortSim, font=self.top.font_Text, state='disabled')
         self.Btn_Abort.pack(side=LEFT)
+
+        # FlexAID is stochastic: reusing the results of an identical simulation is opt-in
+        Checkbutton(fSim_PlayerLine3, text=' Reuse results of identical simulations', variable=self.ReuseResults,
+                    font=self.top.font_Text).pack(side=LEFT)
                 
         #==================================================================================
         '''                           --- PROGRESSION BAR---                            '''
@@ -335,6 +373,8 @@ class Simulate(Tabs.Tab):
     ===============================================================================  '''     
     def Btn_StartSim(self, bContinue=False):
         
+        Timers.Reset()
+
         self.Manage.Reference_Folders()
 
         if not self.Manage.Clean():
@@ -364,6 +404,20 @@ class Simulate(Tabs.Tab):
         self.DisplayMessage('   Writing report...', 2)
         self.Manage.Write_Report(bContinue)
         
+        del self.listReplicas[:]
+        if int(self.Replicas.get()) > 1 and not bContinue:
+            self.DisplayMessage('   Creating input files of the replicas...', 2)
+            if not self.Create_Replicas(int(self.Replicas.get())):
+                self.DisplayMessage('  ERROR: Could not create the input files of the replicas', 1)
+                return
+        
+        self.StoreKey = ''
+        if self.ReuseResults.get() and not bContinue and not self.listReplicas:
+            try:
+                self.StoreKey = self.ResultStore.Key(self.ConfigMD5, self.Manage.ga_inp)
+            except IOError:
+                pass
+        
         self.DisplayMessage('   Saving and modifying input files...', 2)
         #self.Manage.Modify_Input()
         self.Manage.CreateTempPDB()
@@ -406,6 +460,19 @@ class Simulate(Tabs.Tab):
         
         self.ResultsContainer.Report = self.Manage.Report
         
+        # An identical simulation already completed: serve its results
+        if self.StoreKey and self.ResultStore.Get(self.StoreKey, self.Manage.FlexAIDRunSimulationProject_Dir):
+            self.DisplayMessage('  Results of an identical simulation were found in the store.', 0)
+            self.Manage.Write_RestoredReport(self.StoreKey)
+            
+            self.StoreKey = ''
+            self.Results = True
+            self.top.ParseState = 10
+            
+            self.SuccessStatus()
+            self.Start_Update()
+            return
+        
         # return codes description
         #       -1: Parse thread has not started yet
         #        0: Parsing the logfile
@@ -425,17 +492,54 @@ class Simulate(Tabs.Tab):
 
         self.Start_Update()
         
+        if self.listReplicas:
+            # merged results of replicas cannot be continued
+            self.ResultsContainer.ConfigMD5 = ''
+            self.Btn_PauseResume.config(state='disabled')
+            
+            self.DisplayMessage('  Starting ' + str(len(self.listReplicas)) + ' replicas.', 2)
+            self.Parse = Simulation.Replicas(self, self.queue, self.listReplicas)
+            return
+        
         # START PARSING AS THREAD
         self.DisplayMessage('  Starting parsing thread.', 2)
         self.Parse = Simulation.Parse(self, self.queue)
         
-        while self.top.ParseState < 0:
-            time.sleep(self.INTERVAL)
+        self.Parse.Ready.wait()
 
         # START SIMULATION
         self.DisplayMessage('  Starting executable thread.', 2)
         self.Start = Simulation.Start(self, commandline)
         
+    ''' ==================================================================================
+    FUNCTION Create_Replicas: Creates the folder and input files of each replica
+    ==================================================================================  '''  
+    def Create_Replicas(self, Replicas):
+
+        for Replica in range(1, Replicas + 1):
+
+            Manage = ManageFiles.Manage(self)
+            
+            # replicas are parsed from their logfile only
+            Manage.NRGsuite = False
+            Manage.Now = self.Manage.Now
+            Manage.Reference_RunFolder(os.path.join(self.Manage.FlexAIDRunSimulationProject_Dir,'REPLICA_%d' % Replica))
+            
+            Manage.Temp_Dir = Manage.FlexAIDRunSimulationProject_Dir
+            Manage.LOGFILE = os.path.join(Manage.FlexAIDRunSimulationProject_Dir,'log.txt')
+            Manage.LOGFILETMP = Manage.LOGFILE + '.tmp'
+
+            if not Manage.Create_Folders():
+                del self.listReplicas[:]
+                return False
+
+            Manage.Create_CONFIG()
+            Manage.Create_ga_inp()
+
+            self.listReplicas.append(Manage)
+
+        return True
+
     ''' ==================================================================================
     FUNCTION Trace: Adds a callback function to StringVars
     ==================================================================================  '''  
@@ -672,6 +776,9 @@ class Simulate(Tabs.Tab):
                 #Create the .abort file
                 abort_file = open(self.Manage.ABORT, 'w')
                 abort_file.close()
+                
+                if self.listReplicas:
+                    self.Parse.Abort()
             except OSError:
                 self.DisplayMessage('  ERROR: An error occured while trying to abort the simulation.', 0)
                 return
@@ -700,6 +807,13 @@ class Simulate(Tabs.Tab):
                 stop_file = open(self.Manage.STOP, 'w')
                 stop_file.close()
                 
+                for Manage in self.listReplicas:
+                    stop_file = open(Manage.STOP, 'w')
+                    stop_file.close()
+                
+                # results of a stopped simulation are not stored
+                self.StoreKey = ''
+                
             except OSError:
                 self.DisplayMessage('  ERROR: An error occured while trying to stop the simulation.', 0)
                 return
@@ -723,7 +837,30 @@ class Simulate(Tabs.Tab):
     ==================================================================================  '''               
     def Load_Results(self):
         
-        self.Manage.Load_ResultFiles()
+        if self.listReplicas:
+            self.Merge_Replicas()
+        else:
+            self.Manage.Load_ResultFiles()
+        
+    ''' ==================================================================================
+    FUNCTION: Merges the results of all replicas ranked by CF
+    ==================================================================================  '''               
+    def Merge_Replicas(self):
+
+        for Manage in self.listReplicas:
+            Manage.Load_ResultFiles()
+
+        Results = self.ResultsContainer.Results
+
+        listReference = [ Result for Result in Results if Result.ResultID == -1 ]
+        listRanked = sorted([ Result for Result in Results if Result.ResultID != -1 and Result.CF != 'N/A' ],
+                            key=lambda Result: Result.CF)[:self.Manage.NUMBER_RESULTS]
+
+        for TOP, Result in enumerate(listRanked):
+            Result.ResultID = TOP + 1
+
+        Results[:] = listReference[:1] + listRanked
+        self.ResultsContainer.ResultParams = ''
         
     ''' ==================================================================================
     FUNCTION: Displays nicely the result complex
@@ -731,10 +868,10 @@ class Simulate(Tabs.Tab):
     def Nice_Display(self, Result, ResultName):
         
         cmd.hide('everything', ResultName)
-        cmd.refresh()
+        General_cmd.refresh()
         
         cmd.show('cartoon', ResultName)
-        cmd.refresh()
+        General_cmd.refresh()
                 
         for opt in Result.Optimizable:
             if opt.rnc[:3] == 'LIG':
@@ -749,7 +886,7 @@ class Simulate(Tabs.Tab):
             cmd.color('white', sele)
         
         util.cnc(ResultName)
-        cmd.refresh()
+        General_cmd.refresh()
     
     ''' ==================================================================================
     FUNCTION: Displays the h-bonds
@@ -779,11 +916,11 @@ class Simulate(Tabs.Tab):
                     ResultHBondsName = 'RESULT_' + ResultID + '_H_BONDS__'
 
                     cmd.load(Result.ResultFile, ResultName, state=1)
-                    cmd.refresh()
+                    General_cmd.refresh()
 
                     cmd.color(self.PymolColorList[i], ResultName)
                     util.cnc(ResultName)
-                    cmd.refresh()
+                    General_cmd.refresh()
 
                     self.Nice_Display(Result, ResultName)
                     self.Highlight_HBonds(Result, ResultName, ResultHBondsName)
@@ -806,13 +943,13 @@ class Simulate(Tabs.Tab):
         
         try:
             cmd.hide('everything', 'TOP_*__ & resn LIG')
-            cmd.refresh()
+            General_cmd.refresh()
 
             #cmd.hide('everything', 'RESULT_*__ & resn LIG')
             #cmd.refresh()
             
             cmd.show(display, 'TOP_*__ & resn LIG')
-            cmd.refresh()
+            General_cmd.refresh()
 
             #cmd.show(display, 'RESULT_*__ & resn LIG')
             #cmd.refresh()
@@ -820,6 +957,16 @@ class Simulate(Tabs.Tab):
         except:
             pass
                         
+    ''' ==================================================================================
+    FUNCTION Update_TopDisplay: Applies the display options to the TOP* objects (single refresh)
+    ==================================================================================  '''
+    def Update_TopDisplay(self):
+
+        with General_cmd.Batch():
+            self.Modify_LigDisplay()
+            self.Modify_Display(self.SimCartoonDisplay, 'cartoon')
+            self.Modify_Display(self.SimLinesDisplay, 'lines')
+
     ''' ==================================================================================
     FUNCTION Modify_Display: Modifies how the target is visualized in the TOP*/RESULT* objects
     ==================================================================================  '''
@@ -829,7 +976,7 @@ class Simulate(Tabs.Tab):
         
             try:
                 cmd.show(display, 'TOP_*__ & ! resn LIG')
-                cmd.refresh()
+                General_cmd.refresh()
 
                 #cmd.show(display, 'RESULT_*__ & ! resn LIG')
                 #cmd.refresh()
@@ -840,7 +987,7 @@ class Simulate(Tabs.Tab):
         else:   
             try:
                 cmd.hide(display, 'TOP_*__ & ! resn LIG')
-                cmd.refresh()
+                General_cmd.refresh()
 
                 #cmd.hide(display, 'RESULT_*__ & ! resn LIG')
                 #cmd.refresh()
@@ -895,13 +1042,19 @@ class Simulate(Tabs.Tab):
         # Results were generated.
         if self.Results:
             #print "Results were generated!"
-            self.Load_Results()
+            with Timers.Timer('Load_Results'):
+                self.Load_Results()
+
+            if self.StoreKey:
+                self.ResultStore.Set(self.StoreKey, self.Manage.FlexAIDRunSimulationProject_Dir)
+                self.StoreKey = ''
 
             NRes = self.Manage.NUMBER_RESULTS
             #if self.top.Config2.UseReference.get():
             #    NRes = NRes + 1
 
-            self.Process_ResultsContainer()
+            with Timers.Timer('Process_ResultsContainer'):
+                self.Process_ResultsContainer()
 
             Results_Dir = os.path.join(self.top.FlexAIDResultsProject_Dir, self.top.IOFile.Complex.get().upper())
             if not os.path.isdir(Results_Dir):
@@ -921,6 +1074,9 @@ class Simulate(Tabs.Tab):
                 pass
 
             self.ResultsName.set('')
+
+        # Stages timings of the run (NRGSUITE_PROFILE=1)
+        Timers.Write_Summary(os.path.join(self.Manage.FlexAIDRunSimulationProject_Dir,'timers.txt'))
                 
     ''' ==================================================================================
     FUNCTION Process_ResultsContainer: updates the data and show the results
@@ -931,7 +1087,8 @@ class Simulate(Tabs.Tab):
         self.ColorList = Color.GetHeatColorList(NRes, True)
         self.PymolColorList = Color.GetHeatColorList(NRes, False)
         
-        self.Show_Results()
+        with General_cmd.Batch():
+            self.Show_Results()
         self.update_DataList()
 
     ''' ==================================================================================
@@ -25,7 +25,7 @@ from __future__ import print_function
 @summary: Class that handle the flexAID simulation.
 
 @contain: dictAdjAtom, dictDisAngDih, CreateTempPDB, progressBarHandler
-          getVarAtoms, buildcc
+          getVarAtoms, buildcc, LogTail, PipeReader, Telemetry, ClassifyLine
 
 @organization: Najmanovich Research Group
 @creation date:  Sept. 24, 2010
@@ -37,13 +37,174 @@ from subprocess import Popen, PIPE, STDOUT
 
 import math, os, time, re
 import sys
-import shutil
+import select
+import struct
 import threading
+
+if sys.version_info[0] < 3:
+    import Queue
+else:
+    import queue as Queue
+
 import Color
 import Geometry
+import General_cmd
+import Timers
 import UpdateScreen
 
 
+# Kinds of FlexAID output lines handled by the parser
+LINE_GRID = 'grid'
+LINE_CHROMOSOME = 'chromosome'
+LINE_GENERATION = 'generation'
+LINE_BEST = 'best'
+LINE_CLUSTERING = 'clustering'
+LINE_ROTAMER = 'rotamer'
+LINE_DONE = 'done'
+LINE_SHIFTVAL = 'shiftval'
+LINE_LOUT = 'lout'
+LINE_CENTER = 'center'
+LINE_SIGMA_SHARE = 'sigma_share'
+LINE_ERROR = 'error'
+
+# Line classification table: first character -> [ (prefix, kind, compiled pattern) ]
+# A pattern of None means the prefix alone identifies the line
+dictLineDispatch = defaultdict(list)
+
+for Prefix, Kind, Pattern in ( ( 'Grid[',                LINE_GRID,          r"Grid\[(\d+)\]=" ),
+                               ( 'Generation:',          LINE_GENERATION,    r"Generation:\s*(\d+)\s+" ),
+                               ( 'best by ',             LINE_BEST,          r"best by (\w+)\s+" ),
+                               ( 'clustering all individuals', LINE_CLUSTERING, None ),
+                               ( 'Rotamer for',          LINE_ROTAMER,       None ),
+                               ( 'Done',                 LINE_DONE,          r"Done." ),
+                               ( 'shiftval=',            LINE_SHIFTVAL,      None ),
+                               ( 'lout[',                LINE_LOUT,          r"lout\[\d+\]=\s*(\d+)\s+" ),
+                               ( 'the protein center of coordinates is:', LINE_CENTER,
+                                 r"the protein center of coordinates is:\s+(\S+)\s+(\S+)\s+(\S+)\s+" ),
+                               ( 'SIGMA_SHARE',          LINE_SIGMA_SHARE,   None ),
+                               ( 'ERROR',                LINE_ERROR,         None ) ):
+
+    dictLineDispatch[Prefix[0]].append( ( Prefix, Kind, re.compile(Pattern) if Pattern else None ) )
+
+# Chromosome lines start with the (right-justified) TOP index
+#   3 (   4868.00    -180.00    -180.00    -180.00 )  cf=   67.444 cf.app=   67.444 fitnes=   14.799
+ChromosomeRegex = re.compile(r"(\s*(\d+) \()")
+ScoresRegex = re.compile(r"cf=\s*(\S+)\s+cf\.app=\s*(\S+)\s+fitnes=\s*(\S+)")
+for Char in ' \t0123456789':
+    dictLineDispatch[Char].append( ( '', LINE_CHROMOSOME, ChromosomeRegex ) )
+
+'''
+@summary: SUBROUTINE ClassifyLine: identifies a line of the FlexAID output
+@return: (kind, match) - kind is None when the line is of no interest
+'''
+def ClassifyLine(Line):
+
+    for Prefix, Kind, Regex in dictLineDispatch.get(Line[:1], ()):
+        if Line.startswith(Prefix):
+            if Regex is None:
+                return Kind, None
+
+            m = Regex.match(Line)
+            if m:
+                return Kind, m
+
+    return None, None
+
+
+# Detects the plateau of the best CF of a run
+class Convergence(object):
+
+    def __init__(self, Window, Tolerance):
+
+        # generations without an improvement greater than the tolerance
+        self.Window = Window
+        self.Tolerance = Tolerance
+
+        self.Best = None
+        self.BestGeneration = 0
+
+    '''
+    @summary: SUBROUTINE Update: Adds the CF of a chromosome of a generation
+    @return: True when the best CF has not improved by more than the tolerance for Window generations
+    '''
+    def Update(self, Generation, CF):
+
+        if self.Best is None or CF < self.Best - self.Tolerance:
+            self.Best = CF
+            self.BestGeneration = Generation
+            return False
+
+        return (Generation - self.BestGeneration) >= self.Window
+
+    '''
+    @summary: SUBROUTINE Create: Returns the convergence policy of the GA parameters (None if not used)
+    '''
+    @staticmethod
+    def Create(GAParam):
+
+        if not GAParam.EarlyStop.get():
+            return None
+
+        return Convergence(int(GAParam.StopWindow.get()), float(GAParam.StopTolerance.get()))
+
+
+# Appends one record per TOP chromosome of each generation to a CSV file of the run folder
+class Telemetry(object):
+
+    HEADER = 'generation,top,cf,cf_app,fitness,rmsd,time\n'
+
+    # records kept in memory between two writes
+    BATCH = 2000
+
+    def __init__(self, path):
+
+        self.path = path
+        self.listRecords = list()
+
+        try:
+            if not os.path.isfile(self.path) or not os.path.getsize(self.path):
+                handle = open(self.path, 'a')
+                handle.write(self.HEADER)
+                handle.close()
+        except (IOError, OSError):
+            print('  ERROR: Could not write the telemetry file ' + self.path)
+            self.path = None
+
+    '''
+    @summary: SUBROUTINE Add: Records the scores of a TOP chromosome ('N/A' values are left empty)
+    '''
+    def Add(self, Generation, TOP, CF, CFapp, Fitness, RMSD):
+
+        if self.path is None:
+            return
+
+        self.listRecords.append( '%d,%d,%s,%s,%s,%s,%.3f\n' % ( Generation, TOP,
+                                 '' if CF == 'N/A' else CF, '' if CFapp == 'N/A' else CFapp,
+                                 '' if Fitness == 'N/A' else Fitness, '' if RMSD == 'N/A' else RMSD,
+                                 time.time() ) )
+
+        if len(self.listRecords) >= self.BATCH:
+            self.Flush()
+
+    '''
+    @summary: SUBROUTINE Flush: Appends the pending records to the file
+    '''
+    def Flush(self):
+
+        if self.path is None or not self.listRecords:
+            return
+
+        try:
+            handle = open(self.path, 'a')
+            handle.write(''.join(self.listRecords))
+            handle.close()
+        except (IOError, OSError):
+            print('  ERROR: Could not write the telemetry file ' + self.path)
+            self.path = None
+
+        del self.listRecords[:]
+
+
 # Start the simulation with FlexAID
 class Start(threading.Thread):
 
@@ -67,17 +228,33 @@ class Start(threading.Thread):
         print("FlexAID starting thread has begun.")
         
         try:
-            logfile = open(self.top.Manage.LOGFILE, "w")
-            
+            Reader = self.top.Parse.Reader
+
+            if Reader is None:
+                logfile = open(self.top.Manage.LOGFILE, "w")
+                stdout = logfile
+            else:
+                # the output is parsed from the pipe, the reader writes the logfile
+                logfile = open(self.top.Manage.LOGFILE, "wb")
+                stdout = PIPE
+
             if self.FlexAID.OSid == 'WIN':
-                self.FlexAID.Run = Popen(self.commandline, shell=False, stdout=logfile, stderr=STDOUT)
+                self.FlexAID.Run = Popen(self.commandline, shell=False, stdout=stdout, stderr=STDOUT)
             else:
-                self.FlexAID.Run = Popen(self.commandline, shell=True, stdout=logfile, stderr=STDOUT)
+                self.FlexAID.Run = Popen(self.commandline, shell=True, stdout=stdout, stderr=STDOUT)
+
+            if Reader is not None:
+                Reader.Attach(self.FlexAID.Run.stdout, logfile)
                 
             print('  FlexAID is running, process waiting...')
             self.FlexAID.SimulateState = 0 # Running
+            self.top.Parse.Watch.Wake()
             self.FlexAID.Run.wait()
 
+            # all the output is queued before the parser is told FlexAID ended
+            if Reader is not None:
+                Reader.join()
+
             print("  FlexAID ended with returncode", self.FlexAID.Run.returncode)
             self.FlexAID.SimulateState = self.FlexAID.Run.returncode
             
@@ -93,6 +270,7 @@ class Start(threading.Thread):
             self.FlexAID.SimulateState = 300
         
         self.FlexAID.Run = None
+        self.top.Parse.Watch.Wake()
         
         try:
             logfile.close()
@@ -100,10 +278,542 @@ class Start(threading.Thread):
             pass
         
         print("FlexAID starting thread has ended.")
-    
+
+
+# Runs independent FlexAID replicas of one complex in parallel
+class Replicas(threading.Thread):
+
+    # Seconds between two launches (replicas must not start from the same clock seed)
+    DELAY = 1.0
+
+    def __init__(self, top, queue, listManage):
+
+        threading.Thread.__init__(self)
+
+        self.top = top
+        self.FlexAID = self.top.top
+        self.queue = queue
+
+        self.listManage = listManage
+        self.listRun = list()
+        self.Lock = threading.Lock()
+        self.Aborted = False
+
+        self.ParseFile = ''
+        self.ErrorMsg = ''
+        self.NbTotalGen = int(self.FlexAID.GAParam.NbGen.get())
+
+        self.Tail = LogTail()
+
+        # generation reached by each replica
+        self.listGeneration = [ 0 ] * len(self.listManage)
+        self.listConvergence = [ Convergence.Create(self.FlexAID.GAParam) for Manage in self.listManage ]
+        self.listTelemetry = [ Telemetry(Manage.TELEMETRY) for Manage in self.listManage ]
+        self.Generation = 0
+
+        self.start()
+
+    '''
+    @summary: SUBROUTINE run: Launches the replicas then parses their logfiles until all ended
+    '''
+    def run(self):
+
+        print("FlexAID replicas thread has begun.")
+
+        cmd.delete("TOP_*__")
+        cmd.delete("RESULT_*")
+        cmd.refresh()
+
+        self.queue.put(lambda: self.top.InitStatus())
+        self.queue.put(lambda: self.top.progressBarHandler(0, self.NbTotalGen))
+
+        self.FlexAID.ParseState = 0
+        self.FlexAID.SimulateState = 0
+
+        listLogFile = list()
+        Watch = Watcher([ Manage.LOGFILE for Manage in self.listManage ])
+
+        for Manage in self.listManage:
+
+            commandline = [ self.FlexAID.FlexAIDExecutable, Manage.CONFIG, Manage.ga_inp,
+                            os.path.join(Manage.FlexAIDRunSimulationProject_Dir,'RESULT') ]
+
+            with self.Lock:
+                if self.Aborted:
+                    break
+
+                try:
+                    logfile = open(Manage.LOGFILE, 'w')
+                    self.listRun.append(Popen(commandline, stdout=logfile, stderr=STDOUT))
+                    listLogFile.append(logfile)
+                except (IOError, OSError):
+                    print('  FATAL ERROR: Could not run the executable FlexAID.')
+                    self.FlexAID.SimulateState = 200
+                    break
+
+            print('  FlexAID replica ' + str(len(self.listRun)) + ' is running')
+
+            if len(self.listRun) < len(self.listManage):
+                time.sleep(self.DELAY)
+
+        self.queue.put(lambda: self.top.RunStatus())
+
+        while True:
+            Running = [ Run.poll() is None for Run in self.listRun ]
+
+            self.ParseLogs()
+
+            if not any(Running):
+                break
+
+            Watch.Wait(self.top.INTERVAL)
+
+        Watch.Close()
+
+        for logfile in listLogFile:
+            logfile.close()
+
+        for Record in self.listTelemetry:
+            Record.Flush()
+
+        self.End()
+
+        print("FlexAID replicas thread has ended.")
+
+    '''
+    @summary: SUBROUTINE ParseLogs: Updates the progress from the logfile of each replica
+    '''
+    def ParseLogs(self):
+
+        for Replica, Manage in enumerate(self.listManage):
+
+            try:
+                Lines = self.Tail.Read(Manage.LOGFILE)
+            except (IOError, OSError):
+                continue
+
+            for Line in Lines:
+                Kind, m = ClassifyLine(Line)
+
+                if Kind == LINE_GENERATION:
+                    self.listGeneration[Replica] = int(m.group(1))
+
+                elif Kind == LINE_CHROMOSOME:
+                    Scores = ScoresRegex.search(Line)
+                    if not Scores:
+                        continue
+
+                    self.listTelemetry[Replica].Add(self.listGeneration[Replica], int(m.group(2)),
+                                                    Scores.group(1), Scores.group(2), Scores.group(3), 'N/A')
+
+                    if self.listConvergence[Replica] is not None and \
+                       self.listConvergence[Replica].Update(self.listGeneration[Replica], float(Scores.group(1))):
+                        self.listConvergence[Replica] = None
+                        self.Stop(Manage)
+
+                elif Kind == LINE_CLUSTERING:
+                    self.top.Results = True
+
+                elif Kind == LINE_ERROR:
+                    self.ErrorMsg = Line.strip()
+
+        # progress of the slowest replica
+        Generation = min(self.listGeneration)
+        if Generation != self.Generation:
+            self.Generation = Generation
+            self.queue.put(lambda: self.top.progressBarHandler(Generation, self.NbTotalGen))
+
+    '''
+    @summary: SUBROUTINE End: Sets the final state once all the replicas ended
+    '''
+    def End(self):
+
+        listReturnCode = [ Run.returncode for Run in self.listRun ]
+
+        if self.Aborted:
+            self.top.Results = False
+            self.queue.put(lambda: self.top.SuccessStatus())
+
+        elif self.FlexAID.SimulateState == 0 and listReturnCode and not any(listReturnCode):
+            self.queue.put(lambda: self.top.SuccessStatus())
+
+        elif self.top.Results:
+            # the results of the replicas that succeeded are kept
+            print('  FlexAID replicas ended with returncodes', listReturnCode)
+            self.queue.put(lambda: self.top.SuccessStatus())
+
+        else:
+            if not self.ErrorMsg:
+                self.ErrorMsg = '*FlexAID ERROR: All replicas ended with an error'
+            self.queue.put(lambda: self.top.ErrorStatus(self.ErrorMsg))
+
+        self.FlexAID.ParseState = 10
+
+    '''
+    @summary: SUBROUTINE Stop: Stops a replica that converged
+    '''
+    def Stop(self, Manage):
+
+        try:
+            stop_file = open(Manage.STOP, 'w')
+            stop_file.close()
+        except IOError:
+            pass
+
+    '''
+    @summary: SUBROUTINE Abort: Kills the running replicas
+    '''
+    def Abort(self):
+
+        with self.Lock:
+            self.Aborted = True
+
+            for Run in self.listRun:
+                try:
+                    Run.kill()
+                except:
+                    pass
+
+
+# Reads only the bytes appended to a file since the last read
+class LogTail(object):
+
+    def __init__(self):
+
+        # path -> [ byte offset, file identity, partial line ]
+        self.dictState = dict()
+
+    '''
+    @summary: SUBROUTINE Reset: Forgets the position in a file (file was removed/recreated)
+    '''
+    def Reset(self, path):
+
+        self.dictState.pop(path, None)
+
+    '''
+    @summary: SUBROUTINE Read: Returns the complete lines appended to the file since the last call.
+              A trailing incomplete line is kept until its newline is written.
+              Raises IOError/OSError if the file cannot be opened.
+    '''
+    def Read(self, path):
+
+        handle = open(path, 'rb')
+
+        try:
+            st = os.fstat(handle.fileno())
+            ident = (st.st_dev, st.st_ino)
+
+            state = self.dictState.get(path)
+
+            # File was truncated or replaced by another one: start over
+            if state is None or state[1] != ident or st.st_size < state[0]:
+                state = [ 0, ident, b'' ]
+                self.dictState[path] = state
+
+            if st.st_size == state[0]:
+                return []
+
+            handle.seek(state[0])
+            data = handle.read()
+
+        finally:
+            handle.close()
+
+        state[0] += len(data)
+        data = state[2] + data
+
+        end = data.rfind(b'\n') + 1
+        state[2] = data[end:]
+
+        if not end:
+            return []
+
+        data = data[:end].replace(b'\r\n', b'\n')
+        if sys.version_info[0] >= 3:
+            data = data.decode('latin-1')
+
+        return [ Line + '\n' for Line in data[:-1].split('\n') ]
+
+
+# Reads the output of FlexAID from a pipe into a bounded queue of lines (teed to the logfile)
+class PipeReader(threading.Thread):
+
+    # seconds between two attempts to queue a line when the queue is full
+    RETRY = 0.10
+
+    def __init__(self, MaxLines, Watch):
+
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.Lines = Queue.Queue(MaxLines)
+        self.Watch = Watch
+        self.Closed = False
+
+        self.Stream = None
+        self.logfile = None
+
+    '''
+    @summary: SUBROUTINE Attach: Starts reading the output stream of the process
+    '''
+    def Attach(self, Stream, logfile):
+
+        self.Stream = Stream
+        self.logfile = logfile
+
+        self.start()
+
+    '''
+    @summary: SUBROUTINE run: Queues the lines of the stream until the process closes it
+    '''
+    def run(self):
+
+        try:
+            for Line in iter(self.Stream.readline, b''):
+
+                # keep the logfile as written by FlexAID
+                self.logfile.write(Line)
+
+                if self.Closed:
+                    continue
+
+                Line = Line.rstrip(b'\r\n') + b'\n'
+                if sys.version_info[0] >= 3:
+                    Line = Line.decode('latin-1')
+
+                # the queue is full: FlexAID waits for the parser
+                while not self.Closed:
+                    try:
+                        self.Lines.put(Line, True, self.RETRY)
+                        break
+                    except Queue.Full:
+                        pass
+
+                # the parser drains the queue once woken by its first line
+                if self.Lines.qsize() == 1:
+                    self.Watch.Wake()
+
+        except (IOError, OSError, ValueError):
+            pass
+
+        finally:
+            self.Stream.close()
+
+    '''
+    @summary: SUBROUTINE Read: Returns the lines queued since the last call (at most MaxLines)
+    '''
+    def Read(self, MaxLines=None):
+
+        Lines = list()
+        try:
+            while MaxLines is None or len(Lines) < MaxLines:
+                Lines.append(self.Lines.get_nowait())
+        except Queue.Empty:
+            pass
+
+        return Lines
+
+    '''
+    @summary: SUBROUTINE Close: The parser stopped, lines are no longer queued
+    '''
+    def Close(self):
+
+        self.Closed = True
+
+
+# Wakes a parser when watched files change (inotify on Linux, stat polling otherwise)
+class Watcher(object):
+
+    # inotify events of interest
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0x00000800
+
+    # seconds between two checks of the polling fallback: short after a change, then
+    # doubled while the files are idle up to the sleep of the former polling loop
+    POLL_MIN = 0.02
+    POLL_MAX = 0.20
+
+    def __init__(self, listFiles):
+
+        self.listFiles = listFiles
+        self.setNames = set([ os.path.basename(File) for File in listFiles ])
+
+        self.Woken = threading.Event()
+        self.dictStat = self.Get_Stat()
+        self.Poll = self.POLL_MIN
+
+        # Wake (any thread) and Close do not use the descriptors at the same time
+        self.Lock = threading.Lock()
+
+        self.fd = -1
+        self.Pipe = None
+
+        if sys.platform.startswith('linux'):
+            self.Init_Inotify()
+
+    '''
+    @summary: SUBROUTINE Init_Inotify: Watches the folders of the files with inotify (polling if unavailable)
+    '''
+    def Init_Inotify(self):
+
+        try:
+            import ctypes, ctypes.util
+
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+            fd = libc.inotify_init1(self.IN_NONBLOCK)
+            if fd < 0:
+                return
+
+            Mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+
+            for Dir in set([ os.path.dirname(File) for File in self.listFiles ]):
+                if libc.inotify_add_watch(fd, Dir.encode(sys.getfilesystemencoding()), Mask) < 0:
+                    os.close(fd)
+                    return
+
+            self.fd = fd
+            self.Pipe = os.pipe()
+
+        except (OSError, AttributeError):
+            self.fd = -1
+
+    '''
+    @summary: SUBROUTINE Get_Stat: Returns the size and modification time of the watched files
+    '''
+    def Get_Stat(self):
+
+        dictStat = dict()
+
+        for File in self.listFiles:
+            try:
+                st = os.stat(File)
+                dictStat[File] = (st.st_size, st.st_mtime)
+            except OSError:
+                dictStat[File] = None
+
+        return dictStat
+
+    '''
+    @summary: SUBROUTINE Wait: Blocks until a watched file changed, Wake is called or Timeout elapsed
+    @return: True if woken before the timeout
+    '''
+    def Wait(self, Timeout):
+
+        if self.fd >= 0:
+            return self.Wait_Inotify(Timeout)
+
+        End = time.time() + Timeout
+
+        while True:
+            dictStat = self.Get_Stat()
+            if dictStat != self.dictStat:
+                self.dictStat = dictStat
+                self.Poll = self.POLL_MIN
+                return True
+
+            Remaining = End - time.time()
+            if Remaining <= 0:
+                return False
+
+            if self.Woken.wait(min(self.Poll, Remaining)):
+                self.Woken.clear()
+                return True
+
+            self.Poll = min(self.Poll * 2.0, self.POLL_MAX)
+
+    '''
+    @summary: SUBROUTINE Wait_Inotify: Wait using the inotify events of the watched folders
+    '''
+    def Wait_Inotify(self, Timeout):
+
+        End = time.time() + Timeout
+
+        while True:
+            Remaining = End - time.time()
+            if Remaining <= 0:
+                return False
+
+            try:
+                Readable = select.select([ self.fd, self.Pipe[0] ], [], [], Remaining)[0]
+            except (select.error, OSError, ValueError):
+                return False
+
+            if self.Pipe[0] in Readable:
+                os.read(self.Pipe[0], 4096)
+                return True
+
+            if self.fd in Readable and self.Read_Events():
+                return True
+
+    '''
+    @summary: SUBROUTINE Read_Events: Reads the pending inotify events
+    @return: True if one of the events concerns a watched file
+    '''
+    def Read_Events(self):
+
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError:
+            return False
+
+        Changed = False
+        Offset = 0
+
+        while Offset + 16 <= len(data):
+            wd, Mask, Cookie, Length = struct.unpack_from('iIII', data, Offset)
+
+            Name = data[Offset+16:Offset+16+Length].rstrip(b'\0')
+            if sys.version_info[0] >= 3:
+                Name = Name.decode(sys.getfilesystemencoding())
+
+            if Name in self.setNames:
+                Changed = True
+
+            Offset += 16 + Length
+
+        return Changed
+
+    '''
+    @summary: SUBROUTINE Wake: Wakes the waiting thread (e.g. the watched process ended)
+    '''
+    def Wake(self):
+
+        with self.Lock:
+            if self.fd >= 0:
+                try:
+                    os.write(self.Pipe[1], b'\0')
+                except OSError:
+                    pass
+                return
+
+        self.Woken.set()
+
+    '''
+    @summary: SUBROUTINE Close: Releases the inotify descriptors
+    '''
+    def Close(self):
+
+        with self.Lock:
+            if self.fd >= 0:
+                for fd in [ self.fd ] + list(self.Pipe):
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+
+                self.fd = -1
+
 
 class Parse(threading.Thread):
     
+    # Longest wait for a change of the parsed files (seconds)
+    WATCH_TIMEOUT = 1.0
+
     def __init__(self, top, queue):
         
         threading.Thread.__init__(self)
@@ -120,6 +830,18 @@ class Parse(threading.Thread):
         self.LOGFILETMP = self.top.Manage.LOGFILETMP
         self.ParseFile = self.LOGFILE
 
+        # Wakes the parser on changes of the parsed files
+        self.Watch = Watcher([ self.LOGFILE, self.UPDATE ])
+        self.Ready = threading.Event()
+
+        # Output of FlexAID read from a pipe instead of the logfile
+        self.Reader = None
+        if self.top.PIPE_OUTPUT:
+            self.Reader = PipeReader(self.top.PIPE_BUFFER, self.Watch)
+
+        # Lines of the pipe not parsed yet (read while parsing the .update files)
+        self.PipeLines = list()
+
         self.LigandName = self.FlexAID.IOFile.LigandName.get()
         self.TargetName = self.FlexAID.IOFile.TargetName.get()
         
@@ -144,18 +866,33 @@ class Parse(threading.Thread):
 
         self.Generation = -1
         self.Best = ''
+
+        # Early stopping when the best CF reached a plateau
+        self.Convergence = Convergence.Create(self.FlexAID.GAParam)
+
+        # Scores of every generation written to the run folder
+        self.Telemetry = Telemetry(self.top.Manage.TELEMETRY)
+
+        # Live display scheduling (frame budget)
+        self.Render = 0
+        self.RenderPending = 0
+        self.LastRender = 0.0
+        self.RenderInterval = 1.0 / self.top.RENDER_RATE
         self.TOP = -1
         
         self.ErrorMsg = ''
-        self.State = 1
-        self.CurrentState = 0
 
         self.Ori =  [ 0.0, 0.0, 0.0 ]    # Origin coordinate
         self.OriX = [ 0.0, 0.0, 0.0 ]   # Origin coordinate with X+1
         self.OriY = [ 0.0, 0.0, 0.0 ]   # Origin coordinate with Y+1
 
-        self.nRead = dict()
+        self.Tail = LogTail()
         self.ListAtom = list()
+        self.BuildPlan = None
+        self.listTopPoses = list()
+        self.LigandIDs = None
+        self.dictSideChainState = dict()
+        self.dictSideChainDefault = dict()
         self.dictSideChainNRot = dict()
         self.dictSideChainRotamers = dict()
         self.GridVertex = dict()
@@ -194,20 +931,29 @@ class Parse(threading.Thread):
         # send ready to simulate signal
         print('  Signal sent to start simulation')
         self.FlexAID.ParseState = 0
+        self.Ready.set()
         
         print('  Waiting for FlexAID to start')
         # wait for FlexAID to start, to crash or to finish (if simulation is very short and quickly done)
         while self.FlexAID.SimulateState < 0:
-            time.sleep(self.top.INTERVAL)
+            self.Watch.Wait(self.top.INTERVAL)
             
         print('  Parsing the logfile of FlexAID')
         while self.FlexAID.Run is not None: # and self.FlexAID.Run.poll() is None:
-            time.sleep(self.top.INTERVAL)
+            # woken as soon as the logfile or .update changed (or FlexAID ended)
+            self.Watch.Wait(self.WATCH_TIMEOUT)
             if self.ParseLines():
                 break
         
         if not self.FlexAID.ParseState > 0:
             self.ParseLines()
+
+        self.Telemetry.Flush()
+        
+        if self.Reader is not None:
+            self.Reader.Close()
+
+        self.Watch.Close()
         
         # Put back the auto_zoom to on
         cmd.set("auto_zoom", self.auto_zoom)
@@ -235,40 +981,36 @@ class Parse(threading.Thread):
     '''
     @summary: SUBROUTINE ParseLines: parses the lines of the parsing file (logfile or update file)
     '''
+    @Timers.Timed('ParseLines')
     def ParseLines(self):
 
-        # Once copied cannot go change file (safe-protection)
+        # Once read cannot go change file (safe-protection)
         ParseFile = self.ParseFile
 
+        # FlexAID blocks on its output when the pipe is not drained
+        self.Drain_Pipe()
+
         if self.top.Paused:
             return 0
 
-        elif self.CopyRead(ParseFile):
-            self.ErrorMsg = '*NRGsuite ERROR: Could not successfully copy/read temporary files'
+        elif self.TailRead(ParseFile):
+            self.ErrorMsg = '*NRGsuite ERROR: Could not successfully read temporary files'
             self.FlexAID.ParseState = 1
             return 1
 
-        #print "Parse starting at line", self.nRead.get(ParseFile,0)
-        if self.nRead.get(ParseFile):
-            # Resume a file that was not read completely
-            self.Lines = self.Lines[self.nRead[ParseFile]:]
-        else:
-            self.nRead[ParseFile] = 0
+        # Generations followed by a newer one in the same read are stale
+        LastGeneration = self.Get_LastGeneration()
 
-        for Line in self.Lines:
+        for Index, Line in enumerate(self.Lines):
 
-            # check line completion
-            m = re.search('\n', Line)
-            if m:
-                self.nRead[ParseFile] += 1
-            else:
-                # EOF signal - will resume from here next time
-                break
-            
             #print Line
 
-            m = re.match("Grid\[(\d+)\]=", Line)
-            if m:
+            Kind, m = ClassifyLine(Line)
+
+            if Kind is None:
+                continue
+
+            elif Kind == LINE_GRID:
                 index = int(m.group(1))
 
                 strcoor = Line[(Line.find('=')+1):]
@@ -278,9 +1020,7 @@ class Parse(threading.Thread):
 
                 continue
 
-
-            m = re.match("(\s*(\d+) \()", Line)
-            if m:
+            elif Kind == LINE_CHROMOSOME:
                 #print Line
 
                 self.TOP = int(m.group(2))
@@ -291,24 +1031,34 @@ class Parse(threading.Thread):
                 if self.Best == 'energy' and self.Generation != -1 and self.TOP != -1:
 
                     # Reading the values calculated for the generation
-                    if (self.Generation % self.NbGenFreq) == 0 or self.Generation == self.NbTotalGen:
+                    if self.Render:
 
                         ID = str(self.Generation) + '.' + str(self.TOP)
                         #print("updating " + ID)
 
                         #print Line
-                        Update = UpdateScreen.UpdateScreen( self, ID, colNo, Line, self.CurrentState, self.TOP, 
-                                                            self.Translation, self.Rotation )
+                        if self.BuildPlan is None:
+                            with General_cmd.Batch():
+                                Update = UpdateScreen.UpdateScreen( self, ID, colNo, Line, self.TOP, 
+                                                                    self.Translation, self.Rotation )
+                        else:
+                            # Poses are built together once all the TOP lines of the generation are read
+                            Update = UpdateScreen.UpdateScreen( self, ID, colNo, Line, self.TOP, 
+                                                                self.Translation, self.Rotation, Deferred=True )
+                            if not Update.Decode():
+                                self.listTopPoses.append( ( Update, self.BuildPlan.Gather(self.DisAngDih) ) )
+                            else:
+                                self.Skip_Pose(Line, self.TOP)
 
                         if (self.TOP+1) == self.NbTopChrom:
-                            self.State = self.CurrentState
+                            self.Build_TopPoses()
 
                             # Update energy/fitness table
                             self.queue.put(lambda: self.top.update_DataList())
 
-                            self.queue.put(lambda: self.top.Modify_LigDisplay())
-                            self.queue.put(lambda: self.top.Modify_Display(self.top.SimCartoonDisplay, 'cartoon'))
-                            self.queue.put(lambda: self.top.Modify_Display(self.top.SimLinesDisplay, 'lines'))
+                            self.queue.put(lambda: self.top.Update_TopDisplay())
+
+                            self.LastRender = time.time()
 
                     else:
                         self.UpdateDataList(Line, self.TOP, 0, None)
@@ -319,7 +1069,8 @@ class Parse(threading.Thread):
                     # Ready to read another file
                     if (self.TOP+1) == self.NbTopChrom:
 
-                        self.nRead[ParseFile] = 0
+                        if ParseFile != self.LOGFILE:
+                            self.Tail.Reset(ParseFile)
 
                         if self.Generation == self.NbTotalGen:
                             self.ParseFile = self.LOGFILE
@@ -332,46 +1083,42 @@ class Parse(threading.Thread):
 
                 continue
 
-            m = re.match("Generation:\s*(\d+)\s+", Line)
-            if m:
+            elif Kind == LINE_GENERATION:
                 #print Line
 
                 self.Generation = int(m.group(1))
                 #print("Generation " + str(self.Generation))
-                self.CurrentState = self.State + 1
+                del self.listTopPoses[:]
+
+                self.Render = self.Schedule_Render(Index < LastGeneration)
 
                 self.queue.put(lambda: self.top.progressBarHandler(self.Generation, self.NbTotalGen))
 
                 continue
 
-            m = re.match("best by (\w+)\s+", Line)
-            if m:
+            elif Kind == LINE_BEST:
                 #print Line
 
                 self.Best = m.group(1)
                 #print "Best by " + self.Best
                 continue
 
-            m = re.match("clustering all individuals", Line)
-            if m:
+            elif Kind == LINE_CLUSTERING:
                 #print Line
                 self.top.Results = True
                 self.queue.put(lambda: self.top.ClusterStatus())
 
                 continue
 
-            m = re.match("Rotamer for", Line)
-            if m:                        
+            elif Kind == LINE_ROTAMER:                        
                 self.AddRotamerFromLine(Line)
 
                 continue
 
-            m = re.match("Done.", Line)
-            if m:
+            elif Kind == LINE_DONE:
                 continue
 
-            m = re.match("shiftval=", Line)
-            if m and self.FlexStatus != '':
+            elif Kind == LINE_SHIFTVAL and self.FlexStatus != '':
                 
                 # Shift values for fixed dihedrals between pair-triplets of atoms
                 fields = Line.split()
@@ -381,17 +1128,22 @@ class Parse(threading.Thread):
                 
                 continue
 
-            m = re.match("lout\[\d+\]=\s*(\d+)\s+", Line)
-            if m:                        
+            elif Kind == LINE_LOUT:                        
                 self.ListAtom.append(int(m.group(1)))
                 if len(self.ListAtom) == self.nbAtoms:
                     # Order the FLEDIH based on the atoms occurences
                     self.OrderFledih()
 
+                    # The build order of the ligand is final for the whole run
+                    # (deep ligands with few TOPs are faster built atom by atom)
+                    if Geometry.numpy is not None:
+                        BuildPlan = Geometry.BuildPlan(self.ListAtom, self.RecAtom)
+                        if BuildPlan.Vectorized(self.NbTopChrom):
+                            self.BuildPlan = BuildPlan
+
                 continue
 
-            m = re.match("the protein center of coordinates is:\s+(\S+)\s+(\S+)\s+(\S+)\s+", Line)
-            if m:
+            elif Kind == LINE_CENTER:
                 self.Ori[0] = float(m.group(1))
                 self.Ori[1] = float(m.group(2))
                 self.Ori[2] = float(m.group(3))
@@ -406,8 +1158,7 @@ class Parse(threading.Thread):
 
                 continue            
 
-            m = re.match("SIGMA_SHARE", Line)
-            if m:                            
+            elif Kind == LINE_SIGMA_SHARE:                            
                 self.queue.put(lambda: self.top.RunStatus())
 
                 self.ParseFile = self.UPDATE
@@ -415,8 +1166,7 @@ class Parse(threading.Thread):
                 continue
 
             # track errors
-            m = re.match("ERROR", Line)
-            if m:
+            elif Kind == LINE_ERROR:
                 Line = Line.rstrip('\n')
                 self.ErrorMsg = '*FlexAID ' + Line
                 self.FlexAID.ParseState = 2
@@ -430,9 +1180,47 @@ class Parse(threading.Thread):
                 
         return 0
         
+    '''=========================================================================
+       Schedule_Render: Determines if the poses of the current generation are
+                        displayed. Every generation updates the data table but
+                        poses are rendered at most RENDER_RATE times per second.
+                        Dropped generations are not queued: the next available
+                        one is rendered instead.
+    ========================================================================='''
+    def Schedule_Render(self, Stale):
+
+        # The last generation is always displayed
+        if self.Generation == self.NbTotalGen:
+            return 1
+
+        if (self.Generation % self.NbGenFreq) == 0:
+            self.RenderPending = 1
+
+        if not self.RenderPending or Stale:
+            return 0
+
+        if (time.time() - self.LastRender) < self.RenderInterval:
+            return 0
+
+        self.RenderPending = 0
+
+        return 1
+
+    '''=========================================================================
+       Get_LastGeneration: Index of the last generation line read
+    ========================================================================='''
+    def Get_LastGeneration(self):
+
+        for Index in range(len(self.Lines)-1, -1, -1):
+            if self.Lines[Index].startswith('Generation:'):
+                return Index
+
+        return -1
+
     '''=========================================================================
        UpdateDataList: Updates the table containing energy/fitness values
     ========================================================================='''
+    @Timers.Timed('UpdateDataList')
     def UpdateDataList(self, Line, TOP, Reference, dictCoord):
         
         try:
@@ -451,6 +1239,10 @@ class Parse(threading.Thread):
             if colNo != -1:
                 #Update the energy of the dictionary
                 self.top.dictSimData[TOP+1][0] = Line[(colNo+3):colNo2].strip()     # Energy
+
+                if self.Convergence is not None and \
+                   self.Convergence.Update(self.Generation, float(self.top.dictSimData[TOP+1][0])):
+                    self.Stop_Converged()
             else:
                 self.top.dictSimData[TOP+1][0] = 'N/A'
 
@@ -477,6 +1269,8 @@ class Parse(threading.Thread):
 
             self.top.dictSimData[TOP+1][3] = RMSD
 
+            self.Telemetry.Add(self.Generation, TOP, *self.top.dictSimData[TOP+1])
+
         except:
             self.queue.put(lambda: self.top.DisplayMessage("  ERROR: Could not update data list.", 2))
             return 1
@@ -484,6 +1278,45 @@ class Parse(threading.Thread):
         return 0
 
 
+    '''
+    @summary: SUBROUTINE Skip_Pose: The pose of a TOP could not be decoded, only its scores are shown
+    '''
+    def Skip_Pose(self, Line, TOP):
+
+        print('  Could not decode the pose of TOP ' + str(TOP+1) + ' at generation ' + str(self.Generation))
+
+        self.UpdateDataList(Line, TOP, 0, None)
+
+    '''
+    @summary: SUBROUTINE Stop_Converged: Stops the simulation (as the Stop button) once converged
+    '''
+    def Stop_Converged(self):
+
+        self.Convergence = None
+
+        self.queue.put(lambda: self.top.DisplayMessage("  The best CF did not improve for " + self.top.top.GAParam.StopWindow.get() +
+                                                       " generations: stopping the simulation.", 2))
+        self.queue.put(lambda: self.top.Btn_StopSim())
+
+    '''
+    @summary: SUBROUTINE Build_TopPoses: Reconstructs all the TOP poses of the generation in one
+                                         vectorized pass (K x N x 3) and displays them
+    '''
+    @Timers.Timed('Build_TopPoses')
+    def Build_TopPoses(self):
+
+        if not self.listTopPoses:
+            return
+
+        Coords = Geometry.buildcc_array(self.BuildPlan, [ DisAngDih for Update, DisAngDih in self.listTopPoses ], self.Ori)
+
+        # The viewer is refreshed once all the poses are updated
+        with General_cmd.Batch():
+            for (Update, DisAngDih), PoseCoords in zip(self.listTopPoses, Coords):
+                Update.Display(self.BuildPlan.ToDict(PoseCoords))
+
+        del self.listTopPoses[:]
+
     '''
     @summary: SUBROUTINE OrderFledih: Order the FLEDIH atoms number based on
                                       the ligand construction (lout) if REQUIRED!                
@@ -562,6 +1395,7 @@ class Parse(threading.Thread):
         while TIME < self.top.TIMEOUT:
             try:
                 os.remove(self.UPDATE)
+                self.Tail.Reset(self.UPDATE)
                 break
                 
             except OSError:
@@ -577,20 +1411,29 @@ class Parse(threading.Thread):
         return 0
     
     '''
-    @summary: SUBROUTINE: CopyRead_UPDATE: Tries to copy then read the .read (log.txt OR .update) file
+    @summary: SUBROUTINE: TailRead: Tries to read the new lines of the parsing file (log.txt OR .update)
     '''
-    def CopyRead(self, ParseFile):
+    @Timers.Timed('TailRead')
+    def TailRead(self, ParseFile):
+
+        # the lines of the logfile are queued by the pipe reader
+        if ParseFile == self.LOGFILE and self.Reader is not None:
+            self.Drain_Pipe()
+            self.Lines = self.PipeLines
+            self.PipeLines = list()
+
+            # lines left in the queue are read at the next loop without waiting
+            if not self.Reader.Lines.empty():
+                self.Watch.Wake()
+
+            return 0
     
-        TIME = 0
-        while TIME < self.top.TIMEOUT:
+        End = time.time() + self.top.TIMEOUT
+        while time.time() < End:
             
             try:
-                shutil.copy(ParseFile, self.READ)
-
-                readhandle = open(self.READ, 'r')
-                self.Lines = readhandle.readlines()
-                readhandle.close()
-                break
+                self.Lines = self.Tail.Read(ParseFile)
+                return 0
                 
             except OSError:
                 pass
@@ -598,12 +1441,19 @@ class Parse(threading.Thread):
             except IOError:
                 pass
             
-            time.sleep(self.top.INTERVAL)
+            # woken when the file is created
+            self.Watch.Wait(self.top.INTERVAL)
+            self.Drain_Pipe()
 
-            TIME = TIME + self.top.INTERVAL
-            
-        if TIME >= self.top.TIMEOUT:
-            return 1
-            
-        return 0
+        return 1
+
+    '''
+    @summary: SUBROUTINE Drain_Pipe: Moves the lines queued by the pipe reader to the lines
+                                     to parse once back on the logfile (as when tailing it).
+                                     At most PIPE_BUFFER lines are held, the others are left
+                                     in the queue of the reader which then throttles FlexAID
+    '''
+    def Drain_Pipe(self):
 
+        if self.Reader is not None:
+            self.PipeLines.extend(self.Reader.Read(self.top.PIPE_BUFFER - len(self.PipeLines)))
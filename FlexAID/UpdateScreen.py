@@ -26,11 +26,16 @@ from pymol import util
 #import threading
 import Geometry
 import Constants
+import General_cmd
+import Timers
 
 
 class UpdateScreen(object):
 
-    def __init__(self, top, ID, colNo, Line, State, TOP, Translation, Rotation):
+    # Single state of the solution objects, updated in place at every rendered generation
+    STATE = 1
+
+    def __init__(self, top, ID, colNo, Line, TOP, Translation, Rotation, Deferred=False):
         #threading.Thread.__init__(self)
 
         self.top = top
@@ -51,9 +56,8 @@ class UpdateScreen(object):
         # input line to parse
         self.Line = Line
         
-        # State on which updating is happening
-        # self.State = State
-        self.State = 1
+        # State on which updating is happening (the only state of the solution object)
+        self.State = self.STATE
         
         self.dictFlexBonds = self.top.dictFlexBonds
         
@@ -61,15 +65,19 @@ class UpdateScreen(object):
         self.TargetName = self.top.TargetName
         
         self.LigandObj = self.LigandName + '_' + str(self.TOP+1)
-        self.TargetObj = self.TargetName + '_' + str(self.TOP+1)
+
+        # Solution object of the TOP, kept and updated in place for the whole run
+        self.SolutionObj = "TOP_" + str(self.TOP+1) + "__"
         
-        # Selections of molecules (ligand/side-chain/protein)
-        self.selTarget = '(' + self.TargetObj + ' & present)'
-        self.selLigand = '(' + self.LigandObj + ' & present)'
+        # Selections of molecules (ligand/side-chain)
+        self.selLigand = "(resn LIG & " + self.SolutionObj + " & present)"
         self.selSideChains = ''
 
-        # start thread
-        self.start()
+        self.dictCoord = {}
+
+        # start thread (deferred updates are driven by Decode/Display)
+        if not Deferred:
+            self.start()
     
     def start(self):
     
@@ -77,29 +85,46 @@ class UpdateScreen(object):
     
     # Updates the PyMOL interface
     def Update(self):
-        
-        try:
-            # Copy the initial protein (Frame 1) into the working state
-            cmd.create(self.TargetObj, self.TargetName, 1, self.State)
-            cmd.refresh()
 
+        if not self.Decode():
+            self.Display(Geometry.buildcc(self.top.ListAtom,self.top.RecAtom,self.top.DisAngDih,self.top.Ori))
+        else:
+            self.top.Skip_Pose(self.Line, self.TOP)
+
+        return
+
+    '''=========================================================================
+       Decode: Sets the internal coordinates of the ligand from the genes of the line
+    ========================================================================='''
+    def Decode(self):
+
+        if self.UpdateLigandAnchorPoint() or self.UpdateLigandFlexibility():
+            return 1
+
+        return 0
+
+    '''=========================================================================
+       Display: Shows the pose built from the decoded internal coordinates
+    ========================================================================='''
+    def Display(self, dictCoord):
+
+        self.dictCoord = dictCoord
+
+        if self.CreateSolution():
+            self.Delete_Object()
+            return
+
+        try:
             # Display the last frame
             cmd.frame(self.State)
             #print "Switched to frame " + str(self.State)
 
         except:
-            self.CriticalError("Object " + str(self.TargetName) + " no longer exists")
-        
-        
-        if not self.UpdateLigandAnchorPoint() and not self.UpdateLigandFlexibility():
-        
-            self.selSideChains = self.UpdateSideChainConformations()
-            
-            if self.WriteOutLigand() or self.EditView() or \
-               self.top.UpdateDataList(self.Line, self.TOP, self.top.Reference, self.dictCoord):
-                self.Delete_Object()
+            self.CriticalError("Could not display frame " + str(self.State))
 
-        self.Delete_Object()
+        if self.UpdateSideChainConformations() or self.UpdateLigandCoords() or \
+           self.top.UpdateDataList(self.Line, self.TOP, self.top.Reference, self.dictCoord):
+            self.Delete_Object()
         
         return
         
@@ -109,61 +134,60 @@ class UpdateScreen(object):
     def Delete_Object(self):
 
         try:
-            # delete temporary protein PDB file
-            cmd.delete(self.TargetObj)
-            cmd.refresh()
-
+            # solution is rebuilt from the target at the next update
+            cmd.delete(self.SolutionObj)
             cmd.delete(self.LigandObj)
-            cmd.refresh()
+            General_cmd.refresh()
 
         except:
-            self.CriticalError("Object " + str(self.TargetObj) + " no longer exists")
+            self.CriticalError("Object " + str(self.SolutionObj) + " no longer exists")
+
+        for residue in self.top.listSideChain:
+            self.top.dictSideChainState.pop((self.TOP, self.State, residue), None)
 
     '''=========================================================================
-       EditView: Edit the visual aspects of the PyMOL interface
+       CreateSolution: Creates the solution object of the TOP the first time it is shown
     ========================================================================='''
-    def EditView(self):
+    @Timers.Timed('CreateSolution')
+    def CreateSolution(self):
         
-        #Display the ligand with the new coordinates
-        #print "will load " + self.LigandObj + " in state " + str(self.State) 
-        try:
-            cmd.load(self.top.listTmpPDB[self.TOP+1], self.LigandObj, self.State)
-            cmd.refresh()
+        if self.SolutionObj in cmd.get_names('objects'):
+            return 0
 
-            # No flexible side-chain(s)
-            if self.selSideChains == '':
-                selString = self.selLigand + " or " + self.selTarget
-            else:
-                selString = self.selSideChains + " or " + self.selLigand + " or " + self.selTarget                         
-            #print selString
-
-            # Create solution object
+        try:
             # Object contains the whole protein-ligand complex
-            SolutionObj = "TOP_" + str(self.TOP+1) + "__"
-            cmd.create(SolutionObj, selString, self.State, self.State)
-            cmd.refresh()
+            # The target is copied once per TOP, afterwards only the ligand and
+            # the flexible side-chains are moved
+            cmd.load(self.top.ReferencePath, self.LigandObj, self.State)
+            cmd.create(self.SolutionObj, "(" + self.TargetName + ") or (" + self.LigandObj + ")", 1, self.State)
+            cmd.delete(self.LigandObj)
+            General_cmd.refresh()
+
+            # Atom order of the ligand (serial numbers are the FlexAID atom numbers)
+            if self.top.LigandIDs is None:
+                IDs = []
+                cmd.iterate(self.selLigand, 'IDs.append(ID)', space={'IDs': IDs})
+                self.top.LigandIDs = IDs
 
             # Color ligand of solution TOP
-            Selection = "(resn LIG & " + SolutionObj + " & present)"
-            cmd.color(self.top.top.PymolColorList[self.TOP], Selection)
-            util.cnc(Selection)
-            cmd.refresh()
+            cmd.color(self.top.top.PymolColorList[self.TOP], self.selLigand)
+            util.cnc(self.selLigand)
+            General_cmd.refresh()
            
             # Color side-chains of solution TOP
+            self.selSideChains = self.Get_SideChainSelection()
             if self.selSideChains != '':
-                selSC = self.selSideChains.replace(self.TargetObj,SolutionObj)
-                cmd.color(self.top.top.PymolColorList[self.TOP], selSC)
-                util.cnc(selSC)
-                cmd.refresh()
+                cmd.color(self.top.top.PymolColorList[self.TOP], self.selSideChains)
+                util.cnc(self.selSideChains)
+                General_cmd.refresh()
 
             #cmd.show(self.DefaultDisplay, "(resn LIG & sol_*__ & present)")
-            cmd.show(self.top.DefaultDisplay, "(resn LIG & " + SolutionObj + " & present)")
-            cmd.refresh()
+            cmd.show(self.top.DefaultDisplay, self.selLigand)
+            General_cmd.refresh()
 
             if self.selSideChains != '':
-                #cmd.show("sticks", self.selSideChains.replace(self.TargetName__,"sol_*__"))
-                cmd.show("sticks", self.selSideChains.replace(self.TargetObj,SolutionObj))
-                cmd.refresh()
+                cmd.show("sticks", self.selSideChains)
+                General_cmd.refresh()
 
         except:
             self.CriticalError("Could not refresh the visual display")
@@ -172,47 +196,31 @@ class UpdateScreen(object):
         return 0
 
     '''=========================================================================
-       WriteOutLigand: Ouputs PDB ligand file with new coordinates
+       UpdateLigandCoords: Pushes the new coordinates into the ligand of the solution
     ========================================================================='''
-    def WriteOutLigand(self):
+    @Timers.Timed('UpdateLigandCoords')
+    def UpdateLigandCoords(self):
 
         try:
-        
-            #Get the new coordinates of the ligand
-            self.dictCoord = {}
-            self.dictCoord = Geometry.buildcc(self.top.ListAtom,self.top.RecAtom,self.top.DisAngDih,self.top.Ori)
-        
-            #Replace the coordinate in pdb file with the new one
-            #print "writing to " + self.top.listTmpPDB[self.TOP+1]
-            text_file = open(self.top.listTmpPDB[self.TOP+1], 'w')
-            
-            for pdbLine in self.top.ReferenceLines:
-                
-                type = pdbLine[0:6].strip()
-                if type == 'HETATM' or type == 'ATOM':
-
-                    NoAtom = int(pdbLine[6:11])
-                    #print NoAtom
-                    
-                    atomX = float(self.dictCoord[NoAtom][0])
-                    atomY = float(self.dictCoord[NoAtom][1])
-                    atomZ = float(self.dictCoord[NoAtom][2])
-                    
-                    tmpLine = pdbLine[0:30]
-                    tmpLine += '%8.3f' % atomX     # The atom X coordinate
-                    tmpLine += '%8.3f' % atomY     # The atom Y coordinate
-                    tmpLine += '%8.3f' % atomZ     # The atom Z coordinate
-                    tmpLine += pdbLine[54:]
-                    
-                    text_file.write(tmpLine)
-
-                else:                                        
-                    text_file.write(pdbLine)                                    
+            # the solution is rebuilt at the next update when its state is missing
+            if cmd.count_states(self.SolutionObj) < self.State:
+                print("  Could not update the ligand of " + self.SolutionObj + ": state " + str(self.State) + " does not exist")
+                return 1
+
+            if hasattr(cmd, 'load_coords'):
+                listCoords = [ self.dictCoord[ID] for ID in self.top.LigandIDs or [] ]
+                if listCoords:
+                    cmd.load_coords(listCoords, self.selLigand, state=self.State)
+                nbUpdated = len(listCoords)
+            else:
+                nbUpdated = cmd.alter_state(self.State, self.selLigand, '(x,y,z) = dictCoord[ID]', space={'dictCoord': self.dictCoord})
 
-            text_file.close()                               
+        except:
+            self.CriticalError("Could not update the ligand coordinates.")
+            return 1
 
-        except IOError:
-            self.CriticalError("Could not write PDB ligand file.")
+        if not nbUpdated:
+            print("  No atoms of the ligand of " + self.SolutionObj + " were updated")
             return 1
 
         return 0
@@ -329,12 +337,10 @@ class UpdateScreen(object):
     '''=========================================================================
       .UpdateSideChainConformations: Update side-chain dihedral angles using rotamer library
     ========================================================================='''
+    @Timers.Timed('UpdateSideChainConformations')
     def UpdateSideChainConformations(self):
         
         try:
-            # temporary sel. var
-            strSelectSC  = ''
-
             # Loop through Flexible side-chains
             for residue in self.top.listSideChain:
 
@@ -350,64 +356,100 @@ class UpdateScreen(object):
                     Num = residue[3:len(residue)-1]
                     Chn = residue[len(residue)-1:len(residue)]
 
-                    strSelectSC += "(resn " + Res + " & resi " + Num
-                    if Chn != '-':
-                        strSelectSC += " & chain " + Chn
-                    else:
-                        strSelectSC += " & chain ''"                    
-                    
-                    strSelectSC += " & ! name C+O+N " + " & " + self.TargetObj + " & present) or "
-
                     # Get Integer value from GA.
                     IntVal = int(float(self.Line[self.colNo:(self.colNo+10)].strip()) + 0.5)
                     nFlex = Constants.nFlexBonds[Res]
                     
                     #print("IntVal", str(IntVal))
                     #print("nFlex", str(nFlex))
-                    #print strSelectSC
                     
-                    if IntVal > 0: # 0 is the default PDB side-chain conf.
-        
-                        # Get List of Dihedrals to rebuild
-                        for k in range(0,nFlex):
-                        
-                            '''
-                            print "for k=" + str(k) + " for residue=" + str(residue)
-                            print self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+0])
-                            print self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+1])
-                            print self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+2])
-                            print self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+3])
-                            print self.top.dictSideChainRotamers[residue]
-                            print self.top.dictSideChainRotamers[residue][(IntVal-1)*nFlex+k]
-                            '''
-                            
-                            # Set dihedrals for side-chain
-                            cmd.set_dihedral(self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+0]),
-                                             self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+1]),
-                                             self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+2]),
-                                             self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+3]),
-                                             self.top.dictSideChainRotamers[residue][(IntVal-1)*nFlex+k], self.State)
-                            cmd.refresh()
-
-                            
                     # Get next column starting index
                     self.colNo = self.colNo + 11
 
+                    # Side-chain of the solution is already in that conformation
+                    if self.top.dictSideChainState.get((self.TOP, self.State, residue)) == IntVal:
+                        continue
 
-            # Side-chain selection string - remove last 4 chars
-            if strSelectSC != '':
-                strSelectSC = strSelectSC[:len(strSelectSC)-4]
+                    if IntVal > 0:
+                        Dihedrals = self.top.dictSideChainRotamers[residue][(IntVal-1)*nFlex:IntVal*nFlex]
+                    else:
+                        # 0 is the default PDB side-chain conf.
+                        Dihedrals = self.Get_DefaultDihedrals(residue, Res, Num, Chn, nFlex)
+        
+                    # Get List of Dihedrals to rebuild
+                    for k in range(0,nFlex):
+                        
+                        # Set dihedrals for side-chain
+                        cmd.set_dihedral(self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+0],self.SolutionObj),
+                                         self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+1],self.SolutionObj),
+                                         self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+2],self.SolutionObj),
+                                         self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+3],self.SolutionObj),
+                                         Dihedrals[k], self.State)
+
+                    self.top.dictSideChainState[(self.TOP, self.State, residue)] = IntVal
 
-            return strSelectSC
+            General_cmd.refresh()
 
         except:
 
             self.CriticalError("Could not update side-chain conformations")
+            return 1
+
+        return 0
     
+    '''=========================================================================
+      Get_DefaultDihedrals: Retrieves the dihedrals of the side-chain in the target
+    ========================================================================='''
+    def Get_DefaultDihedrals(self, residue, Res, Num, Chn, nFlex):
+
+        if residue not in self.top.dictSideChainDefault:
+
+            Dihedrals = []
+            for k in range(0,nFlex):
+                Dihedrals.append(cmd.get_dihedral(self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+0],self.TargetName),
+                                                  self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+1],self.TargetName),
+                                                  self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+2],self.TargetName),
+                                                  self.Get_AtomString(Res,Num,Chn,Constants.setDihedrals[Res][4*k+3],self.TargetName),
+                                                  1))
+
+            self.top.dictSideChainDefault[residue] = Dihedrals
+
+        return self.top.dictSideChainDefault[residue]
+
+    '''=========================================================================
+      Get_SideChainSelection: Retrieves the selection of the flexible side-chains
+    ========================================================================='''
+    def Get_SideChainSelection(self):
+
+        strSelectSC = ''
+
+        for residue in self.top.listSideChain:
+
+            # Were any rotamers accepted for this side-chain
+            if self.top.dictSideChainNRot.get(residue,''):
+
+                Res = residue[0:3]
+                Num = residue[3:len(residue)-1]
+                Chn = residue[len(residue)-1:len(residue)]
+
+                strSelectSC += "(resn " + Res + " & resi " + Num
+                if Chn != '-':
+                    strSelectSC += " & chain " + Chn
+                else:
+                    strSelectSC += " & chain ''"                    
+                
+                strSelectSC += " & ! name C+O+N " + " & " + self.SolutionObj + " & present) or "
+
+        # Side-chain selection string - remove last 4 chars
+        if strSelectSC != '':
+            strSelectSC = strSelectSC[:len(strSelectSC)-4]
+
+        return strSelectSC
+
     '''=========================================================================
       Get_AtomString: Retrives the PyMOL atom selection string
     ========================================================================='''
-    def Get_AtomString(self, R, N, C, Atom):
+    def Get_AtomString(self, R, N, C, Atom, Obj):
 
         AtomString  = "resn " + R + " & resi " + N
         if C != '-':
@@ -416,7 +458,7 @@ class UpdateScreen(object):
             AtomString += " & chain ''"
         
         AtomString += " & name " + Atom
-        AtomString += " & " + self.TargetObj
+        AtomString += " & " + Obj
 
         return AtomString
 
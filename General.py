@@ -289,6 +289,27 @@ def hashfile(file):
     
     return hasher.digest()
 
+#=======================================================================
+''' Returns the Signature of the heavy atoms of a PDB file '''
+#=======================================================================   
+def hashcoordinates(file):
+    
+    hasher = hashlib.md5()
+    
+    afile = open(file, 'r')
+    
+    for line in afile:
+        if line.startswith('ATOM  ') or line.startswith('HETATM'):
+            if line[76:78].strip() == 'H':
+                continue
+            
+            # atom name, residue and coordinates
+            hasher.update(line[12:54].encode('utf-8'))
+    
+    afile.close()
+    
+    return hasher.hexdigest()
+
 #=======================================================================
 ''' Returns an updated md5 hashlib '''
 #=======================================================================   
@@ -28,11 +28,49 @@ from pymol import cmd
 import pymol
 import time
 import re
+import threading
 
 # Regular expression patterns
 RESERVED_NAMES =    '.*__|' + \
                     '.*_sph_.*'
 
+# Refresh batching state (per thread)
+_Batch = threading.local()
+
+''' ==========================================================
+  Batch: Suspends the refreshes of the viewer during a multi-step
+         scene update. A single refresh is issued when leaving the
+         outermost block, only if a refresh was requested in it.
+         usage: with General_cmd.Batch(): ...
+==========================================================='''
+class Batch(object):
+
+    def __enter__(self):
+
+        _Batch.depth = getattr(_Batch, 'depth', 0) + 1
+
+        return self
+
+    def __exit__(self, *args):
+
+        _Batch.depth -= 1
+
+        if _Batch.depth == 0 and getattr(_Batch, 'dirty', False):
+            _Batch.dirty = False
+            cmd.refresh()
+
+        return False
+
+''' ==========================================================
+  refresh: Refreshes the viewer (deferred when inside a Batch)
+==========================================================='''
+def refresh():
+
+    if getattr(_Batch, 'depth', 0):
+        _Batch.dirty = True
+    else:
+        cmd.refresh()
+
 ''' ==========================================================
   is_ATOM: Determines whether a residue is an ATOM or HETATM  
 ==========================================================='''
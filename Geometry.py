@@ -25,13 +25,20 @@ from __future__ import print_function
 
 @summary: Module that define some tools used by FlexAID.
 
-@contain: distance, angle, dihedralAngle
+@contain: distance, angle, dihedralAngle, buildcc, BuildPlan, buildcc_array
 
 @organization: Najmanovich Research Group
 @creation date:  oct. 13, 2010
 '''
 
 import math
+import Timers
+
+# numpy ships with PyMOL, the array builders are skipped without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
     
 '''******************************************************************************
   SUBROUTINE middle: Calculates the center of geometry between 2 points
@@ -158,6 +165,7 @@ def dihedralAngle(pointA, pointB, pointC, pointD):
 
 @return: PDBCoord for each atom of the ligand (dictionary)
 '''
+@Timers.Timed('buildcc')
 def buildcc(ListAtom,RecAtom,DisAngDih,Ori):
 
     tot = len(ListAtom)
@@ -264,6 +272,171 @@ def buildcc(ListAtom,RecAtom,DisAngDih,Ori):
     #END of FOR(an)
     return PDBCoord    
 
+'''
+@summary: CLASS BuildPlan: precomputed reconstruction order of the atoms of a ligand.
+          Atoms are grouped by depth in the build tree so that all atoms of one level
+          (whose reference atoms are all built) are reconstructed in one vectorized step.
+          Rows 0-2 of the coordinate buffer hold the origin-based reference points used
+          when an atom has no reference atom (j == 0 in buildcc).
+'''
+class BuildPlan(object):
+
+    # Atoms built per level (K poses x N atoms / levels) from which one vectorized step per
+    # level is faster than buildcc atom by atom. Measured: N=30 chain (30 levels), K=10:
+    # buildcc 1.9 ms, buildcc_array 6.5 ms; K=50: 7.0 / 6.6 ms; N=60 chain, K=20: 6.6 / 12.5 ms;
+    # K=100: 32.1 / 16.4 ms; N=60 branched (7 levels), K=20: 8.1 / 2.3 ms
+    MIN_ATOMS_PER_LEVEL = 40
+
+    def __init__(self, ListAtom, RecAtom):
+
+        # atom number -> row in the coordinate buffer
+        self.Row = dict()
+        self.Atoms = list(ListAtom)
+        self.nRows = len(self.Atoms) + 3
+
+        dictLevel = dict()
+        listLevels = list()
+
+        for an, NoAtom in enumerate(self.Atoms):
+
+            row = an + 3
+            self.Row[NoAtom] = row
+
+            ref = list()
+            level = 0
+            for i in range(1, 4):
+                j = RecAtom[NoAtom][i - 1]
+                if j != 0:
+                    ref.append(self.Row[j])
+                    level = max(level, dictLevel[j] + 1)
+                else:
+                    ref.append(i - 1)
+
+            dictLevel[NoAtom] = level
+
+            while len(listLevels) <= level:
+                listLevels.append(( list(), list() ))
+
+            listLevels[level][0].append(row)
+            listLevels[level][1].append(ref)
+
+        self.Levels = [ ( numpy.array(rows, dtype=int), numpy.array(refs, dtype=int).reshape(-1, 3) )
+                        for rows, refs in listLevels ]
+
+    '''
+    @summary: SUBROUTINE Vectorized: True if building K poses at once is faster than buildcc
+    '''
+    def Vectorized(self, K):
+
+        return K * len(self.Atoms) >= self.MIN_ATOMS_PER_LEVEL * len(self.Levels)
+
+    '''
+    @summary: SUBROUTINE Gather: returns the internal coordinates as a (N,3) array in build order
+    '''
+    def Gather(self, DisAngDih):
+
+        return numpy.array([ DisAngDih[NoAtom] for NoAtom in self.Atoms ], dtype=float)
+
+    '''
+    @summary: SUBROUTINE ToDict: converts a (N,3) coordinates array to the buildcc dictionary format
+    '''
+    def ToDict(self, Coords):
+
+        return dict(zip(self.Atoms, Coords.tolist()))
+
+'''
+@summary: SUBROUTINE buildcc_array: builds the cartesian coordinates of the atoms of a BuildPlan
+          from (distance, angle, dihedral) arrays of shape (N,3) or (K,N,3) for K poses.
+          Same arithmetic as buildcc.
+
+@return: coordinates array of shape (N,3) or (K,N,3) in the BuildPlan order
+'''
+@Timers.Timed('buildcc_array')
+def buildcc_array(Plan, DisAngDih, Ori):
+
+    DisAngDih = numpy.asarray(DisAngDih, dtype=float)
+
+    single = DisAngDih.ndim == 2
+    if single:
+        DisAngDih = DisAngDih[numpy.newaxis]
+
+    K = DisAngDih.shape[0]
+    Ori = numpy.asarray(Ori, dtype=float)
+
+    xyz = numpy.empty((K, Plan.nRows, 3))
+    xyz[:,0] = Ori + ( 1.0, 0.0, 0.0 )
+    xyz[:,1] = Ori
+    xyz[:,2] = Ori + ( 0.0, 1.0, 0.0 )
+
+    dis = DisAngDih[:,:,0]
+    ang = numpy.radians(DisAngDih[:,:,1])
+    dih = numpy.radians(DisAngDih[:,:,2])
+
+    for rows, ref in Plan.Levels:
+
+        cols = rows - 3
+
+        x1, y1, z1 = numpy.rollaxis(xyz[:,ref[:,0]], 2)
+        x2, y2, z2 = numpy.rollaxis(xyz[:,ref[:,1]], 2)
+        x3, y3, z3 = numpy.rollaxis(xyz[:,ref[:,2]], 2)
+
+        a = y1 * (z2 - z3) + y2 * (z3 - z1) + y3 * (z1 - z2)
+        b = z1 * (x2 - x3) + z2 * (x3 - x1) + z3 * (x1 - x2)
+        c = x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2)
+        op = numpy.sqrt((a * a) + (b * b) + (c * c))
+
+        cx = a / op
+        cy = b / op
+        cz = c / op
+
+        a = x2 - x1
+        b = y2 - y1
+        c = z2 - z1
+
+        d = 1.0 / numpy.sqrt((a * a) + (b * b) + (c * c))
+
+        op = dis[:,cols] * d
+        xn = a * op
+        yn = b * op
+        zn = c * op
+
+        a = cx * cx
+        b = cy * cy
+        c = cz * cz
+
+        ct = numpy.cos(ang[:,cols])
+        st = -numpy.sin(ang[:,cols])
+
+        op = 1.0 - ct
+
+        xk = (cx * cz * op - cy * st) * zn + ((1.0 - a) * ct + a) * xn + (cx * cy * op + cz * st) * yn
+        yk = (cy * cx * op - cz * st) * xn + ((1.0 - b) * ct + b) * yn + (cy * cz * op + cx * st) * zn
+        zk = (cz * cy * op - cx * st) * yn + ((1.0 - c) * ct + c) * zn + (cz * cx * op + cy * st) * xn
+
+        ct = numpy.cos(dih[:,cols])
+        st = numpy.sin(dih[:,cols])
+
+        op = 1.0 - ct
+
+        cx = (x2 - x1) * d
+        cy = (y2 - y1) * d
+        cz = (z2 - z1) * d
+
+        a = cx * cx
+        b = cy * cy
+        c = cz * cz
+
+        xyz[:,rows,0] = (((cx * cz * op) - (cy * st)) * zk) + ((((1.0 - a) * ct) + a) * xk) + (((cx * cy * op) + (cz * st)) * yk) + x1
+        xyz[:,rows,1] = (((cy * cx * op) - (cz * st)) * xk) + ((((1.0 - b) * ct) + b) * yk) + (((cy * cz * op) + (cx * st)) * zk) + y1
+        xyz[:,rows,2] = (((cz * cy * op) - (cx * st)) * yk) + ((((1.0 - c) * ct) + c) * zk) + (((cz * cx * op) + (cy * st)) * xk) + z1
+
+    Coords = xyz[:,3:]
+
+    if single:
+        return Coords[0]
+
+    return Coords
+
 '''
 @summary: SUBROUTINE rmsd: calculates RMSD between predicted and reference
 '''
@@ -284,3 +457,158 @@ def rmsd(dictCoord, dictCoordRef):
     except:
 
         return 'N/A'
+
+'''
+@summary: CLASS SphereIndex: spatial index of the centers of a set of spheres (e.g. cleft spheres).
+          Returns the centers that lie inside selector spheres (sqrdistance <= radius^2).
+          With NumPy, each selector tests all the centers in one vectorized pass; otherwise the
+          centers are bucketed in cubic cells and only the cells overlapping a selector are tested.
+'''
+class SphereIndex(object):
+
+    CellSize = 2.0
+
+    def __init__(self, listCoord):
+
+        self.listCoord = [ list(Coord) for Coord in listCoord ]
+        self.nCoord = len(self.listCoord)
+
+        self.Coords = None
+        self.dictCell = dict()
+
+        if numpy is not None:
+            self.Coords = numpy.array(self.listCoord, dtype=float).reshape(-1, 3)
+        else:
+            for i, Coord in enumerate(self.listCoord):
+                self.dictCell.setdefault(self.Cell(Coord), list()).append(i)
+
+    '''
+    @summary: SUBROUTINE Cell: returns the cell of a coordinate
+    '''
+    def Cell(self, Coord):
+
+        return tuple([ int(math.floor(c / self.CellSize)) for c in Coord ])
+
+    '''
+    @summary: SUBROUTINE Inside: returns the indices of the centers inside one selector sphere
+    '''
+    def Inside(self, Center, Radius):
+
+        sqrrad = Radius * Radius
+
+        if self.Coords is not None:
+            Delta = self.Coords - Center
+            return numpy.flatnonzero(numpy.einsum('ij,ij->i', Delta, Delta) <= sqrrad)
+
+        Min = self.Cell([ c - Radius for c in Center ])
+        Max = self.Cell([ c + Radius for c in Center ])
+
+        listInside = list()
+        for x in range(Min[0], Max[0] + 1):
+            for y in range(Min[1], Max[1] + 1):
+                for z in range(Min[2], Max[2] + 1):
+                    for i in self.dictCell.get(( x, y, z ), ()):
+                        if sqrdistance(self.listCoord[i], Center) <= sqrrad:
+                            listInside.append(i)
+
+        return sorted(listInside)
+
+    '''
+    @summary: SUBROUTINE Included: returns the sorted indices of the centers inside any of
+                                   the selector spheres given as [ (Center, Radius), ... ]
+    '''
+    def Included(self, listSelectors):
+
+        if self.Coords is not None:
+            Mask = numpy.zeros(self.nCoord, dtype=bool)
+            for Center, Radius in listSelectors:
+                Mask[self.Inside(Center, Radius)] = True
+
+            return numpy.flatnonzero(Mask).tolist()
+
+        setIncluded = set()
+        for Center, Radius in listSelectors:
+            setIncluded.update(self.Inside(Center, Radius))
+
+        return sorted(setIncluded)
+
+'''
+@summary: CLASS SphereSelection: centers of a SphereIndex included in a set of named selector
+          spheres, updated incrementally. Each center keeps the number of selectors that
+          include it, so moving/resizing one selector only re-tests that selector.
+'''
+class SphereSelection(object):
+
+    def __init__(self, Index):
+
+        self.Index = Index
+        self.dictSelectors = dict()     # ID -> [ (Center, Radius), indices inside ]
+
+        if numpy is not None:
+            self.Counts = numpy.zeros(Index.nCoord, dtype=int)
+        else:
+            self.Counts = dict()
+
+    '''
+    @summary: SUBROUTINE Add_Counts: adds Value to the count of the centers given
+    '''
+    def Add_Counts(self, Inside, Value):
+
+        if numpy is not None:
+            self.Counts[Inside] += Value
+        else:
+            for i in Inside:
+                Count = self.Counts.get(i, 0) + Value
+                if Count:
+                    self.Counts[i] = Count
+                else:
+                    del self.Counts[i]
+
+    '''
+    @summary: SUBROUTINE Set: adds or updates a selector sphere
+    '''
+    def Set(self, ID, Center, Radius):
+
+        Selector = ( tuple(Center), Radius )
+
+        Previous = self.dictSelectors.get(ID)
+        if Previous is not None:
+            if Previous[0] == Selector:
+                return
+            self.Add_Counts(Previous[1], -1)
+
+        Inside = self.Index.Inside(Center, Radius)
+        self.Add_Counts(Inside, 1)
+
+        self.dictSelectors[ID] = [ Selector, Inside ]
+
+    '''
+    @summary: SUBROUTINE Remove: removes a selector sphere
+    '''
+    def Remove(self, ID):
+
+        Previous = self.dictSelectors.pop(ID, None)
+        if Previous is not None:
+            self.Add_Counts(Previous[1], -1)
+
+    '''
+    @summary: SUBROUTINE Sync: sets the selectors to the ones given as { ID: (Center, Radius) }
+    '''
+    def Sync(self, dictSelectors):
+
+        for ID in list(self.dictSelectors.keys()):
+            if ID not in dictSelectors:
+                self.Remove(ID)
+
+        for ID in dictSelectors:
+            self.Set(ID, dictSelectors[ID][0], dictSelectors[ID][1])
+
+    '''
+    @summary: SUBROUTINE Included: returns the sorted indices of the centers included
+    '''
+    def Included(self):
+
+        if numpy is not None:
+            return numpy.flatnonzero(self.Counts).tolist()
+
+        return sorted(self.Counts.keys())
@@ -38,6 +38,7 @@ else:
 import os
 import General
 import Geometry
+import Grid
 import Tabs
 import time
 
@@ -56,6 +57,7 @@ if __debug__:
 class CropCleft(Tabs.Tab):
     
     ScaleResolution = 0.50
+    PreviewSpacing = 0.50
     PartitionDisplay = 'PARTITION_AREA__'
     SphereDisplay = 'SPHERE_PT_AREA__'
     
@@ -70,6 +72,7 @@ class CropCleft(Tabs.Tab):
         self.Step3Check = IntVar()
         self.dictSpheres = dict()
         self.SphereSize = DoubleVar()
+        self.PartitionInfo = StringVar()
 
     def Init_Vars(self):
         
@@ -83,6 +86,17 @@ class CropCleft(Tabs.Tab):
         
         self.TempPartition = os.path.join(self.top.GetCleftProject_Dir,'tmppart.pdb')
 
+        # Spheres of the parent cleft (see read_Parent)
+        self.ParentKey = None
+        self.ParentLines = list()
+        self.ParentNoAtom = list()
+        self.ParentSpheres = list()
+        self.ParentIndex = None
+        self.Selection = None
+
+        # Number of spheres of the partition written last (None if not written)
+        self.Vertex = None
+
         self.Img_Button = [ PhotoImage(file=os.path.join(self.top.GetCleftInstall_Dir,'images','stop.gif')),
                             PhotoImage(file=os.path.join(self.top.GetCleftInstall_Dir,'images','down.gif')),
                             PhotoImage(file=os.path.join(self.top.GetCleftInstall_Dir,'images','up.gif')),
@@ -203,6 +217,9 @@ class CropCleft(Tabs.Tab):
         self.ResizeSphere.pack(side=LEFT, anchor=NW)
         self.ResizeSphere.config(state='disabled')
 
+        self.lblPartition = Label(fCropStep2Line3, textvariable=self.PartitionInfo, font=self.top.font_Text)
+        self.lblPartition.pack(side=LEFT, padx=5)
+
         Step2eBtn = Button(fCropStep2Line3, width=20, height=20, image=self.Img_Button[1], command=self.Step2_Next)
         Step2eBtn.pack(side=RIGHT, anchor=E, padx=2)
 
@@ -251,7 +268,7 @@ class CropCleft(Tabs.Tab):
             except:
                 pass
 
-            self.Disable_Frame(self.ResizeSphere,self.lblRadius)
+            self.Disable_Frame(self.ResizeSphere,self.lblRadius,self.lblPartition)
             
             self.ResizeSphere.config(from_=0.5,to=self.Sphere.MaxRadius)
             self.SphereSize.set(self.Sphere.Radius)
@@ -265,9 +282,24 @@ class CropCleft(Tabs.Tab):
                 self.dictSpheres[self.SphereID] = self.Sphere.Copy()
                 
                 self.update_Spheres()
+                self.Step2Selection.set('')
+
                 self.Vertex = self.write_Partition()
+
+            elif self.Selection is not None:
+                # The edited sphere is not kept: back to the inserted spheres
+                self.Selection.Sync(self.get_Selectors())
+                self.update_PartitionInfo(self.get_PartitionRows())
+
+            # The live preview is replaced by the partition written last
+            if self.Vertex:
                 self.displayPartition()
-                self.Step2Selection.set('')
+            else:
+                try:
+                    cmd.delete(self.PartitionDisplay)
+                    cmd.refresh()
+                except:
+                    pass
                 
     ''' ==========================================================
     highlight_Step: highlights active step in Cropping
@@ -739,56 +771,154 @@ class CropCleft(Tabs.Tab):
 
         if self.top.ActiveWizard is not None:
             self.top.ActiveWizard.ResizeSphere()
+            self.preview_Partition()
 
     ''' ==================================================================================
-    FUNCTION write_Partition: Writes the new Partition cleft files
+    FUNCTION preview_Partition: Updates the partition live for the sphere being edited
+                                (in memory, only the edited sphere is re-tested)
     ==================================================================================  '''        
-    def write_Partition(self):
-        
-        listNoAtom = list()
+    def preview_Partition(self):
+
+        Wizard = self.top.ActiveWizard
+
+        if self.Step != 2 or self.read_Parent():
+            return
+
+        # The sphere may have been moved in PyMOL since the last update
+        Center = General_cmd.Get_CenterOfMass2(Wizard.SphereDisplay, Wizard.State)
+        if not Center:
+            Center = Wizard.SphereView.Center
+
+        dictSelectors = self.get_Selectors()
+        dictSelectors[self.SphereID] = ( Center, Wizard.SphereView.Radius )
+        self.Selection.Sync(dictSelectors)
+
+        listRows = self.get_PartitionRows()
+        self.update_PartitionInfo(listRows)
+
+        if not listRows:
+            cmd.delete(self.PartitionDisplay)
+            cmd.refresh()
+            return
+
+        PDBString = 'REMARK  PARENTFILE  ' + self.Cleft.CleftFile + '\n'
+        PDBString += ''.join([ self.ParentLines[i] for i in listRows ])
+
+        try:
+            with General_cmd.Batch():
+                cmd.delete(self.PartitionDisplay)
+                cmd.read_pdbstr(PDBString, self.PartitionDisplay)
+                cmd.hide('everything', self.PartitionDisplay)
+                cmd.show('surface', self.PartitionDisplay)
+                cmd.color('grey60', self.PartitionDisplay)
+                General_cmd.refresh()
+        except:
+            pass
+
+    ''' ==================================================================================
+    FUNCTION read_Parent: Reads the spheres of the parent cleft and indexes their centers
+                          (kept in memory until the parent cleft file changes)
+    ==================================================================================  '''        
+    def read_Parent(self):
+
         FromFile = self.Cleft.CleftFile
 
         try:
+            ParentKey = ( FromFile, os.path.getmtime(FromFile) )
+            if ParentKey == self.ParentKey:
+                return 0
+
             file = open(FromFile, 'r')
             SPHLines = file.readlines()
             file.close()
+
+            self.ParentLines = list()
+            self.ParentNoAtom = list()
+            self.ParentSpheres = list()
+
+            for Line in SPHLines:
+                if Line.startswith('ATOM  '):
+
+                    index = Line[7:11].strip()              # The atom number
+                    coordX = float(Line[30:38].strip())     # The atom X coordinate
+                    coordY = float(Line[39:46].strip())     # The atom Y coordinate
+                    coordZ = float(Line[47:54].strip())     # The atom Z coordinate
+                    radius = float(Line[60:66].strip())     # The radius of the sphere
+
+                    self.ParentLines.append(Line)
+                    self.ParentNoAtom.append(index)
+                    self.ParentSpheres.append([ radius, [ coordX, coordY, coordZ ] ])
+
+            self.ParentIndex = Geometry.SphereIndex([ Coord for radius, Coord in self.ParentSpheres ])
+            self.Selection = Geometry.SphereSelection(self.ParentIndex)
+            self.ParentKey = ParentKey
+
         except:
-            self.top.DisplayMessage("  ERROR: Could not find the parent cleft file.", 1)
-            return
+            self.ParentKey = None
+            return 1
+
+        return 0
+
+    ''' ==================================================================================
+    FUNCTION get_Selectors: Returns the inserted spheres as { ID: (Center, Radius) }
+    ==================================================================================  '''        
+    def get_Selectors(self):
+
+        return dict([ ( sph, ( self.dictSpheres[sph].Center, self.dictSpheres[sph].Radius ) )
+                      for sph in self.dictSpheres ])
+
+    ''' ==================================================================================
+    FUNCTION get_PartitionRows: Returns the rows of the parent spheres in the partition
+                                (each atom number is kept once)
+    ==================================================================================  '''        
+    def get_PartitionRows(self):
+
+        setNoAtom = set()
+        listRows = list()
+        for i in self.Selection.Included():
             
-        # Write in the PDB file
-        TMPFile = open(self.TempPartition, 'w')
-        TMPFile.write('REMARK  PARENTFILE  ' + FromFile + '\n')            
+            index = self.ParentNoAtom[i]
+            if index not in setNoAtom:
+                setNoAtom.add(index)
+                listRows.append(i)
 
-        Vertex = 0
-        for Line in SPHLines:
-            if Line.startswith('ATOM  '):
+        return listRows
 
-                index = Line[7:11].strip()              # The atom number
-                coordX = float(Line[30:38].strip())     # The atom X coordinate
-                coordY = float(Line[39:46].strip())     # The atom Y coordinate
-                coordZ = float(Line[47:54].strip())     # The atom Z coordinate
-                radius = float(Line[61:].strip())       # The radius of the sphere                    
-                    
-                if listNoAtom.count(index) == 0:
-                    
-                    for sph in sorted(self.dictSpheres, key=str.lower):
-                        
-                        sqrrad  = self.dictSpheres[sph].Radius ** 2
-                        sqrdist = Geometry.sqrdistance( [ coordX, coordY, coordZ ], self.dictSpheres[sph].Center )
+    ''' ==================================================================================
+    FUNCTION update_PartitionInfo: Shows the number of spheres and volume of the partition
+    ==================================================================================  '''        
+    def update_PartitionInfo(self, listRows):
+
+        Voxels = Grid.Lattice(self.PreviewSpacing)
+        Voxels.build([ self.ParentSpheres[i] for i in listRows ])
+
+        Volume = Voxels.count() * self.PreviewSpacing ** 3
+
+        self.PartitionInfo.set('%d spheres, %.0f A3' % (len(listRows), Volume))
+
+    ''' ==================================================================================
+    FUNCTION write_Partition: Writes the new Partition cleft files
+    ==================================================================================  '''        
+    def write_Partition(self):
+        
+        if self.read_Parent():
+            self.top.DisplayMessage("  ERROR: Could not find the parent cleft file.", 1)
+            return
+            
+        # The center of the sphere needs to be inside the 'inserted Spheres'
+        self.Selection.Sync(self.get_Selectors())
 
-                        #if sqrdist <= (self.dictSpheres[sph].Radius+radius)*(self.dictSpheres[sph].Radius+radius):
+        listRows = self.get_PartitionRows()
+        self.update_PartitionInfo(listRows)
 
-                        # ** NEW
-                        # The center of the sphere needs to be inside the 'inserted Spheres'
-                        if sqrdist <= sqrrad:
+        # Write in the PDB file
+        TMPFile = open(self.TempPartition, 'w')
+        TMPFile.write('REMARK  PARENTFILE  ' + self.Cleft.CleftFile + '\n')            
 
-                            listNoAtom.append(index)
-                            TMPFile.write(Line)
-                            Vertex = Vertex + 1
-                            break
+        for i in listRows:
+            TMPFile.write(self.ParentLines[i])
                                     
         TMPFile.close()
 
-        return Vertex
+        return len(listRows)
     
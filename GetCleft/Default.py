@@ -474,8 +474,9 @@ class Default(Tabs.Tab):
         self.SetColorList()
         self.DisplayColorChart()
         
-        self.Load_Clefts()
-        self.Show_Clefts()
+        with General_cmd.Batch():
+            self.Load_Clefts()
+            self.Show_Clefts()
         
     ''' ========================================================
                  Gets all arguments for the cmdline
@@ -750,7 +751,7 @@ class Default(Tabs.Tab):
                 Cleft = self.TempBindingSite.Get_CleftName(CleftName)
                 try:
                     cmd.load(Cleft.CleftFile, Cleft.CleftName, state=1)
-                    cmd.refresh()
+                    General_cmd.refresh()
                     
                     if Cleft.Partition and Cleft.PartitionParent != None and \
                             General_cmd.object_Exists(Cleft.PartitionParent.CleftName):
@@ -822,13 +823,13 @@ class Default(Tabs.Tab):
             
             try:
                 cmd.hide('everything', Cleft.CleftName)
-                cmd.refresh()
+                General_cmd.refresh()
 
                 cmd.color(self.ColorList[i], Cleft.CleftName)
-                cmd.refresh()
+                General_cmd.refresh()
                 
                 cmd.show('surface', Cleft.CleftName)
-                cmd.refresh()
+                General_cmd.refresh()
                 
                 Cleft.Color = self.ColorHex[i]
                 
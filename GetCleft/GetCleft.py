@@ -113,9 +113,11 @@ class displayGetCleft(Base.Base):
 
         self.GetCleftSaveProject_Dir = os.path.join(self.GetCleftProject_Dir,'.Save')
         self.GetCleftTempProject_Dir = os.path.join(self.GetCleftProject_Dir,'.Temp')
+        self.GetCleftCacheProject_Dir = os.path.join(self.GetCleftProject_Dir,'.Cache')
 
         self.Folders.extend( [  self.GetCleftProject_Dir, self.TargetProject_Dir, self.CleftProject_Dir,
-                                self.GetCleftSaveProject_Dir, self.GetCleftTempProject_Dir ] )
+                                self.GetCleftSaveProject_Dir, self.GetCleftTempProject_Dir,
+                                self.GetCleftCacheProject_Dir ] )
 
     ''' ==================================================================================
     FUNCTION MakeMenuBar: Builds the menu on the upper left corner    
@@ -236,6 +238,10 @@ class displayGetCleft(Base.Base):
     ==================================================================================  '''
     def Before_Quit(self):
         
+        # Outstanding volume jobs are not tied to self.Run
+        if self.ProcessRunning and self.Volume.Process is not None:
+            self.Volume.Process.Cancel()
+
         if not self.CopySession:                                    
             answer = tkMessageBox.askyesno("Question",
                                               message="One or more cleft(s) are unsaved. Would you like to save them before leaving?",
@@ -24,24 +24,103 @@ if sys.version_info[0] < 3:
     from Tkinter import *
     import tkFileDialog
     import tkMessageBox
+    import Queue
 else:
     from tkinter import *
     import tkinter.filedialog as tkFileDialog
     import tkinter.messagebox as tkMessageBox
+    import queue as Queue
 
 from subprocess import Popen, PIPE
 
 import Tabs
 
+import os
 import MultiList
 import threading
+import multiprocessing
+import pickle
+import Geometry
+import Grid
 
 if __debug__:
     import General_cmd
 
+# Voxel spacing (A) of the in-process volume for each number of iterations
+VOXEL_SPACING = [ 1.0, 0.5, 0.35, 0.25, 0.18 ]
+
+# Maximum number of volumes calculated in parallel
+MAX_JOBS = 64
+
+""" *********************************************************************************
+    CLASS VolumeCache: Persistent volumes of the clefts keyed by the content of the
+                       cleft file, the method and the number of iterations
+    ********************************************************************************* """ 
+class VolumeCache(object):
+
+    def __init__(self, CacheFile):
+
+        self.CacheFile = CacheFile
+        self.Lock = threading.Lock()
+        self.Modified = False
+
+        try:
+            in_ = open(self.CacheFile, 'rb')
+            self.dictVolume = pickle.load(in_)
+            in_.close()
+        except:
+            self.dictVolume = dict()
+
+    '''
+    @summary: SUBROUTINE Key: Returns the cache key of a cleft (None if the file cannot be read)
+    '''
+    def Key(self, Cleft, Method, Iterations):
+
+        try:
+            return ( Cleft.Get_ContentMD5(), Method, str(Iterations) )
+        except:
+            return None
+
+    '''
+    @summary: SUBROUTINE Get: Returns the cached (Volume, VolumeBounds) or None
+    '''
+    def Get(self, Key):
+
+        with self.Lock:
+            return self.dictVolume.get(Key)
+
+    '''
+    @summary: SUBROUTINE Set: Stores the volume of a cleft
+    '''
+    def Set(self, Key, Volume, VolumeBounds):
+
+        with self.Lock:
+            self.dictVolume[Key] = ( Volume, VolumeBounds )
+            self.Modified = True
+
+    '''
+    @summary: SUBROUTINE Save: Writes the cache to the project directory
+    '''
+    def Save(self):
+
+        with self.Lock:
+            if not self.Modified:
+                return 0
+
+            try:
+                out = open(self.CacheFile, 'wb')
+                pickle.dump(self.dictVolume, out)
+                out.close()
+            except:
+                return 1
+
+            self.Modified = False
+
+        return 0
+
 class RunVolume(threading.Thread):
     
-    def __init__(self, top, queue, Clefts, Iterations):
+    def __init__(self, top, queue, Clefts, Iterations, Jobs, Cache, Method):
         
         threading.Thread.__init__(self)
         
@@ -52,6 +131,15 @@ class RunVolume(threading.Thread):
         
         self.Clefts = Clefts
         self.Iterations = Iterations
+        self.Method = Method
+        self.Jobs = max(1, min(Jobs, len(Clefts)))
+        self.Cache = Cache
+
+        # Clefts not yet started and volume_calc processes running
+        self.Pending = Queue.Queue()
+        self.listRun = list()
+        self.Lock = threading.Lock()
+        self.Cancelled = False
         
         self.start()
         
@@ -60,37 +148,19 @@ class RunVolume(threading.Thread):
         print("volume_calc starting thread has begun.")
 
         for Cleft in self.Clefts:
-            
-            cmdline  = '"' + self.GetCleft.VolumeExecutable + '"'
-            cmdline += ' -i "' + Cleft.CleftFile + '"'
-            cmdline += ' -t ' + self.Iterations
-            print(cmdline)
-        
-            try:
-                if self.GetCleft.OSid == 'WIN':
-                    self.GetCleft.Run = Popen(cmdline, shell=False, stdout=PIPE)
-                else:
-                    self.GetCleft.Run = Popen(cmdline, shell=True, stdout=PIPE)
-                    
-                # Wait for task to end in thread
-                (out,err) = self.GetCleft.Run.communicate()
-                
-                if self.GetCleft.Run.returncode != 0:
-                    self.GetCleft.ProcessError = True
-            except:
-                print('  FATAL ERROR: Could not run the executable volume_calc.')
-                print('  Make sure you downloaded NRGsuite for the right platform.')
-                self.GetCleft.ProcessError = True
-                break
-            
-            else:
-                Lines = out.splitlines()
-                for Line in Lines:
-                    Line = Line.decode('utf-8')
-                    if Line.startswith('Volume'):
-                        Cleft.Volume = float(Line[8:].strip())
-                        self.queue.put(lambda: self.top.Init_Table())
-                        break
+            self.Pending.put(Cleft)
+
+        listWorkers = list()
+        for i in range(self.Jobs):
+            Worker = threading.Thread(target=self.Worker)
+            Worker.start()
+            listWorkers.append(Worker)
+
+        for Worker in listWorkers:
+            Worker.join()
+
+        if self.Cache.Save():
+            print('  ERROR: Could not save the volume cache')
         
         self.GetCleft.Run = None
         self.GetCleft.ProcessRunning = False
@@ -98,17 +168,162 @@ class RunVolume(threading.Thread):
         self.queue.put(lambda: self.top.VolumeRunning(False))
         
         print("volume_calc starting thread has ended.")
+
+    '''
+    @summary: SUBROUTINE Worker: Calculates the volume of pending clefts until none is left
+    '''
+    def Worker(self):
+
+        while not self.Cancelled:
+
+            try:
+                Cleft = self.Pending.get_nowait()
+            except Queue.Empty:
+                break
+
+            Key = self.Cache.Key(Cleft, self.Method, self.Iterations)
+            Cached = self.Cache.Get(Key)
+
+            if Cached is not None:
+                Cleft.Volume, Cleft.VolumeBounds = Cached
+
+            else:
+                # a previous volume is never kept when this calculation fails
+                Cleft.Volume = 0.0
+                Cleft.VolumeBounds = None
+
+                if self.Method == 'voxel':
+                    rv = self.Voxel_Volume(Cleft)
+                else:
+                    rv = self.Volume_Calc(Cleft)
+
+                if self.Cancelled:
+                    break
+
+                # volume_calc cannot be run: the other clefts would fail too
+                elif rv:
+                    self.GetCleft.ProcessError = True
+                    self.Cancel()
+                    break
+
+                # Failed volume_calc runs leave the volume unset
+                with self.Lock:
+                    if Key is not None and not self.Cancelled and Cleft.Volume > 0.0:
+                        self.Cache.Set(Key, Cleft.Volume, Cleft.VolumeBounds)
+
+            # Result is shown as soon as it is available
+            self.queue.put(lambda: self.top.Init_Table())
+
+    '''
+    @summary: SUBROUTINE Cancel: Cancels all the outstanding volume jobs
+    '''
+    def Cancel(self):
+
+        with self.Lock:
+            self.Cancelled = True
+
+            for Run in self.listRun:
+                try:
+                    Run.kill()
+                except:
+                    pass
+
+    '''
+    @summary: SUBROUTINE Voxel_Volume: Volume of the union of the spheres of a cleft by voxel counting
+    '''
+    def Voxel_Volume(self, Cleft):
+
+        # only this cleft fails, the volumes of the others are still calculated
+        listSpheres = Grid.read_Spheres(Cleft.CleftFile)
+        if listSpheres is None:
+            print('  ERROR: Could not read the cleft file ' + Cleft.CleftFile)
+            self.GetCleft.ProcessError = True
+            return 0
+
+        Spacer = VOXEL_SPACING[min(max(int(self.Iterations), 1), len(VOXEL_SPACING)) - 1]
+
+        Volume, Lower, Upper = Grid.voxel_Volume(listSpheres, Spacer)
+        print('  ' + Cleft.CleftName + ': volume %.3f [%.3f, %.3f]' % (Volume, Lower, Upper))
+
+        Cleft.Volume = round(Volume, 3)
+        Cleft.VolumeBounds = ( round(Lower, 3), round(Upper, 3) )
+
+        return 0
+
+    '''
+    @summary: SUBROUTINE Volume_Calc: Volume of a cleft using the volume_calc executable
+    '''
+    def Volume_Calc(self, Cleft):
+
+        cmdline  = '"' + self.GetCleft.VolumeExecutable + '"'
+        cmdline += ' -i "' + Cleft.CleftFile + '"'
+        cmdline += ' -t ' + self.Iterations
+        print(cmdline)
+    
+        try:
+            with self.Lock:
+                if self.Cancelled:
+                    return 0
+
+                if self.GetCleft.OSid == 'WIN':
+                    Run = Popen(cmdline, shell=False, stdout=PIPE)
+                else:
+                    # exec so that killing the shell kills volume_calc
+                    Run = Popen('exec ' + cmdline, shell=True, stdout=PIPE)
+
+                self.listRun.append(Run)
+                
+            # Wait for task to end in thread
+            (out,err) = Run.communicate()
+
+            with self.Lock:
+                self.listRun.remove(Run)
+            
+            if Run.returncode != 0:
+                if not self.Cancelled:
+                    print('  ERROR: volume_calc failed on the cleft ' + Cleft.CleftName)
+                    self.GetCleft.ProcessError = True
+                return 0
+        except:
+            print('  FATAL ERROR: Could not run the executable volume_calc.')
+            print('  Make sure you downloaded NRGsuite for the right platform.')
+            return 1
+        
+        Lines = out.splitlines()
+        for Line in Lines:
+            Line = Line.decode('utf-8')
+            if Line.startswith('Volume'):
+                Cleft.Volume = float(Line[8:].strip())
+                break
+
+        return 0
     
 class EstimateVolume(Tabs.Tab):
 
     def Def_Vars(self):
 
         self.Iterations = StringVar()
+        self.Jobs = StringVar()
+        self.Method = StringVar()
         self.CleftVolume = DoubleVar()
+
+        self.Process = None
+        self.Cache = None
         
     def Init_Vars(self):
 
         self.Iterations.set('3')
+
+        # Volume is computed in-process when NumPy is available
+        if Geometry.numpy is not None:
+            self.Method.set('voxel')
+        else:
+            self.Method.set('volume_calc')
+
+        try:
+            self.Jobs.set(str(min(multiprocessing.cpu_count(), MAX_JOBS)))
+        except NotImplementedError:
+            self.Jobs.set('1')
         
     def Trace(self):
 
@@ -116,6 +331,9 @@ class EstimateVolume(Tabs.Tab):
             self.IterationsTrace = self.Iterations.trace('w', lambda *args, **kwargs:
                                                          self.Validate_Field(input=self.EntryIterations, var=self.Iterations, min=1,
                                                                              max=5, ndec=-1, tag='Number of iterations', _type=int))
+            self.JobsTrace = self.Jobs.trace('w', lambda *args, **kwargs:
+                                             self.Validate_Field(input=self.EntryJobs, var=self.Jobs, min=1,
+                                                                 max=MAX_JOBS, ndec=-1, tag='Number of parallel jobs', _type=int))
         except:
             pass
             
@@ -123,6 +341,7 @@ class EstimateVolume(Tabs.Tab):
     
         try:
             self.Iterations.trace_vdelete('w', self.IterationsTrace)
+            self.Jobs.trace_vdelete('w', self.JobsTrace)
         except:
             pass
     
@@ -155,6 +374,24 @@ class EstimateVolume(Tabs.Tab):
         lblIterations = Label(fIterations, text='Iterations:', font=self.top.font_Text)
         lblIterations.pack(side=RIGHT, anchor=SE)
 
+        self.EntryJobs = Entry(fIterations, width=6, background='white', justify=CENTER, font=self.top.font_Text, textvariable=self.Jobs)
+        self.EntryJobs.pack(side=RIGHT, anchor=SE, padx=5)
+        self.ValidJobs = [1, False, self.EntryJobs]
+
+        lblJobs = Label(fIterations, text='Parallel jobs:', font=self.top.font_Text)
+        lblJobs.pack(side=RIGHT, anchor=SE)
+
+        fMethod = Frame(self.fVolume, relief=RIDGE, border=0, width=400, height=30)
+        fMethod.pack(fill=X, expand=True, side=TOP)
+
+        Radiobutton(fMethod, text='volume_calc', variable=self.Method, value='volume_calc', font=self.top.font_Text).pack(side=RIGHT, anchor=SE)
+        RadioVoxel = Radiobutton(fMethod, text='Voxels', variable=self.Method, value='voxel', font=self.top.font_Text)
+        RadioVoxel.pack(side=RIGHT, anchor=SE)
+        if Geometry.numpy is None:
+            RadioVoxel.config(state='disabled')
+
+        Label(fMethod, text='Method:', font=self.top.font_Text).pack(side=RIGHT, anchor=SE)
+
         #==================================================================================
         '''                           --- BUTTONS AREA ---                              '''
         #==================================================================================                
@@ -176,16 +413,19 @@ class EstimateVolume(Tabs.Tab):
 
         self.Btn_ALL = Button(fButtonsLine2, text='ALL', font=self.top.font_Text, command=self.Btn_ALL_Clicked)
         self.Btn_ALL.pack(side=LEFT, padx=2)
+
+        self.Btn_Cancel = Button(fButtonsLine2, text='Cancel', font=self.top.font_Text, command=self.Btn_Cancel_Clicked)
+        self.Btn_Cancel.pack(side=RIGHT, padx=2)
         
         fList = Frame(self.fVolume, relief=SUNKEN, border=1, width=375, height=200)
         fList.pack(fill=X, expand=True, side=TOP, pady=20)
         fList.pack_propagate(0)
         
-        self.Table = MultiList.Table(fList, 3,
-                                   [ 'Color', 'Cleft object', 'Volume' ],
-                                   [ 40, 200, 130 ],
-                                   [ 0, 6, 6 ],
-                                   [ False, True, True ],
+        self.Table = MultiList.Table(fList, 4,
+                                   [ 'Color', 'Cleft object', 'Volume', 'Bounds' ],
+                                   [ 40, 130, 80, 120 ],
+                                   [ 0, 6, 6, 6 ],
+                                   [ False, True, True, True ],
                                    self.top.font_Text,
                                    self.top.Color_Blue)
         
@@ -201,7 +441,7 @@ class EstimateVolume(Tabs.Tab):
         Button(fButtons2Line1, text='Save volumes', font=self.top.font_Text, command=self.Save_Volume).pack(side=RIGHT, padx=2)
         Button(fButtons2Line1, text='Refresh clefts', font=self.top.font_Text, command=self.Init_Table).pack(side=RIGHT, padx=2)
 
-        self.Validator = [ self.ValidIterations ]
+        self.Validator = [ self.ValidIterations, self.ValidJobs ]
         
         return self.fVolume
         
@@ -225,7 +465,19 @@ class EstimateVolume(Tabs.Tab):
 
         self.VolumeRunning(True)
         
-        Process = RunVolume(self, self.queue, Clefts, Iterations)
+        if self.Cache is None:
+            self.Cache = VolumeCache(os.path.join(self.top.GetCleftCacheProject_Dir, 'Volume.cache'))
+
+        self.Process = RunVolume(self, self.queue, Clefts, Iterations, int(self.Jobs.get()), self.Cache, self.Method.get())
+        
+    ''' ==================================================================================
+    FUNCTION Btn_Cancel_Clicked: Cancels the volume calculations still running
+    ==================================================================================  '''    
+    def Btn_Cancel_Clicked(self):
+
+        if self.Process is not None and self.top.ProcessRunning:
+            self.Process.Cancel()
+            self.DisplayMessage("  Cancelled the remaining volume calculations", 2)
         
     ''' ==================================================================================
     FUNCTION Calculates the volume of the selected cleft only 
@@ -289,8 +541,15 @@ class EstimateVolume(Tabs.Tab):
         self.Table.Clear()
         
         for CleftName in self.top.Default.TempBindingSite.Get_SortedCleftNames():
-            self.Table.Add( [ '', CleftName, str(self.top.Default.TempBindingSite.Get_CleftName(CleftName).Volume) ],
-                            [ self.top.Default.TempBindingSite.Get_CleftName(CleftName).Color, None, None ] )
+            Cleft = self.top.Default.TempBindingSite.Get_CleftName(CleftName)
+
+            # Lower/upper bounds of the voxel volume (none with volume_calc)
+            Bounds = ''
+            if getattr(Cleft, 'VolumeBounds', None):
+                Bounds = '[%.1f, %.1f]' % Cleft.VolumeBounds
+
+            self.Table.Add( [ '', CleftName, str(Cleft.Volume), Bounds ],
+                            [ Cleft.Color, None, None, None ] )
 
     ''' ==================================================================================
     FUNCTION VolumeRunning: Actives/Deactives controls when a process is running
@@ -299,7 +558,7 @@ class EstimateVolume(Tabs.Tab):
                 
         if boolRun:
             self.Start_Update()
-            self.Disable_Frame()
+            self.Disable_Frame(self.Btn_Cancel)
         else:
             self.End_Update()
             self.Enable_Frame()
@@ -18,8 +18,186 @@
 '''
 
 import threading
+import math
 import Geometry
 
+#=======================================================================
+""" read_Spheres: reads the spheres of a Cleft Sphere file as a list of
+                  [ Radius, [ x, y, z ] ] (None on error) """
+#=======================================================================         
+def read_Spheres(CleftFile):
+
+    listSpheres = list()
+
+    try:
+        file = open(CleftFile, 'r')
+        PDBLines = file.readlines()
+        file.close()
+
+        #0         1         2         3         4         5         6         7                  
+        #01234567890123456789012345678901234567890123456789012345678901234567890123456789
+        #ATOM    247  C   SPH Z   1       7.931   2.550 -14.373  1.00  2.02 
+        for Line in PDBLines:
+            if Line.startswith('ATOM  '):
+
+                CoordX = float(Line[30:38].strip())
+                CoordY = float(Line[38:46].strip())
+                CoordZ = float(Line[46:54].strip())
+                Radius = float(Line[60:66].strip())
+
+                listSpheres.append([ Radius, [ CoordX, CoordY, CoordZ ] ])
+
+    except:
+        return None
+
+    return listSpheres
+
+#=======================================================================
+""" voxel_Volume: volume of the union of overlapping spheres by voxel counting
+                  Returns (Volume, Lower, Upper) in cubic Angstroms.
+                  Volume counts the voxels whose center is inside a sphere.
+                  Lower counts the voxels fully inside a sphere (radius shrunk
+                  by the half-diagonal of a voxel) and Upper the voxels that
+                  may touch one (radius grown by the half-diagonal) """
+#=======================================================================         
+def voxel_Volume(listSpheres, Spacer):
+
+    HalfDiagonal = Spacer * math.sqrt(3.0) / 2.0
+    VoxelVolume = Spacer * Spacer * Spacer
+
+    listVolumes = list()
+    for Pad in ( 0.0, -HalfDiagonal, HalfDiagonal ):
+        
+        Voxels = Lattice(Spacer)
+        Voxels.build(listSpheres, Pad)
+
+        listVolumes.append(Voxels.count() * VoxelVolume)
+
+    return tuple(listVolumes)
+
+""" *********************************************************************************
+    CLASS Lattice: Points of the lattice of integer multiples of the spacer that are
+                   inside a set of spheres. Each sphere is snapped onto the lattice
+                   and its bounding box is tested at once (NumPy broadcasting) into
+                   a boolean 3-D mask of the whole box. Without NumPy, the points are
+                   kept as a set of packed integer indices
+    ********************************************************************************* """ 
+class Lattice(object):
+
+    def __init__(self, Spacer):
+
+        self.Spacer = Spacer
+
+        self.Mask = None            # Boolean 3-D array of the points (NumPy)
+        self.Indices = set()        # Packed indices of the points (no NumPy)
+        self.Origin = [ 0, 0, 0 ]   # Lattice index of the first cell
+        self.Shape = [ 0, 0, 0 ]
+
+    #=======================================================================
+    """ build: adds the points inside the spheres ([ Radius, [ x, y, z ] ])
+               The radius of every sphere is padded by Pad """
+    #=======================================================================         
+    def build(self, listSpheres, Pad=0.0):
+
+        # Lattice bounds of every sphere
+        listBounds = list()
+        for Radius, Coord in listSpheres:
+            Radius += Pad
+            if Radius <= 0.0:
+                continue
+
+            Min = [ int(math.floor((Coord[i] - Radius) / self.Spacer)) for i in range(3) ]
+            Max = [ int(math.ceil((Coord[i] + Radius) / self.Spacer)) for i in range(3) ]
+            listBounds.append((Radius * Radius, Coord, Min, Max))
+
+        if not listBounds:
+            return
+
+        self.Origin = [ min([ Min[i] for sqrrad, Coord, Min, Max in listBounds ]) for i in range(3) ]
+        self.Shape = [ max([ Max[i] for sqrrad, Coord, Min, Max in listBounds ]) - self.Origin[i] + 1 
+                       for i in range(3) ]
+
+        if Geometry.numpy is not None:
+            self.Mask = Geometry.numpy.zeros(self.Shape, dtype=bool)
+
+        for sqrrad, Coord, Min, Max in listBounds:
+            
+            if self.Mask is not None:
+                self.mask_Sphere(sqrrad, Coord, Min, Max)
+            else:
+                self.index_Sphere(sqrrad, Coord, Min, Max)
+
+    #=======================================================================
+    """ mask_Sphere: adds the lattice points inside a sphere to the mask """
+    #=======================================================================         
+    def mask_Sphere(self, sqrrad, Coord, Min, Max):
+
+        numpy = Geometry.numpy
+        
+        # Squared distance along each axis of the bounding box
+        dx = (numpy.arange(Min[0], Max[0] + 1) * self.Spacer - Coord[0]) ** 2
+        dy = (numpy.arange(Min[1], Max[1] + 1) * self.Spacer - Coord[1]) ** 2
+        dz = (numpy.arange(Min[2], Max[2] + 1) * self.Spacer - Coord[2]) ** 2
+
+        Inside = (dx[:,None,None] + dy[None,:,None] + dz[None,None,:]) < sqrrad
+
+        x, y, z = [ Min[i] - self.Origin[i] for i in range(3) ]
+        Box = self.Mask[x:x+Inside.shape[0], y:y+Inside.shape[1], z:z+Inside.shape[2]]
+        Box |= Inside
+
+    #=======================================================================
+    """ index_Sphere: adds the packed indices of the lattice points inside a sphere """
+    #=======================================================================         
+    def index_Sphere(self, sqrrad, Coord, Min, Max):
+
+        ny = self.Shape[1]
+        nz = self.Shape[2]
+
+        for i in range(Min[0], Max[0] + 1):
+            dx = (i * self.Spacer - Coord[0]) ** 2
+            if dx >= sqrrad:
+                continue
+
+            for j in range(Min[1], Max[1] + 1):
+                dxy = dx + (j * self.Spacer - Coord[1]) ** 2
+                if dxy >= sqrrad:
+                    continue
+
+                Row = ((i - self.Origin[0]) * ny + (j - self.Origin[1])) * nz - self.Origin[2]
+                for k in range(Min[2], Max[2] + 1):
+                    if dxy + (k * self.Spacer - Coord[2]) ** 2 < sqrrad:
+                        self.Indices.add(Row + k)
+
+    #=======================================================================
+    """ points: returns the lattice indices of the points (sorted) """
+    #=======================================================================         
+    def points(self):
+
+        if self.Mask is not None:
+            Indices = Geometry.numpy.argwhere(self.Mask) + self.Origin
+            return [ tuple(Index) for Index in Indices.tolist() ]
+
+        ny = self.Shape[1]
+        nz = self.Shape[2]
+
+        listPoints = list()
+        for Packed in sorted(self.Indices):
+            i, Rest = divmod(Packed, ny * nz)
+            j, k = divmod(Rest, nz)
+            listPoints.append(( i + self.Origin[0], j + self.Origin[1], k + self.Origin[2] ))
+
+        return listPoints
+
+    #=======================================================================
+    """ count: returns the number of points """
+    #=======================================================================         
+    def count(self):
+
+        if self.Mask is not None:
+            return int(Geometry.numpy.count_nonzero(self.Mask))
+
+        return len(self.Indices)
+
 class Grid(threading.Thread):
     
     def __init__(self, top, CleftFile, OutputFile, Spacer, Estimate):
@@ -36,8 +214,8 @@ class Grid(threading.Thread):
         self.OutputFile = OutputFile
         self.Estimate = Estimate
 
-        self.dictGridPoints = dict()
         self.dictSpheres = dict()
+        self.Lattice = Lattice(self.Spacer)
 
         # Starts thread
         self.start()
@@ -116,55 +294,8 @@ class Grid(threading.Thread):
     def build_Grid(self):
         
         try:
-
-            for sph in self.dictSpheres.keys():
-                
-                if float(1.0 / self.Spacer) - float(int(1.0 / self.Spacer)) > 0.001:
-                    xmin = float(int((self.dictSpheres[sph][1][0] - self.dictSpheres[sph][0]) / self.Spacer)) * self.Spacer;
-                    ymin = float(int((self.dictSpheres[sph][1][1] - self.dictSpheres[sph][0]) / self.Spacer)) * self.Spacer;
-                    zmin = float(int((self.dictSpheres[sph][1][2] - self.dictSpheres[sph][0]) / self.Spacer)) * self.Spacer;
-                    xmax = float(int((self.dictSpheres[sph][1][0] + self.dictSpheres[sph][0]) / self.Spacer) + 1.0) * self.Spacer;
-                    ymax = float(int((self.dictSpheres[sph][1][1] + self.dictSpheres[sph][0]) / self.Spacer) + 1.0) * self.Spacer;
-                    zmax = float(int((self.dictSpheres[sph][1][2] + self.dictSpheres[sph][0]) / self.Spacer) + 1.0) * self.Spacer;
-
-                else:
-                    xmin = float(int(self.dictSpheres[sph][1][0] - self.dictSpheres[sph][0] - self.Spacer));
-                    ymin = float(int(self.dictSpheres[sph][1][1] - self.dictSpheres[sph][0] - self.Spacer));   
-                    zmin = float(int(self.dictSpheres[sph][1][2] - self.dictSpheres[sph][0] - self.Spacer));
-                    xmax = float(int(self.dictSpheres[sph][1][0] + self.dictSpheres[sph][0] + self.Spacer + 1.0))
-                    ymax = float(int(self.dictSpheres[sph][1][1] + self.dictSpheres[sph][0] + self.Spacer + 1.0))
-                    zmax = float(int(self.dictSpheres[sph][1][2] + self.dictSpheres[sph][0] + self.Spacer + 1.0))
-
-
-                x = xmin
-                y = ymin
-                z = zmin
-                
-                sqrrad = sph.Radius
-                
-                while z < zmax:
-                    while y < ymax:
-                        while x < xmax:
-
-                            key  = '%8.3f' % x
-                            key += '%8.3f' % y
-                            key += '%8.3f' % z
-
-                            if key not in self.dictGridPoints:
-
-                                sqrrad = self.dictSpheres[sph][0] * self.dictSpheres[sph][0]
-                                if Geometry.sqrdistance( self.dictSpheres[sph][1], [ x, y, z ] ) < sqrrad:
-
-                                    self.dictGridPoints[key] = ''
-
-                            x += self.Spacer
-
-                        x = xmin
-                        y += self.Spacer
-
-                    x = xmin
-                    y = ymin
-                    z += self.Spacer
+            self.Lattice = Lattice(self.Spacer)
+            self.Lattice.build(self.dictSpheres.values())
 
         except:
             return 1
@@ -181,13 +312,13 @@ class Grid(threading.Thread):
             outfile.write('REMARK ParentCleft ' + self.CleftFile + '\n') 
 
             i = 1
-            for vertex in sorted(self.dictGridPoints.keys()):
+            for vertex in self.Lattice.points():
                 outfile.write('ATOM  ')
                 outfile.write('%5d' % i)
                 outfile.write('  C   GRD A   1    ')
-                outfile.write('%8.3f' % float(vertex[0:8]))
-                outfile.write('%8.3f' % float(vertex[8:16]))
-                outfile.write('%8.3f' % float(vertex[16:24]))
+                outfile.write('%8.3f' % (vertex[0] * self.Spacer))
+                outfile.write('%8.3f' % (vertex[1] * self.Spacer))
+                outfile.write('%8.3f' % (vertex[2] * self.Spacer))
                 outfile.write('  1.00  1.00           C  ')
                 outfile.write('\n')
                 i += 1
@@ -200,31 +331,14 @@ class Grid(threading.Thread):
         return 0
 
     #=======================================================================
-    """ estimate_Volume: estimates the Grid size in Angstroms (call build_Grid before) """
+    """ estimate_Volume: estimates the Grid size in Angstroms (voxel count of the Spheres) """
     #=======================================================================         
     def estimate_Volume(self):
         
         try:
+            Volume, Lower, Upper = voxel_Volume(self.dictSpheres.values(), self.Spacer)
 
-            n = len(self.dictGridPoints)
-            s = self.Spacer
-            s3 = s * s * s
-
-            if n > 8:
-                a = 1
-                b = (n-8)/4
-            else:
-                a = n/8
-                b = 0
-
-            #print "a", a
-            #print "b", b
-            #print "n", n
-            #print "s", s
-
-            v = a * s3 + b * s3
-
-            self.top.CleftVolume.set( v )
+            self.top.CleftVolume.set( Volume )
 
         except:
             return 1
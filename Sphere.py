@@ -90,7 +90,11 @@ class Sphere(Wizard):
             self.Quit_Wizard()
             return
             
-        if self.DisplaySphere():
+        # Single refresh once the sphere is displayed
+        with General_cmd.Batch():
+            ErrorCode = self.DisplaySphere()
+
+        if ErrorCode:
             self.queue.put(lambda: self.App.DisplayMessage("  ERROR: Could not display the Sphere", 1))
             self.queue.put(lambda: self.App.DisplayMessage("         The wizard will abort prematurely", 1))
             self.Quit_Wizard()
@@ -135,7 +139,7 @@ class Sphere(Wizard):
         try:
             # Display the Sphere
             cmd.delete(self.SphereDisplay)
-            cmd.refresh()
+            General_cmd.refresh()
         except:
             pass
 
@@ -144,16 +148,16 @@ class Sphere(Wizard):
                            pos=self.SphereView.Center,
                            vdw=self.SphereView.Radius,
                            state=self.State)
-            cmd.refresh()
+            General_cmd.refresh()
 
             cmd.color('oxygen', self.SphereDisplay)
-            cmd.refresh()
+            General_cmd.refresh()
 
             cmd.hide('everything', self.SphereDisplay)
-            cmd.refresh()
+            General_cmd.refresh()
 
             cmd.show('spheres', self.SphereDisplay)
-            cmd.refresh()
+            General_cmd.refresh()
             
         except:
             self.ErrorCode = 1
@@ -185,7 +189,11 @@ class Sphere(Wizard):
         self.SphereView = self.Sphere.Copy()
         self.SphereSize.set(self.SphereView.Radius)
 
-        if self.DisplaySphere():
+        # Single refresh once the sphere is displayed
+        with General_cmd.Batch():
+            ErrorCode = self.DisplaySphere()
+
+        if ErrorCode:
             self.queue.put(lambda: self.App.DisplayMessage("  ERROR: Could not display the Sphere", 1))
             self.queue.put(lambda: self.App.DisplayMessage("         The wizard will abort prematurely", 1))
             self.Quit_Wizard()
@@ -26,6 +26,7 @@ else:
     import queue as Queue
 
 import General
+import Timers
 
 class Tab(object):
 
@@ -306,12 +307,14 @@ class Tab(object):
     def Update_Tkinter(self):
         
         # Check every 100 ms if there is something new in the queue.
-        while self.queue.qsize():
-            try:
-                func = self.queue.get()
-                func()
-            except Queue.Empty:
-                pass
+        if self.queue.qsize():
+            with Timers.Timer('Update_Tkinter'):
+                while self.queue.qsize():
+                    try:
+                        func = self.queue.get()
+                        func()
+                    except Queue.Empty:
+                        pass
         
         if self.Condition_Update():
             self.top.root.after(self.TKINTER_UPDATE_INTERVAL, self.Update_Tkinter)
@@ -0,0 +1,150 @@
+'''
+    NRGsuite: PyMOL molecular tools interface
+    Copyright (C) 2011 Gaudreault, F., Morency, LP. & Najmanovich, R.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+
+'''
+@title: Timers.py
+
+@summary: Opt-in timers of the named stages of the docking pipeline. Enabled by setting the
+          environment variable NRGSUITE_PROFILE=1 before starting PyMOL; when disabled the
+          timed functions are left untouched. Records the number of calls, the cumulative,
+          maximum and histogrammed durations of each stage.
+
+@contain: Timed, Timer, Add, Reset, Write_Summary
+'''
+
+import os
+import time
+import threading
+
+ENABLED = os.environ.get('NRGSUITE_PROFILE', '') not in ('', '0')
+
+# Upper bounds (seconds) of the bins of the histograms, the last bin holds longer durations
+BINS = [ 0.0001, 0.001, 0.01, 0.1, 1.0 ]
+
+# stage name -> [ calls, total, maximum, [ counts per bin ] ]
+dictStages = dict()
+
+_Lock = threading.Lock()
+
+''' ==================================================================================
+FUNCTION Timed: Decorator timing every call of a function as the stage Name
+==================================================================================  '''
+def Timed(Name):
+
+    def Decorate(Function):
+
+        if not ENABLED:
+            return Function
+
+        def Wrapper(*args, **kwargs):
+            Start = time.time()
+            try:
+                return Function(*args, **kwargs)
+            finally:
+                Add(Name, time.time() - Start)
+
+        Wrapper.__name__ = Function.__name__
+        Wrapper.__doc__ = Function.__doc__
+
+        return Wrapper
+
+    return Decorate
+
+''' ==================================================================================
+CLASS Timer: Times a block of code as the stage Name
+             usage: with Timers.Timer('Name'): ...
+==================================================================================  '''
+class Timer(object):
+
+    def __init__(self, Name):
+
+        self.Name = Name
+
+    def __enter__(self):
+
+        if ENABLED:
+            self.Start = time.time()
+
+        return self
+
+    def __exit__(self, *args):
+
+        if ENABLED:
+            Add(self.Name, time.time() - self.Start)
+
+        return False
+
+''' ==================================================================================
+FUNCTION Add: Records a duration of a stage
+==================================================================================  '''
+def Add(Name, Elapsed):
+
+    with _Lock:
+        Stage = dictStages.get(Name)
+        if Stage is None:
+            Stage = [ 0, 0.0, 0.0, [ 0 ] * (len(BINS) + 1) ]
+            dictStages[Name] = Stage
+
+        Stage[0] += 1
+        Stage[1] += Elapsed
+        Stage[2] = max(Stage[2], Elapsed)
+
+        Bin = 0
+        while Bin < len(BINS) and Elapsed > BINS[Bin]:
+            Bin += 1
+        Stage[3][Bin] += 1
+
+''' ==================================================================================
+FUNCTION Reset: Forgets the durations recorded (start of a run)
+==================================================================================  '''
+def Reset():
+
+    with _Lock:
+        dictStages.clear()
+
+''' ==================================================================================
+FUNCTION Write_Summary: Writes the table of the stages timings to a file
+@return: True if the summary was written
+==================================================================================  '''
+def Write_Summary(FilePath):
+
+    if not ENABLED:
+        return False
+
+    with _Lock:
+        listStages = sorted(dictStages.items(), key=lambda Item: -Item[1][1])
+
+        listHeaders = [ '<=%gs' % Bound for Bound in BINS ] + [ '>%gs' % BINS[-1] ]
+
+        listLines = [ '%-30s %8s %10s %10s %10s  %s\n' % ( 'stage', 'calls', 'total (s)', 'mean (ms)', 'max (ms)',
+                                                          ' '.join([ '%9s' % Header for Header in listHeaders ]) ) ]
+
+        for Name, (Calls, Total, Maximum, listCounts) in listStages:
+            listLines.append( '%-30s %8d %10.3f %10.3f %10.3f  %s\n' % ( Name, Calls, Total, 1000.0 * Total / Calls,
+                                                                        1000.0 * Maximum,
+                                                                        ' '.join([ '%9d' % Count for Count in listCounts ]) ) )
+
+    try:
+        handle = open(FilePath, 'w')
+        handle.writelines(listLines)
+        handle.close()
+    except IOError:
+        return False
+
+    return True
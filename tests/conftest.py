@@ -0,0 +1,150 @@
+'''
+    NRGsuite: PyMOL molecular tools interface
+    Copyright (C) 2011 Gaudreault, F., Morency, LP. & Najmanovich, R.
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+
+'''
+@title: conftest.py
+
+@summary: Test setup. The NRGsuite folders are put on the path as in the PyMOL plugin and
+          PyMOL is replaced by FakeCmd, which records the objects, states, coordinates and
+          dihedrals set by the modules under test.
+'''
+
+import os
+import re
+import sys
+import types
+import fnmatch
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for Dir in ( os.path.join(ROOT, 'GetCleft'), os.path.join(ROOT, 'FlexAID'), ROOT ):
+    if Dir not in sys.path:
+        sys.path.insert(0, Dir)
+
+# Object names of the selections used by UpdateScreen
+ObjectRegex = re.compile(r"(\w+__)")
+
+""" *********************************************************************************
+    CLASS FakeCmd: Stand-in for pymol.cmd recording what is written to each state
+    ********************************************************************************* """
+class FakeCmd(object):
+
+    def __init__(self):
+
+        self.Reset()
+
+    def Reset(self):
+
+        self.dictStates = dict()        # object -> number of states
+        self.dictCoords = dict()        # (object, state) -> coordinates
+        self.dictDihedrals = dict()     # (object, state, atom selections) -> angle
+        self.LigandIDs = list()
+        self.Frame = None
+        self.Refreshes = 0              # viewer redraws requested
+
+    def __getattr__(self, name):
+
+        return lambda *args, **kwargs: None
+
+    def Get_Object(self, selection):
+
+        m = ObjectRegex.search(selection)
+        return m.group(1) if m else selection
+
+    def get(self, name, *args, **kwargs):
+
+        return '0'
+
+    def get_names(self, *args, **kwargs):
+
+        return list(self.dictStates.keys())
+
+    def load(self, path, name, state=1, *args, **kwargs):
+
+        self.dictStates[name] = max(self.dictStates.get(name, 0), state)
+
+    def create(self, name, selection, source_state=1, target_state=1, *args, **kwargs):
+
+        self.dictStates[name] = max(self.dictStates.get(name, 0), target_state)
+
+    def delete(self, name, *args, **kwargs):
+
+        for Object in fnmatch.filter(list(self.dictStates.keys()), name):
+            del self.dictStates[Object]
+
+    def count_states(self, selection='(all)', *args, **kwargs):
+
+        return self.dictStates.get(self.Get_Object(selection), 0)
+
+    def frame(self, state):
+
+        self.Frame = state
+
+    def refresh(self, *args, **kwargs):
+
+        self.Refreshes += 1
+
+    def iterate(self, selection, expression, space=None, *args, **kwargs):
+
+        if space is not None and 'IDs' in space:
+            space['IDs'].extend(self.LigandIDs)
+
+    def load_coords(self, coords, selection, state=1, *args, **kwargs):
+
+        Object = self.Get_Object(selection)
+        if state > self.dictStates.get(Object, 0):
+            raise Exception('state %d of %s does not exist' % (state, Object))
+
+        self.dictCoords[(Object, state)] = [ list(coord) for coord in coords ]
+
+    def set_dihedral(self, atom1, atom2, atom3, atom4, angle, state=1, *args, **kwargs):
+
+        Object = self.Get_Object(atom4)
+        if state > self.dictStates.get(Object, 0):
+            raise Exception('state %d of %s does not exist' % (state, Object))
+
+        self.dictDihedrals[(Object, state, atom1, atom2, atom3, atom4)] = angle
+
+    def get_dihedral(self, *args, **kwargs):
+
+        return 0.0
+
+cmd = FakeCmd()
+
+pymol = types.ModuleType('pymol')
+pymol.__path__ = []
+pymol.cmd = cmd
+pymol.util = FakeCmd()
+
+# submodules imported by the wizards
+pymol.wizard = types.ModuleType('pymol.wizard')
+pymol.wizard.Wizard = object
+pymol.cgo = types.ModuleType('pymol.cgo')
+
+sys.modules['pymol'] = pymol
+sys.modules['pymol.wizard'] = pymol.wizard
+sys.modules['pymol.cgo'] = pymol.cgo
+
+@pytest.fixture
+def fakecmd():
+
+    cmd.Reset()
+    return cmd
@@ -0,0 +1,66 @@
+'''
+@summary: Refreshes of the viewer requested inside a Batch are coalesced into one
+'''
+
+import General_cmd
+import UpdateScreen
+
+from test_updatescreen import Parse, Get_Line, ATOMS
+
+def test_refreshes_are_coalesced(fakecmd):
+
+    with General_cmd.Batch():
+        for i in range(5):
+            General_cmd.refresh()
+
+        # nested blocks refresh with the outermost one
+        with General_cmd.Batch():
+            General_cmd.refresh()
+
+        assert fakecmd.Refreshes == 0
+
+    assert fakecmd.Refreshes == 1
+
+def test_batch_without_refresh(fakecmd):
+
+    with General_cmd.Batch():
+        pass
+
+    assert fakecmd.Refreshes == 0
+
+def test_refresh_outside_batch(fakecmd):
+
+    General_cmd.refresh()
+    General_cmd.refresh()
+
+    assert fakecmd.Refreshes == 2
+
+def Render_Generations(fakecmd, Batched):
+
+    fakecmd.LigandIDs = list(ATOMS)
+    top = Parse()
+
+    listRefreshes = list()
+    for Genes in ( [ 0.0, 30.0, 40.0, 50.0, 1.0 ], [ 1.0, 70.0, -20.0, 10.0, 2.0 ] ):
+        Refreshes = fakecmd.Refreshes
+
+        if Batched:
+            with General_cmd.Batch():
+                UpdateScreen.UpdateScreen(top, '1.0', 5, Get_Line(Genes), 0, 1, 1)
+        else:
+            UpdateScreen.UpdateScreen(top, '1.0', 5, Get_Line(Genes), 0, 1, 1)
+
+        listRefreshes.append(fakecmd.Refreshes - Refreshes)
+
+    return listRefreshes
+
+def test_top_render_redraws_once(fakecmd):
+
+    # the first generation creates the solution object, the next ones update it
+    Unbatched = Render_Generations(fakecmd, False)
+
+    fakecmd.Reset()
+    Batched = Render_Generations(fakecmd, True)
+
+    assert Unbatched[0] > 1
+    assert Batched == [ 1, 1 ]
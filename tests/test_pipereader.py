@@ -0,0 +1,94 @@
+'''
+@summary: The output of FlexAID queued by the pipe reader is drained while the .update files
+          are parsed, and parsed in order once back on the logfile
+'''
+
+import io
+import time
+
+import Simulation
+
+LOGFILE = 'log.txt'
+UPDATE = '.update'
+
+class Watch(object):
+
+    def Wake(self):
+        pass
+
+    def Wait(self, Timeout):
+        time.sleep(Timeout)
+
+class Tail(object):
+    ''' The .update file is not written yet '''
+
+    def Read(self, ParseFile):
+        raise IOError()
+
+class Simulate(object):
+
+    INTERVAL = 0.01
+    TIMEOUT = 0.05
+    PIPE_BUFFER = 50
+
+def Get_Parse(Reader):
+
+    Parse = Simulation.Parse.__new__(Simulation.Parse)
+
+    Parse.top = Simulate()
+    Parse.LOGFILE = LOGFILE
+    Parse.Reader = Reader
+    Parse.PipeLines = list()
+    Parse.Tail = Tail()
+    Parse.Watch = Watch()
+
+    return Parse
+
+def Attach_Reader(listLines):
+
+    # the queue holds far fewer lines than FlexAID writes during the .update phase
+    Reader = Simulation.PipeReader(5, Watch())
+    Reader.Attach(io.BytesIO(''.join(listLines).encode('latin-1')), io.BytesIO())
+
+    return Reader
+
+def Wait_Reader(Parse, ParseFile):
+
+    End = time.time() + 1.0
+    while Parse.Reader.is_alive() and time.time() < End:
+        Parse.TailRead(ParseFile)
+
+def test_pipe_is_drained_while_waiting_for_the_update_file():
+
+    listLines = [ 'Generation: %d\n' % i for i in range(30) ]
+
+    Parse = Get_Parse(Attach_Reader(listLines))
+    Wait_Reader(Parse, UPDATE)
+
+    # FlexAID was never blocked on its output
+    assert not Parse.Reader.is_alive()
+
+    assert Parse.TailRead(LOGFILE) == 0
+    assert Parse.Lines == listLines
+    assert Parse.PipeLines == []
+
+def test_lines_held_while_parsing_updates_are_bounded():
+
+    listLines = [ 'Generation: %d\n' % i for i in range(200) ]
+
+    Parse = Get_Parse(Attach_Reader(listLines))
+    Wait_Reader(Parse, UPDATE)
+
+    # the parser holds PIPE_BUFFER lines, the reader is throttled by its full queue
+    assert Parse.Reader.is_alive()
+    assert len(Parse.PipeLines) == Simulate.PIPE_BUFFER
+    assert Parse.Reader.Lines.full()
+
+    listRead = list()
+    End = time.time() + 10.0
+    while (Parse.Reader.is_alive() or not Parse.Reader.Lines.empty()) and time.time() < End:
+        assert Parse.TailRead(LOGFILE) == 0
+        assert len(Parse.Lines) <= Simulate.PIPE_BUFFER
+        listRead.extend(Parse.Lines)
+
+    assert listRead == listLines
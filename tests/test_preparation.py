@@ -0,0 +1,17 @@
+'''
+@summary: Molecules of a library are prepared into distinct files
+'''
+
+import os
+
+import Preparation
+
+def test_molecules_of_the_same_name_keep_their_format(tmpdir):
+
+    listMolecules = [ str(tmpdir.join(Name)) for Name in [ 'a.mol2', 'a.sdf', 'b.pdb' ] ]
+
+    Prep = Preparation.Preparation(str(tmpdir), listMolecules, str(tmpdir.join('ligands')))
+
+    listFilebases = [ os.path.basename(Filebase) for MoleculeFile, Filebase in Prep.Get_Filebases() ]
+
+    assert listFilebases == [ 'a_mol2', 'a_sdf', 'b' ]
@@ -0,0 +1,31 @@
+'''
+@summary: The offline replay reconstructs and displays the poses without errors. Replay.py
+          replaces PyMOL on import, so it is run in a process of its own
+'''
+
+import os
+import re
+import sys
+import subprocess
+
+REPLAY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FlexAID', 'Replay.py')
+
+def Run_Replay(*args):
+
+    return subprocess.check_output([ sys.executable, '-O', REPLAY ] + list(args),
+                                   stderr=subprocess.STDOUT).decode('utf-8')
+
+def test_replay_displays_every_pose(tmpdir):
+
+    Run_Dir = str(tmpdir.join('run'))
+
+    Run_Replay('generate', '-o', Run_Dir, '-g', '20', '-t', '5')
+    Output = Run_Replay('replay', '-l', os.path.join(Run_Dir, 'log.txt'), '--ligand', os.path.join(Run_Dir, 'LIG'),
+                        '-t', '5', '--render-all', '-o', str(tmpdir.join('replay')))
+
+    assert 'CRITICAL ERROR' not in Output
+    assert 'does not exist' not in Output
+    assert 'No atoms of the ligand' not in Output
+
+    Poses = int(re.search(r'poses reconstructed: (\d+)', Output).group(1))
+    assert Poses == 20 * 5
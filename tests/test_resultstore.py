@@ -0,0 +1,29 @@
+'''
+@summary: Results restored from the store never replace the files of the new run
+'''
+
+import ManageFiles
+
+def test_get_keeps_the_report_of_the_new_run(tmpdir):
+
+    Stored_Run = tmpdir.mkdir('stored')
+    Stored_Run.join('RESULT_0.pdb').write('stored pose\n')
+    Stored_Run.join('report.txt').write('stored report\n')
+
+    Store = ManageFiles.ResultStore(str(tmpdir.join('Results')))
+    assert Store.Set('KEY', str(Stored_Run))
+
+    Run_Dir = tmpdir.mkdir('run')
+    Run_Dir.join('report.txt').write('new report\n')
+
+    assert Store.Get('KEY', str(Run_Dir))
+
+    assert Run_Dir.join('report.txt').read() == 'new report\n'
+    assert Run_Dir.join('report_restored.txt').read() == 'stored report\n'
+    assert Run_Dir.join('RESULT_0.pdb').read() == 'stored pose\n'
+
+def test_get_unknown_key(tmpdir):
+
+    Store = ManageFiles.ResultStore(str(tmpdir.join('Results')))
+
+    assert not Store.Get('KEY', str(tmpdir))
@@ -0,0 +1,59 @@
+'''
+@summary: Parameter overrides of the headless screening are typed as the interface variables
+'''
+
+import pytest
+
+import Screening
+
+INP = 'FLEDIH  1    3    4\n'
+
+def Create_InputFiles(tmpdir, dictParams):
+
+    Library_Dir = tmpdir.mkdir('library')
+    Library_Dir.join('LIG.inp').write(INP)
+
+    Target = tmpdir.join('target.inp.pdb')
+    Target.write('')
+
+    Screen = Screening.Screening(str(tmpdir), str(Target), str(Library_Dir), str(tmpdir.join('output')),
+                                 dictParams=dictParams, Sphere=Screening.SphereObj.SphereObj(8.0, 8.0, [ 1.0, 2.0, 3.0 ]))
+
+    Manage = Screening.BatchManage(Screening.Job(Screen, 'LIG', str(Library_Dir.join('LIG.inp'))))
+    Manage.Reference_Folders()
+    assert Manage.Create_Folders()
+
+    Manage.Create_CONFIG()
+    Manage.Create_ga_inp()
+
+    return open(Manage.CONFIG).read(), open(Manage.ga_inp).read()
+
+def test_flag_overrides_set_to_zero(tmpdir):
+
+    CONFIG, ga_inp = Create_InputFiles(tmpdir, { 'UseAGA': '0', 'IntTranslation': '0', 'IntRotation': 'false' })
+
+    assert 'ADAPTVGA 0\n' in ga_inp
+    assert 'ADAPTKCO' not in ga_inp
+    assert 'OPTIMZ 9999 - -1' not in CONFIG
+    assert 'OPTIMZ 9999 - 0' not in CONFIG
+
+def test_default_flags(tmpdir):
+
+    CONFIG, ga_inp = Create_InputFiles(tmpdir, {})
+
+    assert 'ADAPTVGA 1\n' in ga_inp
+    assert 'ADAPTKCO' in ga_inp
+    assert 'OPTIMZ 9999 - -1' in CONFIG
+
+@pytest.mark.parametrize('key, value, expected', [ ('UseAGA', 'True', 1), ('RepDup', 'no', 0),
+                                                   ('NbGen', ' 1000 ', '1000'), ('MutaRate', '0.05', '0.05'),
+                                                   ('FitModel', 'LINEAR', 'LINEAR') ])
+def test_convert_param(key, value, expected):
+
+    assert Screening.Convert_Param(key, value) == expected
+
+@pytest.mark.parametrize('key, value', [ ('UseAGA', '2'), ('NbGen', '1000.5'), ('MutaRate', 'high'), ('NbGens', '10') ])
+def test_convert_param_rejects(key, value):
+
+    with pytest.raises(ValueError):
+        Screening.Convert_Param(key, value)
@@ -0,0 +1,137 @@
+'''
+@summary: The TOP solution objects keep a single state that every rendered generation updates
+'''
+
+import Geometry
+import UpdateScreen
+
+ATOMS = [ 90001, 90002, 90003, 90004 ]
+RESIDUE = 'SER12A'
+
+# chi1 of the rotamers of the flexible serine
+ROTAMERS = [ 60.0, -60.0 ]
+
+class Manage(object):
+
+    ABORT = '/dev/null'
+
+class Simulate(object):
+
+    PymolColorList = [ 'red' ]
+    Manage = Manage()
+
+class Parse(object):
+    ''' Parsing thread holding the state read from the logfile '''
+
+    def __init__(self):
+
+        self.top = Simulate()
+
+        self.LigandName = 'LIG'
+        self.TargetName = 'TARGET'
+        self.ReferencePath = 'LIG_ref.pdb'
+        self.DefaultDisplay = 'sticks'
+
+        self.FlexStatus = ''
+        self.dictFlexBonds = dict()
+        self.FixedAngle = dict()
+
+        self.ListAtom = list(ATOMS)
+        self.RecAtom = dict( (NoAtom, [ ATOMS[i-k] if i-k >= 0 else 0 for k in (1, 2, 3) ])
+                             for i, NoAtom in enumerate(ATOMS) )
+        self.DisAngDih = dict( (NoAtom, [ 1.5, 110.0, 180.0 ]) for NoAtom in ATOMS )
+        self.VarAtoms = ATOMS[:3]
+
+        self.Ori = [ 0.0, 0.0, 0.0 ]
+        self.OriX = [ 1.0, 0.0, 0.0 ]
+        self.OriY = [ 0.0, 1.0, 0.0 ]
+        self.GridVertex = { 0: [ 2.0, 3.0, 4.0 ], 1: [ -3.0, 1.0, 5.0 ] }
+
+        self.LigandIDs = None
+        self.listSideChain = [ RESIDUE ]
+        self.dictSideChainNRot = { RESIDUE: 2 }
+        self.dictSideChainRotamers = { RESIDUE: ROTAMERS }
+        self.dictSideChainState = dict()
+        self.dictSideChainDefault = dict()
+
+        self.Reference = 0
+        self.listScores = list()
+
+    def UpdateDataList(self, Line, TOP, Reference, dictCoord):
+
+        self.listScores.append(Line)
+        return 0
+
+    def Skip_Pose(self, Line, TOP):
+
+        self.UpdateDataList(Line, TOP, 0, None)
+
+def Get_Line(Genes):
+
+    return '  0 (' + ''.join([ '%10.2f ' % Gene for Gene in Genes ]) + ')  cf=  -10.000 cf.app=  -10.000 fitnes=    1.000\n'
+
+def Render(top, Genes):
+
+    Update = UpdateScreen.UpdateScreen(top, '1.0', 5, Get_Line(Genes), 0, 1, 1)
+    return Update
+
+def test_generations_update_the_displayed_state(fakecmd):
+
+    fakecmd.LigandIDs = list(ATOMS)
+    top = Parse()
+
+    Chi1 = ( 'resn SER & resi 12 & chain A & name N & TOP_1__',
+             'resn SER & resi 12 & chain A & name CA & TOP_1__',
+             'resn SER & resi 12 & chain A & name CB & TOP_1__',
+             'resn SER & resi 12 & chain A & name OG & TOP_1__' )
+
+    # grid point, three rotation genes, rotamer of the side-chain
+    First = Render(top, [ 0.0, 30.0, 40.0, 50.0, 1.0 ])
+    FirstCoords = fakecmd.dictCoords[('TOP_1__', 1)]
+
+    assert fakecmd.dictDihedrals[('TOP_1__', 1) + Chi1] == ROTAMERS[0]
+
+    Second = Render(top, [ 1.0, 70.0, -20.0, 10.0, 2.0 ])
+    SecondCoords = fakecmd.dictCoords[('TOP_1__', 1)]
+
+    # one solution object with a single state, shown at every generation
+    assert fakecmd.count_states('TOP_1__') == 1
+    assert fakecmd.Frame == UpdateScreen.UpdateScreen.STATE
+    assert list(fakecmd.dictCoords.keys()) == [ ('TOP_1__', 1) ]
+
+    # the displayed state holds the pose and the rotamer of the second generation
+    assert SecondCoords != FirstCoords
+    assert SecondCoords == [ Second.dictCoord[ID] for ID in ATOMS ]
+    assert SecondCoords == [ list(Coord) for Coord in
+                             ( Geometry.buildcc(top.ListAtom, top.RecAtom, top.DisAngDih, top.Ori)[ID] for ID in ATOMS ) ]
+    assert fakecmd.dictDihedrals[('TOP_1__', 1) + Chi1] == ROTAMERS[1]
+
+    # going back to the first rotamer is applied again
+    Render(top, [ 0.0, 30.0, 40.0, 50.0, 1.0 ])
+    assert fakecmd.dictDihedrals[('TOP_1__', 1) + Chi1] == ROTAMERS[0]
+    assert fakecmd.dictCoords[('TOP_1__', 1)] == FirstCoords
+
+    assert len(top.listScores) == 3
+
+def test_missing_state_is_not_written(fakecmd, capsys):
+
+    fakecmd.LigandIDs = list(ATOMS)
+    top = Parse()
+
+    Update = UpdateScreen.UpdateScreen(top, '1.0', 5, Get_Line([ 0.0, 30.0, 40.0, 50.0, 1.0 ]), 0, 1, 1, Deferred=True)
+    Update.dictCoord = dict( (ID, [ 0.0, 0.0, 0.0 ]) for ID in ATOMS )
+
+    # the solution object was deleted in PyMOL
+    assert Update.UpdateLigandCoords() == 1
+    assert fakecmd.dictCoords == {}
+    assert 'does not exist' in capsys.readouterr().out
+
+def test_no_ligand_atoms_updated_is_logged(fakecmd, capsys):
+
+    top = Parse()
+    Render(top, [ 0.0, 30.0, 40.0, 50.0, 1.0 ])
+
+    # no ligand atoms found in the solution: the object is deleted to be rebuilt
+    assert 'No atoms of the ligand' in capsys.readouterr().out
+    assert fakecmd.count_states('TOP_1__') == 0
+    assert top.listScores == []
@@ -0,0 +1,194 @@
+'''
+@summary: The in-process voxel volume agrees with volume_calc and with the exact volume of the fixture cleft
+'''
+
+import os
+import math
+import shutil
+import subprocess
+
+import pytest
+
+import Grid
+import Geometry
+
+CLEFT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cleft_sph.pdb')
+
+# Spacing used by the Volume tab for the default 3 iterations
+SPACER = 0.35
+
+# Relative tolerance against volume_calc
+TOLERANCE = 0.05
+
+def Get_ExactVolume(listSpheres):
+    ''' Volume of the union of the two overlapping spheres of the fixture '''
+
+    (R, A), (r, B) = listSpheres
+    d = math.sqrt(sum([ (a - b) ** 2 for a, b in zip(A, B) ]))
+
+    Lens = math.pi * (R + r - d) ** 2 * (d * d + 2 * d * r - 3 * r * r + 2 * d * R + 6 * r * R - 3 * R * R) / (12 * d)
+
+    return 4.0 / 3.0 * math.pi * (R ** 3 + r ** 3) - Lens
+
+def Get_VolumeCalc():
+    ''' volume_calc executable shipped with the NRGsuite binaries, None if not installed '''
+
+    return os.environ.get('NRGSUITE_VOLUME_CALC') or shutil.which('volume_calc')
+
+def test_voxel_volume_is_close_to_the_exact_volume():
+
+    listSpheres = Grid.read_Spheres(CLEFT)
+    Exact = Get_ExactVolume(listSpheres)
+
+    Volume, Lower, Upper = Grid.voxel_Volume(listSpheres, SPACER)
+
+    assert Lower <= Exact <= Upper
+    assert abs(Volume - Exact) <= 0.03 * Exact
+
+@pytest.mark.skipif(Get_VolumeCalc() is None, reason='volume_calc is not installed')
+def test_voxel_volume_matches_volume_calc():
+
+    out = subprocess.check_output([ Get_VolumeCalc(), '-i', CLEFT, '-t', '3' ])
+
+    # same parsing as RunVolume.Volume_Calc
+    Reference = None
+    for Line in out.splitlines():
+        Line = Line.decode('utf-8')
+        if Line.startswith('Volume'):
+            Reference = float(Line[8:].strip())
+            break
+
+    assert Reference is not None
+
+    Volume, Lower, Upper = Grid.voxel_Volume(Grid.read_Spheres(CLEFT), SPACER)
+
+    assert abs(Volume - Reference) <= TOLERANCE * Reference
+
+class GetCleft(object):
+
+    OSid = 'LINUX'
+
+    def __init__(self, Executable):
+
+        self.VolumeExecutable = Executable
+        self.ProcessError = False
+        self.ProcessRunning = True
+        self.Run = None
+
+class EstimateVolume(object):
+    ''' Volume tab running the volume calculations '''
+
+    def __init__(self, Executable):
+
+        self.top = GetCleft(Executable)
+
+    def VolumeRunning(self, boolRun):
+        pass
+
+    def Init_Table(self):
+        pass
+
+def Get_Cleft(tmpdir, Volume):
+
+    import CleftObj
+
+    Cleft = CleftObj.CleftObj()
+    Cleft.CleftName = 'CLF1'
+    Cleft.CleftFile = str(tmpdir.join('cleft_sph.pdb'))
+    Cleft.Volume = Volume
+
+    shutil.copy(CLEFT, Cleft.CleftFile)
+
+    return Cleft
+
+def test_failed_volume_calc_is_not_cached(tmpdir):
+
+    import Volume
+
+    # volume_calc printing a volume but failing
+    Executable = tmpdir.join('volume_calc')
+    Executable.write('#!/bin/sh\necho "Volume: 99.000"\nexit 1\n')
+    Executable.chmod(0o755)
+
+    Cache = Volume.VolumeCache(str(tmpdir.join('Volume.cache')))
+    Cleft = Get_Cleft(tmpdir, 50.0)
+
+    top = EstimateVolume(str(Executable))
+    Run = Volume.RunVolume(top, Volume.Queue.Queue(), [ Cleft ], '3', 1, Cache, 'volume_calc')
+    Run.join()
+
+    # the volume of the previous calculation is not kept nor cached
+    assert top.top.ProcessError
+    assert Cleft.Volume == 0.0
+    assert Cache.dictVolume == {}
+
+@pytest.mark.skipif(Geometry.numpy is None, reason='NumPy is not installed')
+def test_voxel_volume_is_cached(tmpdir):
+
+    import Volume
+
+    Cache = Volume.VolumeCache(str(tmpdir.join('Volume.cache')))
+    Cleft = Get_Cleft(tmpdir, 0.0)
+
+    top = EstimateVolume(None)
+    Run = Volume.RunVolume(top, Volume.Queue.Queue(), [ Cleft ], '3', 1, Cache, 'voxel')
+    Run.join()
+
+    assert not top.top.ProcessError
+    assert list(Cache.dictVolume.values()) == [ ( Cleft.Volume, Cleft.VolumeBounds ) ]
+
+@pytest.mark.skipif(Geometry.numpy is None, reason='NumPy is not installed')
+def test_unreadable_cleft_does_not_cancel_the_others(tmpdir):
+
+    import Volume
+
+    Cache = Volume.VolumeCache(str(tmpdir.join('Volume.cache')))
+
+    Missing = Get_Cleft(tmpdir, 0.0)
+    Missing.CleftName = 'CLF0'
+    Missing.CleftFile = str(tmpdir.join('missing.pdb'))
+
+    listClefts = [ Missing ] + [ Get_Cleft(tmpdir.mkdir('CLF%d' % i), 0.0) for i in range(1, 4) ]
+
+    top = EstimateVolume(None)
+    Run = Volume.RunVolume(top, Volume.Queue.Queue(), listClefts, '3', 2, Cache, 'voxel')
+    Run.join()
+
+    assert top.top.ProcessError
+    assert not Run.Cancelled
+    assert Missing.Volume == 0.0
+    assert all([ Cleft.Volume > 0.0 for Cleft in listClefts[1:] ])
+
+class Table(object):
+
+    def __init__(self):
+
+        self.listRows = list()
+
+    def Clear(self):
+
+        del self.listRows[:]
+
+    def Add(self, Item, BGColor):
+
+        self.listRows.append(Item)
+
+def test_table_shows_the_volume_bounds(tmpdir):
+
+    import types
+    import Volume
+
+    Voxel = Get_Cleft(tmpdir, 126.61)
+    Voxel.VolumeBounds = ( 93.25, 172.31 )
+    Calc = Get_Cleft(tmpdir.mkdir('calc'), 128.0)
+    Calc.CleftName = 'CLF2'
+
+    dictClefts = { 'CLF1': Voxel, 'CLF2': Calc }
+    BindingSite = types.SimpleNamespace(Get_SortedCleftNames=lambda: sorted(dictClefts),
+                                        Get_CleftName=dictClefts.get)
+
+    Tab = types.SimpleNamespace(Table=Table(), top=types.SimpleNamespace(Default=types.SimpleNamespace(TempBindingSite=BindingSite)))
+    Volume.EstimateVolume.Init_Table(Tab)
+
+    assert Tab.Table.listRows == [ [ '', 'CLF1', '126.61', '[93.2, 172.3]' ],
+                                   [ '', 'CLF2', '128.0', '' ] ]
@@ -0,0 +1,52 @@
+'''
+@summary: The polling fallback of the watcher backs off while the files are idle
+'''
+
+import time
+
+import Simulation
+
+def Get_PollingWatcher(tmpdir):
+
+    Watch = Simulation.Watcher([ str(tmpdir.join('log.txt')) ])
+
+    # inotify descriptors are released, the watcher polls the files
+    Watch.Close()
+
+    return Watch
+
+def test_idle_polling_backs_off(tmpdir):
+
+    Watch = Get_PollingWatcher(tmpdir)
+
+    Checks = [ 0 ]
+    Get_Stat = Watch.Get_Stat
+    def Counted_Stat():
+        Checks[0] += 1
+        return Get_Stat()
+    Watch.Get_Stat = Counted_Stat
+
+    assert not Watch.Wait(1.0)
+
+    # at most 5 checks per second once idle (the fixed 20 ms polling made 50)
+    assert Checks[0] <= 10
+    assert Watch.Poll == Watch.POLL_MAX
+
+def test_change_resets_the_poll_interval(tmpdir):
+
+    Watch = Get_PollingWatcher(tmpdir)
+    Watch.Wait(0.5)
+
+    tmpdir.join('log.txt').write('Generation: 1\n')
+
+    Start = time.time()
+    assert Watch.Wait(1.0)
+    assert time.time() - Start <= Watch.POLL_MAX + 0.1
+    assert Watch.Poll == Watch.POLL_MIN
+
+def test_wake_after_close(tmpdir):
+
+    Watch = Get_PollingWatcher(tmpdir)
+
+    Watch.Wake()
+    assert Watch.Wait(1.0)